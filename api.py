@@ -0,0 +1,187 @@
+#----------------------------------------------------------------------------#
+# JSON API, version 1.
+#
+#   GET /api/v1/venues | /api/v1/artists | /api/v1/shows
+#
+#   ?fields=id,name,city   only those columns are SELECTed (default: all)
+#   ?limit=&after=&before= keyset pagination, see pagination.py
+#   ?format=ndjson         streams every row after `after`, one JSON object
+#                          per line, from a server-side cursor
+#
+# Rows are returned in primary key order.
+#
+#   GET /api/v1/venues/near?lat=&lon=[&radius_km=][&limit=]
+#
+# returns located venues nearest first, with their distance (see geo.py).
+#
+#   GET /api/v1/venues/<id>/calendar | /api/v1/artists/<id>/calendar
+#   GET /api/v1/calendar?city=&state=
+#
+#   ?from=&to= | ?when=weekend   the days covered, see calendars.py
+#
+# returns {"from", "to", "days": [{"day", "count", "shows"}]}, days without
+# shows left out.
+#----------------------------------------------------------------------------#
+
+import json
+import math
+from datetime import date, datetime
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+import calendars
+import geo
+from models import db, Venue, Artist, Show
+from pagination import page_args, paginate
+from streaming import stream_rows
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Rows fetched per round trip while streaming NDJSON.
+STREAM_BATCH_SIZE = 1000
+
+RESOURCES = {
+    'venues': (Venue, [
+        'id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+        'facebook_link', 'website', 'seeking_talent', 'seeking_description',
+        'upcoming_shows_count', 'past_shows_count', 'latitude', 'longitude',
+    ]),
+    'artists': (Artist, [
+        'id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+        'facebook_link', 'website', 'seeking_venue', 'seeking_description',
+        'upcoming_shows_count', 'past_shows_count',
+    ]),
+    'shows': (Show, ['id', 'venue_id', 'artist_id', 'start_time', 'duration']),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+@api.errorhandler(BadRequest)
+def bad_request(error):
+    return jsonify({"error": str(error)}), 400
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _record(row, fields):
+    return {field: _serialize(row._mapping[field]) for field in fields}
+
+
+def _fields(allowed):
+    requested = request.args.get('fields')
+    if not requested:
+        return allowed
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise BadRequest(f"unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def _stream_ndjson(query, keys, fields):
+    rows = stream_rows(query, keys, request.args.get('after'), STREAM_BATCH_SIZE)
+
+    def generate():
+        try:
+            for row in rows:
+                yield json.dumps(_record(row, fields)) + '\n'
+        finally:
+            rows.close()
+            db.session.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _list(resource):
+    model, allowed = RESOURCES[resource]
+    fields = _fields(allowed)
+    query = db.select(*(getattr(model, field) for field in fields))
+    keys = [model.id]
+
+    if request.args.get('format') == 'ndjson':
+        return _stream_ndjson(query, keys, fields)
+
+    page = paginate(query, keys, **page_args(request.args))
+    return jsonify({
+        "data": [_record(row, fields) for row in page],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    })
+
+
+@api.route('/venues')
+def list_venues():
+    return _list('venues')
+
+
+@api.route('/artists')
+def list_artists():
+    return _list('artists')
+
+
+@api.route('/shows')
+def list_shows():
+    return _list('shows')
+
+
+def _coordinate(name, low, high, required=True):
+    value = request.args.get(name)
+    if value is None and not required:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f'{name} must be a number')
+    if not math.isfinite(value) or not low <= value <= high:
+        raise BadRequest(f'{name} must be between {low} and {high}')
+    return value
+
+
+@api.route('/venues/near')
+def venues_near():
+    lat = _coordinate('lat', -90, 90)
+    lon = _coordinate('lon', -180, 180)
+    radius_km = _coordinate('radius_km', 0, math.pi * geo.EARTH_RADIUS_KM, required=False)
+    return jsonify({"data": geo.nearby(lat, lon, radius_km, request.args.get('limit'))})
+
+
+def _calendar(**filters):
+    try:
+        first, last = calendars.date_range(request.args)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    days = calendars.calendar_days(first, last, **filters)
+    for day in days:
+        day['day'] = _serialize(day['day'])
+        for show in day['shows']:
+            show['start_time'] = _serialize(show['start_time'])
+    return jsonify({"from": first.isoformat(), "to": last.isoformat(), "days": days})
+
+
+@api.route('/venues/<int:venue_id>/calendar')
+def venue_calendar(venue_id):
+    if db.session.get(Venue, venue_id) is None:
+        return jsonify({"error": f'venue {venue_id} not found'}), 404
+    return _calendar(venue_id=venue_id)
+
+
+@api.route('/artists/<int:artist_id>/calendar')
+def artist_calendar(artist_id):
+    if db.session.get(Artist, artist_id) is None:
+        return jsonify({"error": f'artist {artist_id} not found'}), 404
+    return _calendar(artist_id=artist_id)
+
+
+@api.route('/calendar')
+def city_calendar():
+    city = request.args.get('city')
+    if not city:
+        raise BadRequest('city is required')
+    return _calendar(city=city, state=request.args.get('state'))
@@ -0,0 +1,225 @@
+#----------------------------------------------------------------------------#
+# Artist pages: listing, search, detail, create and edit.
+#----------------------------------------------------------------------------#
+
+import sys
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+import conditional
+import search
+from cache import page_cache, cache_tags
+from conditional import conditional_get
+from forms import ArtistForm
+from genres import clean_genres, find_genre, genre_counts, has_genre
+from models import db, Venue, Artist, Show
+from pagination import paginate, page_args
+from streaming import stream_page, stream_rows, wants_stream
+from shows import split_shows
+
+bp = Blueprint('artists', __name__)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+@bp.route('/artists')
+@conditional_get.validated(conditional.artist_listing)
+@page_cache.cached
+def artists():
+  query = db.select(Artist.id, Artist.name)
+  keys = Artist.name_sort_key()
+  # ?genre= keeps the artists listing that genre (see genres.py).
+  genre = request.args.get('genre')
+  if genre:
+    genre = find_genre(genre) or genre
+    query = query.where(has_genre(Artist, genre))
+  if wants_stream(request.args):
+    # Every artist, streamed (see streaming.py).
+    return stream_page('pages/artists.html', artists=stream_rows(query, keys, request.args.get('after')), page=None,
+                       genre=genre, genre_counts=genre_counts(Artist))
+
+  page = paginate(query, keys, **page_args(request.args))
+
+  data = []
+  for artist in page:
+      data.append({
+          "id": artist.id,
+          "name": artist.name,
+      })
+  cache_tags('artists')
+  return render_template('pages/artists.html', artists=data, page=page, genre=genre, genre_counts=genre_counts(Artist))
+
+@bp.route('/artists/search', methods=['POST'])
+def search_artists():
+  # Ranked search over name, city/state and genres, one page per request.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  search_term = request.form.get('search_term', '')
+
+  response = search.search_artists(
+    search_term,
+    limit=request.form.get('limit', search.DEFAULT_LIMIT),
+    cursor=request.form.get('cursor'),
+  )
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@bp.route('/artists/<int:artist_id>')
+@conditional_get.validated(conditional.artist_page)
+@page_cache.cached
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  # TODO: replace with real artist data from the artist table, using artist_id
+  
+  artist_found = db.session.get(Artist, artist_id)
+
+  if not artist_found:
+      flash('Artist not found')
+      return redirect(url_for('index'))
+
+  # same concept like show_venue: one projected query, split on start_time
+  shows = db.session.execute(
+      db.select(
+          Show.start_time,
+          Venue.id.label('venue_id'),
+          Venue.name.label('venue_name'),
+          Venue.image_link.label('venue_image_link'),
+      )
+      .join(Venue, Show.venue_id == Venue.id)
+      .where(Show.artist_id == artist_id)
+      .order_by(Show.start_time)
+    ).all()
+  past_shows, upcoming_shows = split_shows(shows, 'venue')
+  cache_tags(f'artist:{artist_id}', *(f'ref:venue:{show.venue_id}' for show in shows))
+
+  data = {
+    "id": artist_found.id,
+    "name": artist_found.name,
+    "genres": artist_found.genres,
+    "city": artist_found.city,
+    "state": artist_found.state,
+    "phone": artist_found.phone,
+    "website": artist_found.website,
+    "facebook_link": artist_found.facebook_link,
+    "seeking_venue": artist_found.seeking_venue,
+    "seeking_description": artist_found.seeking_description,
+    "image_link": artist_found.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
+  return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  form = ArtistForm()
+  
+  # TODO: populate form with fields from artist with ID <artist_id>
+  artist_found = Artist.query.get(artist_id)
+  if not artist_found:
+    return render_template('errors/404.html')
+
+  form.name.data = artist_found.name
+  form.city.data = artist_found.city
+  form.state.data = artist_found.state
+  form.phone.data = artist_found.phone
+  form.genres.data = artist_found.genres
+  form.facebook_link.data = artist_found.facebook_link
+  form.image_link.data = artist_found.image_link
+  form.website_link.data = artist_found.website
+  form.seeking_venue.data = artist_found.seeking_venue
+  form.seeking_description.data = artist_found.seeking_description
+
+  return render_template('forms/edit_artist.html', form=form, artist=artist_found)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+
+  artist_found = Artist.query.get(artist_id)
+  artist_form = ArtistForm(request.form)
+  genres, _ = clean_genres(request.form.getlist("genres"))
+  try:
+    artist_found.name = artist_form.name.data
+    artist_found.city = artist_form.city.data
+    artist_found.state = artist_form.state.data
+    artist_found.phone = artist_form.phone.data
+    artist_found.genres = genres
+    artist_found.facebook_link = artist_form.facebook_link.data
+    artist_found.image_link = artist_form.image_link.data
+    artist_found.website_link = artist_form.website_link.data
+    artist_found.seeking_venue = artist_form.seeking_venue.data
+    artist_found.seeking_description = artist_form.seeking_description.data
+
+    db.session.commit()
+    search.invalidate(Artist)
+    page_cache.invalidate(f'artist:{artist_id}', f'ref:artist:{artist_id}', 'artists', 'shows')
+    # on successful db update, flash success
+    flash("Artist: " + artist_form.name.data + " has been successfully updated!")
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    # Done: on unsuccessful db update, flash an error instead.
+    flash(
+      "An error occurred. Artist "
+      + artist_form.name.data
+      + " could not be updated."
+      )
+  finally:
+    db.session.close()
+  return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  form = ArtistForm(request.form)
+
+  if form.validate():
+        artist = Artist(
+            name=form.name.data,
+            city=form.city.data,
+            state=form.state.data,
+            phone=form.phone.data,
+            genres=form.genres.data,
+            facebook_link=form.facebook_link.data,
+            image_link=form.image_link.data,
+            website=form.website_link.data,
+            seeking_venue=form.seeking_venue.data,
+            seeking_description=form.seeking_description.data
+        )
+        try:
+            db.session.add(artist)
+            db.session.commit()
+            search.invalidate(Artist)
+            page_cache.invalidate('artists')
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] + ' was successfully listed!')
+        except Exception as e:
+            # TODO: on unsuccessful db insert, flash an error instead.
+            db.session.rollback()
+            flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+            print(e)
+        finally:
+            db.session.close()
+            return render_template('pages/home.html')
+
+  else:
+        message = []
+        for field, err in form.errors.items():
+            message.append(field + ' ' + '|'.join(err))
+        flash('An error occurred. Artist ' + form.name.data + ' , '.join(message))
+        form = ArtistForm()
+        return render_template('forms/new_artist.html', form=form)
@@ -0,0 +1,265 @@
+#----------------------------------------------------------------------------#
+# Static asset pipeline.
+#
+#   flask assets build [--clean]
+#
+# copies every file under static/ into static/dist/ with a hash of its
+# content in the name (css/main.css -> css/main.3f9a1c07d2.css), minifying
+# the CSS and JS that is not minified yet, and writes a gzip sibling
+# (main.3f9a1c07d2.css.gz) next to every text asset that compresses. A file
+# with a .min sibling (bootstrap.css next to bootstrap.min.css) is not built
+# on its own: both names point at the minified build. url(...) references
+# in CSS and sourceMappingURL comments are rewritten to the hashed names.
+# static/dist/manifest.json maps each source path to its build.
+#
+# Templates link assets with static_url('css/main.css'), which returns
+# /assets/css/main.3f9a1c07d2.css when the manifest has the file and the
+# plain /static/ URL otherwise (no build yet, or a file that is missing).
+# A hashed name never changes content, so /assets/ responses are cached
+# for ASSETS_MAX_AGE with Cache-Control: immutable. Clients that accept
+# gzip get the .gz file. Files go out through the WSGI server's file
+# wrapper, which is sendfile() under gunicorn, or as X-Sendfile with
+# USE_X_SENDFILE.
+#
+# A build never deletes older hashed files, so pages rendered from the
+# previous manifest keep working while workers restart; --clean removes
+# what the new manifest does not reference. Workers read the manifest at
+# startup.
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 10
+# Text formats worth a .gz sibling; images and woff are compressed already.
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.eot', '.otf', '.ttf')
+# Kept only when gzip saves at least this fraction.
+MIN_SAVING = 0.1
+# Built after everything else, since they refer to other assets.
+REFERRERS = ('.css', '.js')
+
+_CSS_STRING = r'"(?:\\.|[^"\\\n])*"' + r"|'(?:\\.|[^'\\\n])*'"
+# Both passes match strings first so nothing inside one is touched.
+_CSS_COMMENTS = re.compile(rf'({_CSS_STRING}|/\*!.*?\*/)|/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(rf'({_CSS_STRING})|\s*([{{}};,>])\s*|(:)\s+|(\s+)')
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_SOURCE_MAP = re.compile(r'(sourceMappingURL=)(\S+)')
+_REFERENCE = re.compile(r'([^?#]*)(.*)', re.S)
+
+
+def minify_css(source):
+    # Comments go first (/*! license */ ones stay), then the whitespace
+    # around punctuation; any other run of whitespace becomes one space.
+    text = _CSS_COMMENTS.sub(lambda m: m.group(1) or '', source)
+
+    def space(match):
+        string, punctuation, colon, _ = match.groups()
+        return string or punctuation or colon or ' '
+    return _CSS_SPACE.sub(space, text).strip()
+
+
+def minify_js(source):
+    # Whitespace only: indentation, blank lines and whole-line // comments.
+    # Line breaks stay, so automatic semicolon insertion is unaffected.
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+def _minified_name(path):
+    stem, ext = posixpath.splitext(path)
+    return f'{stem}.min{ext}'
+
+
+def _is_minified(path):
+    return posixpath.splitext(posixpath.splitext(path)[0])[1] == '.min'
+
+
+def _hashed_name(path, content):
+    stem, ext = posixpath.splitext(path)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def _rewrite(text, path, manifest):
+    '''Points relative references of the asset at `path` to their hashed builds.'''
+    base = posixpath.dirname(path)
+
+    def resolve(reference):
+        if reference.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return reference
+        target, suffix = _REFERENCE.match(reference).groups()
+        built = manifest.get(posixpath.normpath(posixpath.join(base, target)))
+        if built is None:
+            return reference
+        return posixpath.relpath(built, base or '.') + suffix
+
+    text = _CSS_URL.sub(lambda m: f'url({m.group(1)}{resolve(m.group(2))}{m.group(1)})', text)
+    return _SOURCE_MAP.sub(lambda m: m.group(1) + resolve(m.group(2)), text)
+
+
+def _sources(source_dir):
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and
+                         os.path.join(root, d) != os.path.join(source_dir, DIST))
+        for name in files:
+            if not name.startswith('.'):
+                yield os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/')
+
+
+def _write(path, content):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def build(source_dir, clean=False, echo=print):
+    '''Builds static/ into static/dist/ and writes the manifest. Returns the manifest.'''
+    output_dir = os.path.join(source_dir, DIST)
+    sources = list(_sources(source_dir))
+    available = set(sources)
+    manifest, compressed = {}, []
+    size_before = size_after = size_gzip = 0
+
+    for path in sorted(sources, key=lambda p: (posixpath.splitext(p)[1] in REFERRERS, p)):
+        if not _is_minified(path) and _minified_name(path) in available:
+            continue
+        with open(os.path.join(source_dir, path), 'rb') as f:
+            content = f.read()
+        size_before += len(content)
+
+        ext = posixpath.splitext(path)[1]
+        if ext in REFERRERS:
+            text = content.decode('utf-8')
+            if not _is_minified(path):
+                text = minify_css(text) if ext == '.css' else minify_js(text)
+            content = _rewrite(text, path, manifest).encode('utf-8')
+        size_after += len(content)
+
+        built = _hashed_name(path, content)
+        manifest[path] = built
+        _write(os.path.join(output_dir, built), content)
+
+        if ext in COMPRESSIBLE:
+            packed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(packed) <= len(content) * (1 - MIN_SAVING):
+                _write(os.path.join(output_dir, built + '.gz'), packed)
+                compressed.append(built)
+                size_gzip += len(packed)
+            else:
+                size_gzip += len(content)
+        else:
+            size_gzip += len(content)
+
+    for path in sources:
+        if path not in manifest and _minified_name(path) in manifest:
+            manifest[path] = manifest[_minified_name(path)]
+
+    data = {"assets": dict(sorted(manifest.items())), "compressed": sorted(compressed)}
+    tmp = os.path.join(output_dir, f'{MANIFEST}.tmp')
+    os.makedirs(output_dir, exist_ok=True)
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, os.path.join(output_dir, MANIFEST))
+
+    removed = 0
+    if clean:
+        keep = set(manifest.values()) | {f'{name}.gz' for name in compressed} | {MANIFEST}
+        for path in list(_sources(output_dir)):
+            if path not in keep:
+                os.remove(os.path.join(output_dir, path))
+                removed += 1
+
+    echo(f'{len(set(manifest.values()))} assets, {len(compressed)} gzipped: '
+         f'{size_before} bytes -> {size_after} minified, {size_gzip} as served to gzip clients'
+         + (f'; removed {removed} stale files' if clean else ''))
+    return data
+
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+assets_blueprint = Blueprint('assets', __name__)
+
+
+class Assets:
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.manifest = {}
+        self.compressed = frozenset()
+        self.max_age = 365 * 24 * 3600
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = os.path.join(app.static_folder, DIST)
+        self.max_age = app.config.get('ASSETS_MAX_AGE', self.max_age)
+        self.load()
+        app.register_blueprint(assets_blueprint)
+        app.add_template_global(self.url, 'static_url')
+        app.extensions['assets'] = self
+
+    def load(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.manifest = data.get('assets', {})
+        self.compressed = frozenset(data.get('compressed', ()))
+
+    def url(self, filename):
+        '''URL of the hashed build of static/<filename>, or its plain static URL.'''
+        built = self.manifest.get(filename)
+        if built is None:
+            return url_for('static', filename=filename)
+        return url_for('assets.asset', filename=built)
+
+
+@assets_blueprint.route('/assets/<path:filename>')
+def asset(filename):
+    assets = current_app.extensions['assets']
+    precompressed = filename in assets.compressed
+    if precompressed and request.accept_encodings.quality('gzip') > 0:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(assets.directory, f'{filename}.gz', mimetype=mimetype,
+                                       max_age=assets.max_age)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_from_directory(assets.directory, filename, max_age=assets.max_age)
+    if precompressed:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+assets = Assets()
+
+
+@click.group('assets')
+def assets_command():
+    '''Build the fingerprinted static assets.'''
+
+
+@assets_command.command('build')
+@click.option('--clean', is_flag=True, help='Remove built files the new manifest does not reference.')
+@with_appcontext
+def build_command(clean):
+    '''Minify, hash and gzip static/ into static/dist/.'''
+    build(current_app.static_folder, clean=clean, echo=click.echo)
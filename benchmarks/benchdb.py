@@ -0,0 +1,114 @@
+#----------------------------------------------------------------------------#
+# Shared setup for the benchmark scripts.
+#
+# Importing this module points the app at FYYUR_BENCH_DATABASE_URI (falling
+# back to the URI in config.py) before app.py is imported, so every script
+# runs against a scratch database instead of the development one.
+#
+# On Postgres the schema is built by the migrations, as in production, so
+# the benchmarks run against the partitioned Show table (d7a3f9e1c5b2), the
+# Booking constraints and the generated search columns rather than the
+# plain tables create_all() would make.
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+from contextlib import contextmanager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if ROOT not in sys.path:
+  sys.path.insert(0, ROOT)
+
+import config
+config.SQLALCHEMY_DATABASE_URI = os.environ.get(
+  'FYYUR_BENCH_DATABASE_URI', config.SQLALCHEMY_DATABASE_URI)
+
+from flask import current_app
+from sqlalchemy import event, text
+from models import db
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+
+
+def reset_schema():
+  # Drops and recreates every table in the bench database.
+  db.session.remove()
+  if db.engine.dialect.name != 'postgresql':
+    db.drop_all()
+    db.create_all()
+    return
+  with db.engine.begin() as connection:
+    connection.execute(text('DROP SCHEMA IF EXISTS archive CASCADE'))
+    connection.execute(text('DROP SCHEMA public CASCADE'))
+    connection.execute(text('CREATE SCHEMA public'))
+  from flask_migrate import Migrate, upgrade
+  Migrate(current_app, db, directory=MIGRATIONS)
+  upgrade(directory=MIGRATIONS)
+
+
+def cover_months(first, last):
+  # Adds the Show partitions for first..last that `flask partitions create`
+  # would have made over time, so old and far-off shows do not all pile up
+  # in the default partition.
+  import partitions
+  connection = db.session.connection()
+  if not partitions.is_partitioned(connection):
+    return
+  existing = {month for month, _ in partitions.partitions(connection)}
+  month, last = partitions.month_start(first), partitions.month_start(last)
+  while month <= last:
+    if month not in existing:
+      partitions.create_partition(connection, month)
+    month = partitions.month_start(month, 1)
+  db.session.commit()
+
+
+@contextmanager
+def bookings_deferred():
+  # Random bench shows clash. Load them with the booking trigger off, then
+  # book them in one pass, leaving the clashing ones unbooked as migration
+  # b5d8f1a3c6e9 does for existing data.
+  import scheduling
+  connection = db.session.connection()
+  if not scheduling.has_bookings(connection):
+    yield
+    return
+  connection.execute(text('ALTER TABLE "Show" DISABLE TRIGGER show_booked'))
+  db.session.commit()
+  try:
+    yield
+  finally:
+    db.session.rollback()
+    connection = db.session.connection()
+    connection.execute(text('ALTER TABLE "Show" ENABLE TRIGGER show_booked'))
+    scheduling.book_shows_from(connection, 'Show')
+    db.session.commit()
+
+
+def disable_page_cache():
+  # Query-count benchmarks measure the handlers, not cache hits.
+  from cache import page_cache
+  page_cache.enabled = False
+
+
+class QueryCounter:
+  # Context manager collecting every statement sent to the engine.
+
+  def __init__(self, engine=None):
+    self.engine = engine
+    self.statements = []
+
+  def _record(self, conn, cursor, statement, parameters, context, executemany):
+    self.statements.append(statement)
+
+  def __enter__(self):
+    self.engine = self.engine or db.engine
+    event.listen(self.engine, 'before_cursor_execute', self._record)
+    return self
+
+  def __exit__(self, *exc):
+    event.remove(self.engine, 'before_cursor_execute', self._record)
+
+  @property
+  def count(self):
+    return len(self.statements)
@@ -0,0 +1,127 @@
+#----------------------------------------------------------------------------#
+# Benchmark: calendar range queries (calendars.py) on the bench database.
+#
+# For random venues, artists and cities and random ranges of --days days,
+# times calendars.calendar_days(), which groups by day in SQL, against
+# fetching the same shows and bucketing them by day in Python, and checks
+# both agree. The Show indexes in the plan of one query of each kind are
+# printed; a city query uses ix_show_start_time_brin only when the city has
+# many venues for the shows in the range.
+#
+# Read-only: nothing is written to the database.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/calendars.py [--queries 200] [--days 7]
+#----------------------------------------------------------------------------#
+
+import argparse
+import random
+import re
+import time
+from datetime import datetime, time as midnight, timedelta
+
+from benchdb import disable_page_cache
+from app import create_app
+import calendars
+from models import db, Venue, Artist, Show
+
+app = create_app()
+
+
+def python_days(first, last, venue_id=None, artist_id=None, city=None, state=None):
+  # The same shows, one row each, bucketed here instead of in SQL.
+  start, stop = datetime.combine(first, midnight()), datetime.combine(last + timedelta(days=1), midnight())
+  query = (
+    db.select(Show.id, Show.start_time, Show.duration, Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+              Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+              Artist.image_link.label('artist_image_link'))
+    .join(Venue, Show.venue_id == Venue.id)
+    .join(Artist, Show.artist_id == Artist.id)
+    .where(Show.start_time >= start, Show.start_time < stop)
+    .order_by(Show.start_time, Show.id)
+  )
+  if venue_id is not None:
+    query = query.where(Show.venue_id == venue_id)
+  if artist_id is not None:
+    query = query.where(Show.artist_id == artist_id)
+  if city is not None:
+    query = query.where(Venue.city == city)
+  if state:
+    query = query.where(Venue.state == state)
+  days = {}
+  for row in db.session.execute(query):
+    days.setdefault(row.start_time.date(), []).append(row.id)
+  return [(day, ids) for day, ids in sorted(days.items())]
+
+
+def sql_days(**filters):
+  return [(day['day'], [show['id'] for show in day['shows']]) for day in calendars.calendar_days(**filters)]
+
+
+def plan(filters):
+  # Index names in the EXPLAIN of one calendar query.
+  statements = []
+
+  @db.event.listens_for(db.engine, 'before_cursor_execute')
+  def capture(conn, cursor, statement, parameters, context, executemany):
+    statements.append((statement, parameters))
+
+  try:
+    calendars.calendar_days(**filters)
+  finally:
+    db.event.remove(db.engine, 'before_cursor_execute', capture)
+  statement, parameters = statements[-1]
+  cursor = db.session.connection().connection.cursor()
+  cursor.execute('EXPLAIN ' + statement, parameters)
+  text = '\n'.join(line for line, in cursor.fetchall())
+  return sorted(set(re.findall(r'ix_show_\w+', text))) or ['no Show index']
+
+
+def timed(function, cases):
+  timings, results = [], []
+  for filters in cases:
+    started = time.perf_counter()
+    results.append(function(**filters))
+    timings.append((time.perf_counter() - started) * 1000)
+  timings.sort()
+  return timings, results
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--queries', type=int, default=200)
+  parser.add_argument('--days', type=int, default=7)
+  args = parser.parse_args()
+
+  rng = random.Random(25)
+  disable_page_cache()
+  with app.app_context():
+    first_day, last_day = (value.date() for value in db.session.execute(
+      db.select(db.func.min(Show.start_time), db.func.max(Show.start_time))).one())
+    venues = db.session.execute(db.select(db.func.max(Venue.id))).scalar()
+    artists = db.session.execute(db.select(db.func.max(Artist.id))).scalar()
+    cities = db.session.execute(db.select(Venue.city, Venue.state).distinct()).all()
+
+    def days():
+      first = first_day + timedelta(days=rng.randrange((last_day - first_day).days))
+      return {"first": first, "last": first + timedelta(days=args.days - 1)}
+
+    kinds = {
+      'venue': lambda: {"venue_id": rng.randint(1, venues), **days()},
+      'artist': lambda: {"artist_id": rng.randint(1, artists), **days()},
+      'city': lambda: dict(zip(('city', 'state'), rng.choice(cities)), **days()),
+    }
+    for kind, case in kinds.items():
+      cases = [case() for _ in range(args.queries)]
+      sql, found = timed(sql_days, cases)
+      python, expected = timed(python_days, cases)
+      assert found == expected
+      shows = sum(len(ids) for result in found for _, ids in result)
+      print(f'{kind:<6} {", ".join(plan(cases[0])):<32} SQL days p50 {sql[len(sql) // 2]:6.2f} '
+            f'p95 {sql[int(len(sql) * 0.95)]:6.2f} ms   Python days p50 {python[len(python) // 2]:6.2f} '
+            f'p95 {python[int(len(python) * 0.95)]:6.2f} ms   {shows / len(cases):.1f} shows per calendar')
+    db.session.remove()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,102 @@
+#----------------------------------------------------------------------------#
+# Benchmark: bytes saved and CPU spent by the gzip middleware, per level.
+#
+# Renders a few real responses from the bench database (run generate.py
+# first for realistic sizes), then pushes each body through GzipMiddleware
+# at every compression level and reports the compressed size and the CPU
+# time per response. The NDJSON export is fed in one line per chunk, the
+# way the API streams it, so the flushing cost is included.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/compression.py [--repeat 20]
+#----------------------------------------------------------------------------#
+
+import argparse
+import time
+
+from benchdb import disable_page_cache
+from app import create_app
+from compression import GzipMiddleware
+from models import db, Venue, Artist
+
+app = create_app()
+
+LEVELS = range(1, 10)
+NDJSON_ROWS = 5000
+
+
+def capture(client, url):
+  response = client.get(url)
+  assert response.status_code == 200, (url, response.status_code)
+  assert 'Content-Encoding' not in response.headers
+  return response.mimetype, response.get_data()
+
+
+def bodies():
+  with app.app_context():
+    venue_id = db.session.execute(db.select(db.func.min(Venue.id))).scalar()
+    artist_id = db.session.execute(db.select(db.func.min(Artist.id))).scalar()
+  client = app.test_client()
+  pages = {
+    '/venues': '/venues',
+    '/artists': '/artists',
+    '/shows': '/shows',
+    '/venues/<id>': f'/venues/{venue_id}',
+    '/artists/<id>': f'/artists/{artist_id}',
+    '/api/v1/venues': '/api/v1/venues?limit=100',
+  }
+  captured = {}
+  for name, url in pages.items():
+    mimetype, body = capture(client, url)
+    captured[name] = (mimetype, [body])
+  mimetype, body = capture(client, '/api/v1/venues?format=ndjson')
+  lines = body.splitlines(keepends=True)[:NDJSON_ROWS]
+  captured['ndjson export'] = (mimetype, lines)
+  return captured
+
+
+def compress(chunks, mimetype, level):
+  def wsgi_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', mimetype)])
+    return chunks
+
+  middleware = GzipMiddleware(wsgi_app, level=level, min_size=0, mimetypes=[mimetype])
+  body = middleware({'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': 'gzip'}, lambda *args: None)
+  size = sum(len(data) for data in body)
+  body.close()
+  return size
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+  disable_page_cache()
+
+  captured = bodies()
+  print(f"{'response':<16} {'raw':>9}" + ''.join(f'  {"level " + str(level):>17}' for level in LEVELS))
+  totals = {level: [0, 0.0] for level in LEVELS}
+  raw_total = 0
+  for name, (mimetype, chunks) in captured.items():
+    raw = sum(map(len, chunks))
+    raw_total += raw
+    cells = []
+    for level in LEVELS:
+      started = time.process_time()
+      for _ in range(args.repeat):
+        size = compress(chunks, mimetype, level)
+      cpu = (time.process_time() - started) / args.repeat
+      totals[level][0] += size
+      totals[level][1] += cpu
+      cells.append(f'{size:>8} {cpu * 1000:>6.2f}ms')
+    print(f'{name:<16} {raw:>9}  ' + '  '.join(cells))
+
+  print()
+  print(f"{'level':>5} {'bytes':>10} {'saved':>7} {'cpu/resp set':>13} {'MB/s':>8}")
+  for level, (size, cpu) in totals.items():
+    saved = 1 - size / raw_total
+    print(f'{level:>5} {size:>10} {saved:>7.1%} {cpu * 1000:>10.2f} ms {raw_total / cpu / 1e6:>8.1f}')
+
+
+if __name__ == '__main__':
+  main()
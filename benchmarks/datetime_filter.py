@@ -0,0 +1,74 @@
+#----------------------------------------------------------------------------#
+# Micro-benchmark for the `datetime` Jinja filter.
+#
+# Compares the original filter (strftime in the route, dateutil parse and a
+# fresh Babel pattern parse per call) against the current one, over a
+# /shows-like workload: many tiles sharing a smaller set of start times.
+# No database is needed.
+#
+#   python benchmarks/datetime_filter.py
+#----------------------------------------------------------------------------#
+
+import random
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from benchdb import ROOT  # noqa: F401  (puts the repo root on sys.path)
+import app as fyyur
+
+TILES = 5000
+DISTINCT_TIMES = 500
+REPEAT = 5
+
+
+def original_filter(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+  rng = random.Random(7)
+  base = datetime(2026, 1, 1, 20, 0)
+  times = [base + timedelta(hours=rng.randint(0, 24 * 365)) for _ in range(DISTINCT_TIMES)]
+  tiles = [rng.choice(times) for _ in range(TILES)]
+  strings = [t.strftime('%Y-%m-%dT%H:%M:%S.000Z') for t in tiles]
+
+  format_datetime = fyyur.datetime_filter(0)
+  for value, string in zip(tiles[:200], strings[:200]):
+    assert format_datetime(value, 'full') == original_filter(string, 'full')
+    assert format_datetime(value, 'medium') == original_filter(string, 'medium')
+
+  def run_original():
+    for string in strings:
+      original_filter(string, 'full')
+
+  def run_uncached():
+    for value in tiles:
+      fyyur._format_datetime(value, 'full', 'en')
+
+  def run_memoized():
+    memoized = fyyur.datetime_filter(TILES)
+    for value in tiles:
+      memoized(value, 'full')
+
+  results = {}
+  for name, fn in [('original (str + dateutil + babel)', run_original),
+                   ('native datetime, cached pattern', run_uncached),
+                   ('native datetime, memoized', run_memoized)]:
+    results[name] = min(timeit.repeat(fn, number=1, repeat=REPEAT))
+
+  baseline = results['original (str + dateutil + babel)']
+  print(f'{TILES} tiles, {DISTINCT_TIMES} distinct start times, best of {REPEAT}')
+  for name, seconds in results.items():
+    print(f'  {name:<36} {seconds * 1000:8.1f} ms  {baseline / seconds:6.1f}x')
+
+
+if __name__ == '__main__':
+  main()
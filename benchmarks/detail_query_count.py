@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------------#
+# Benchmark: SQL statements per request on the venue and artist pages.
+#
+# Seeds one venue booked by N different artists and one artist booked at N
+# different venues (half of the shows past, half upcoming), then counts the
+# statements for GET /venues/<id> and GET /artists/<id>. Any lazy load per
+# show would make the count grow with N; the script fails if it does.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/detail_query_count.py
+#
+# WARNING: the tables in the target database are dropped and recreated.
+#----------------------------------------------------------------------------#
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchdb import QueryCounter, disable_page_cache, reset_schema
+from app import create_app
+from models import db, Venue, Artist, Show
+
+app = create_app()
+
+SIZES = [0, 10, 100, 500]
+# The page's own two queries plus the ETag validator query (conditional.py).
+EXPECTED = {'venue': 3, 'artist': 3}
+
+
+def seed(num_shows):
+  reset_schema()
+  venue = Venue(name='Bench Venue', city='San Francisco', state='CA', genres=['Jazz'])
+  artist = Artist(name='Bench Artist', city='San Francisco', state='CA', genres=['Jazz'])
+  db.session.add_all([venue, artist])
+  db.session.flush()
+
+  other_artists = [Artist(name=f'Artist {i}', genres=['Jazz']) for i in range(num_shows)]
+  other_venues = [Venue(name=f'Venue {i}', genres=['Jazz']) for i in range(num_shows)]
+  db.session.add_all(other_artists + other_venues)
+  db.session.flush()
+
+  now = datetime.now()
+  for i in range(num_shows):
+    start_time = now + timedelta(days=i - num_shows // 2)
+    db.session.add(Show(venue_id=venue.id, artist_id=other_artists[i].id, start_time=start_time))
+    db.session.add(Show(venue_id=other_venues[i].id, artist_id=artist.id, start_time=start_time))
+  db.session.commit()
+  ids = venue.id, artist.id
+  db.session.remove()
+  return ids
+
+
+def measure(client, url):
+  with QueryCounter() as queries:
+    started = time.perf_counter()
+    response = client.get(url)
+    elapsed = time.perf_counter() - started
+  db.session.remove()
+  assert response.status_code == 200, response.status_code
+  return queries.count, elapsed
+
+
+def main():
+  disable_page_cache()
+  failed = False
+  with app.app_context():
+    client = app.test_client()
+    for size in SIZES:
+      venue_id, artist_id = seed(size)
+      for page, url in [('venue', f'/venues/{venue_id}'), ('artist', f'/artists/{artist_id}')]:
+        queries, elapsed = measure(client, url)
+        status = 'ok' if queries == EXPECTED[page] else f'FAIL (expected {EXPECTED[page]})'
+        failed = failed or queries != EXPECTED[page]
+        print(f"{page:<6} shows={size:>4}  queries={queries:>3}  time={elapsed * 1000:8.1f} ms  {status}")
+    db.session.remove()
+    db.drop_all()
+
+  if failed:
+    sys.exit(1)
+  print('OK: detail pages run a fixed number of queries')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,188 @@
+#----------------------------------------------------------------------------#
+# Prints EXPLAIN plans for the queries behind the hot routes so it is easy to
+# check that they use the indexes from migration 3f1c9b7d2a64, and for the
+# searches the search_document GIN indexes of migration d8f3b2a7c1e4.
+#
+# The schema comes from the migrations (benchdb.py), so Show is partitioned
+# by month (d7a3f9e1c5b2), with partitions over the three years of shows.
+# The upcoming-show plans must only scan the partitions from this month on,
+# plus the default one; the script exits non-zero if one scans an older month.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/explain_indexes.py
+#
+# WARNING: the tables in the target database are dropped and recreated.
+#----------------------------------------------------------------------------#
+
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+from benchdb import bookings_deferred, cover_months, reset_schema
+from app import create_app
+import partitions
+import search
+from models import db, Venue, Artist, Show
+
+app = create_app()
+
+NUM_VENUES = 5000
+NUM_ARTISTS = 5000
+NUM_SHOWS = 200000
+
+TRGM_INDEXES = [
+  'CREATE INDEX IF NOT EXISTS ix_venue_name_trgm ON "Venue" USING gin (name gin_trgm_ops)',
+  'CREATE INDEX IF NOT EXISTS ix_artist_name_trgm ON "Artist" USING gin (name gin_trgm_ops)',
+]
+
+WORDS = ['Musical', 'Hop', 'Park', 'Square', 'Live', 'Coffee', 'Sax', 'Band', 'Petals', 'Guns',
+         'Hall', 'Room', 'Club', 'Lounge', 'Garden', 'Theatre', 'Studio', 'Cellar', 'Barn', 'Dome']
+
+
+def name(rng, i):
+  return ' '.join(rng.sample(WORDS, 3)) + f' {i}'
+
+
+def seed():
+  rng = random.Random(42)
+  reset_schema()
+  db.session.execute(db.insert(Venue), [
+    {"name": name(rng, i), "city": f"City {i % 300}", "state": "CA", "genres": ['Jazz']}
+    for i in range(NUM_VENUES)
+  ])
+  db.session.execute(db.insert(Artist), [
+    {"name": name(rng, i), "city": f"City {i % 300}", "state": "CA", "genres": ['Jazz']}
+    for i in range(NUM_ARTISTS)
+  ])
+  now = datetime.now()
+  cover_months(now - timedelta(days=365 * 3), now + timedelta(days=90))
+  with bookings_deferred():
+    db.session.execute(db.insert(Show), [
+      {
+        "venue_id": rng.randint(1, NUM_VENUES),
+        "artist_id": rng.randint(1, NUM_ARTISTS),
+        "start_time": now + timedelta(hours=rng.randint(-24 * 365 * 3, 24 * 90)),
+      }
+      for _ in range(NUM_SHOWS)
+    ])
+    db.session.commit()
+
+  trgm = True
+  try:
+    db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    for ddl in TRGM_INDEXES:
+      db.session.execute(db.text(ddl))
+    db.session.commit()
+  except Exception as e:
+    db.session.rollback()
+    print(f'pg_trgm unavailable, skipping trigram indexes: {e.__class__.__name__}')
+    trgm = False
+  db.session.commit()
+  # VACUUM as well: rows inserted after a GIN index was built wait in its
+  # pending list, which every search reads in full until it is flushed.
+  with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+    connection.execute(db.text('VACUUM ANALYZE'))
+  return trgm
+
+
+PARTITION_RE = re.compile(rf'\b({partitions.PARENT}_(?:p\d{{4}}_\d{{2}}|default))\b')
+
+
+def explain(title, query, since=None):
+  # With `since`, also checks the plan only scans the Show partitions that
+  # can hold shows from then on.
+  sql = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+  plan = db.session.execute(db.text(f'EXPLAIN {sql}')).scalars().all()
+  print(f'--- {title}')
+  for line in plan:
+    print(line)
+  if since is not None:
+    check_partitions(title, plan, since)
+  print()
+
+
+def check_partitions(title, plan, since):
+  scanned = sorted(set(PARTITION_RE.findall('\n'.join(plan))))
+  first = partitions.partition_name(partitions.month_start(since))
+  total = len(partitions.partitions(db.session.connection())) + 1
+  print(f'{len(scanned)} of {total} Show partitions scanned: {", ".join(scanned)}')
+  older = [name for name in scanned if name != partitions.DEFAULT_PARTITION and name < first]
+  if not scanned or older:
+    sys.exit(f'{title}: expected only partitions from {first} on, got {", ".join(scanned) or "no partition"}')
+
+
+def explain_search(title, model, term):
+  # The statement search.py sends, with its parameters, as EXPLAIN ANALYZE.
+  statements = []
+
+  def capture(conn, cursor, statement, parameters, context, executemany):
+    statements.append((statement, parameters))
+
+  db.event.listen(db.engine, 'before_cursor_execute', capture)
+  try:
+    search.search(model, term)
+  finally:
+    db.event.remove(db.engine, 'before_cursor_execute', capture)
+  statement, parameters = statements[-1]
+  cursor = db.session.connection().connection.cursor()
+  cursor.execute(f'EXPLAIN ANALYZE {statement}', parameters)
+  print(f'--- {title}')
+  for line, in cursor.fetchall():
+    print(line)
+  print()
+
+
+def main():
+  with app.app_context():
+    trgm = seed()
+    now = datetime.now()
+
+    upcoming = (
+      db.select(db.func.count(Show.id))
+      .where(Show.venue_id == Venue.id, Show.start_time >= now)
+      .scalar_subquery()
+    )
+    explain('GET /venues', (
+      db.session.query(Venue.city, Venue.state, Venue.id, Venue.name, upcoming)
+      .order_by(*Venue.area_sort_key())
+      .limit(51)
+    ))
+    explain('GET /venues/<id> (upcoming)', (
+      db.session.query(Show.start_time, Artist.id, Artist.name)
+      .join(Artist, Show.artist_id == Artist.id)
+      .filter(Show.venue_id == 42, Show.start_time >= now)
+    ), since=now)
+    explain('GET /artists/<id> (upcoming)', (
+      db.session.query(Show.start_time, Venue.id, Venue.name)
+      .join(Venue, Show.venue_id == Venue.id)
+      .filter(Show.artist_id == 42, Show.start_time >= now)
+    ), since=now)
+    explain('Venue areas lookup (city, state)', (
+      db.session.query(Venue.id).filter(Venue.city == 'City 7', Venue.state == 'CA')
+    ))
+    explain('GET /artists?after=<deep cursor>', (
+      db.session.query(Artist.id, Artist.name)
+      .filter(db.tuple_(*Artist.name_sort_key()) > db.tuple_('Park', 4000))
+      .order_by(*Artist.name_sort_key())
+      .limit(51)
+    ))
+    explain('GET /shows?after=<deep cursor>', (
+      db.session.query(Show.id, Show.start_time)
+      .filter(Show.start_time > now)
+      .filter(db.tuple_(Show.start_time, Show.id) > db.tuple_(now + timedelta(days=60), 0))
+      .order_by(Show.start_time, Show.id)
+      .limit(51)
+    ), since=now)
+    if trgm:
+      explain('Venue.name ILIKE', db.session.query(Venue.id).filter(Venue.name.ilike('%usic%')))
+      explain('Artist.name ILIKE', db.session.query(Artist.id).filter(Artist.name.ilike('%band%')))
+    explain_search('POST /venues/search "sax petal"', Venue, 'sax petal')
+    explain_search('POST /artists/search "Cellar 12"', Artist, 'Cellar 12')
+
+    db.session.remove()
+    db.drop_all()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,207 @@
+#----------------------------------------------------------------------------#
+# Synthetic dataset for the load tests.
+#
+# Fills the bench database with venues, artists and shows shaped like the
+# real thing: venues clustered in a few dozen cities, genres drawn from
+# forms.genres_choices, and bookings skewed so a handful of venues and
+# artists carry most of the shows. The same --seed always produces the same
+# rows, so results from different commits are comparable.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/generate.py                  # 50k / 200k / 5M
+#   python benchmarks/generate.py --scale 0.01       # 500 / 2k / 50k
+#
+# Show start times are spread over a year either side of --anchor (today by
+# default), so about half of them are upcoming. Rows are loaded with COPY on
+# Postgres and batched INSERTs elsewhere, CHUNK_SIZE rows per transaction.
+#
+# WARNING: the tables in the target database are dropped and recreated.
+#----------------------------------------------------------------------------#
+
+import argparse
+import itertools
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+
+from benchdb import bookings_deferred, cover_months, reset_schema
+from app import create_app
+from forms import genres_choices
+from counters import reconcile
+from genres import recount
+from importer import copy_rows, insert_rows
+from models import db, Venue, Artist, Show
+
+app = create_app()
+
+VENUES = 50000
+ARTISTS = 200000
+SHOWS = 5000000
+CHUNK_SIZE = 50000
+
+# Bookings per venue/artist follow a Zipf-like curve with this exponent.
+SKEW = 0.8
+
+CITIES = [
+  ('New York', 'NY'), ('Brooklyn', 'NY'), ('Los Angeles', 'CA'), ('San Francisco', 'CA'),
+  ('Oakland', 'CA'), ('San Diego', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+  ('Austin', 'TX'), ('Dallas', 'TX'), ('Phoenix', 'AZ'), ('Philadelphia', 'PA'),
+  ('Pittsburgh', 'PA'), ('Seattle', 'WA'), ('Portland', 'OR'), ('Denver', 'CO'),
+  ('Boston', 'MA'), ('Nashville', 'TN'), ('Memphis', 'TN'), ('Atlanta', 'GA'),
+  ('Miami', 'FL'), ('Orlando', 'FL'), ('New Orleans', 'LA'), ('Detroit', 'MI'),
+  ('Minneapolis', 'MN'), ('St. Louis', 'MO'), ('Kansas City', 'MO'), ('Cleveland', 'OH'),
+  ('Columbus', 'OH'), ('Baltimore', 'MD'), ('Washington', 'DC'), ('Las Vegas', 'NV'),
+  ('Salt Lake City', 'UT'), ('Albuquerque', 'NM'), ('Charlotte', 'NC'), ('Richmond', 'VA'),
+  ('Milwaukee', 'WI'), ('Louisville', 'KY'), ('Omaha', 'NE'), ('Honolulu', 'HI'),
+]
+
+VENUE_WORDS = (
+  ['The', 'Old', 'Blue', 'Golden', 'Velvet', 'Electric', 'Crooked', 'Silver', 'Red', 'Little'],
+  ['Hop', 'Lounge', 'Hall', 'Room', 'Tavern', 'Theatre', 'Garden', 'Cellar', 'Warehouse', 'Club'],
+)
+ARTIST_WORDS = (
+  ['Wild', 'Quiet', 'Neon', 'Lonesome', 'Midnight', 'Paper', 'Iron', 'Sugar', 'Static', 'Honey'],
+  ['Sax', 'Petals', 'Wolves', 'Radio', 'Saints', 'Echoes', 'Owls', 'Harbor', 'Engine', 'Rivers'],
+  ['Band', 'Trio', 'Collective', 'Orchestra', 'Project', 'Quartet', 'Club', 'Society', '', ''],
+)
+GENRES = [value for value, _ in genres_choices]
+
+
+def _genres(rng):
+  return rng.sample(GENRES, rng.choice([1, 1, 2, 2, 3]))
+
+
+def _phone(rng):
+  return f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}'
+
+
+def venue_rows(rng, count):
+  first, second = VENUE_WORDS
+  for i in range(1, count + 1):
+    city, state = rng.choice(CITIES)
+    seeking = rng.random() < 0.3
+    yield {
+      "name": f'{rng.choice(first)} {rng.choice(second)} {i}',
+      "city": city,
+      "state": state,
+      "address": f'{rng.randint(1, 9999)} {rng.choice(second)} Street',
+      "phone": _phone(rng),
+      "image_link": f'https://images.example.com/venues/{i}.jpg',
+      "facebook_link": f'https://www.facebook.com/venue{i}',
+      "genres": _genres(rng),
+      "seeking_talent": seeking,
+      "seeking_description": 'Looking for local acts on weekends.' if seeking else None,
+      "website": f'https://venue{i}.example.com',
+    }
+
+
+def artist_rows(rng, count):
+  first, second, third = ARTIST_WORDS
+  for i in range(1, count + 1):
+    city, state = rng.choice(CITIES)
+    seeking = rng.random() < 0.4
+    name = ' '.join(word for word in (rng.choice(first), rng.choice(second), rng.choice(third)) if word)
+    yield {
+      "name": f'{name} {i}',
+      "city": city,
+      "state": state,
+      "phone": _phone(rng),
+      "genres": _genres(rng),
+      "image_link": f'https://images.example.com/artists/{i}.jpg',
+      "facebook_link": f'https://www.facebook.com/artist{i}',
+      "seeking_venue": seeking,
+      "seeking_description": 'Touring this season, open to bookings.' if seeking else None,
+      "website": f'https://artist{i}.example.com',
+    }
+
+
+def _popularity(count):
+  # Cumulative weights of a Zipf-like curve; id 1 is the busiest.
+  return list(itertools.accumulate(1 / (rank ** SKEW) for rank in range(1, count + 1)))
+
+
+def _pick(rng, cumulative):
+  return bisect(cumulative, rng.random() * cumulative[-1]) + 1
+
+
+def show_rows(rng, count, venues, artists, anchor):
+  venue_weights = _popularity(venues)
+  artist_weights = _popularity(artists)
+  # Shift the popularity ranking so the busiest venue is not always id 1.
+  venue_offset = rng.randrange(venues)
+  artist_offset = rng.randrange(artists)
+  for _ in range(count):
+    # Evening slots on the quarter hour, between the anchor time and +5h.
+    start_time = anchor + timedelta(days=rng.randint(-365, 365), minutes=15 * rng.randrange(20))
+    yield {
+      "venue_id": (_pick(rng, venue_weights) + venue_offset - 1) % venues + 1,
+      "artist_id": (_pick(rng, artist_weights) + artist_offset - 1) % artists + 1,
+      "start_time": start_time,
+    }
+
+
+def load(model, rows, chunk_size, echo=print):
+  use_copy = db.session.get_bind().dialect.name == 'postgresql'
+  write = copy_rows if use_copy else insert_rows
+  loaded = 0
+  started = time.perf_counter()
+  while True:
+    chunk = list(itertools.islice(rows, chunk_size))
+    if not chunk:
+      break
+    write(model, list(chunk[0]), chunk)
+    db.session.commit()
+    loaded += len(chunk)
+    elapsed = time.perf_counter() - started
+    echo(f'{model.__tablename__:<7} {loaded:>9} rows  {loaded / elapsed:>9.0f} rows/s')
+  return loaded
+
+
+def generate(venues=VENUES, artists=ARTISTS, shows=SHOWS, seed=1, anchor=None, chunk_size=CHUNK_SIZE, echo=print):
+  '''Recreates the schema and loads the dataset. Returns its description.'''
+  anchor = anchor or datetime.now().replace(hour=19, minute=0, second=0, microsecond=0)
+  rng = random.Random(seed)
+  reset_schema()
+  cover_months(anchor - timedelta(days=365), anchor + timedelta(days=366))
+  load(Venue, venue_rows(rng, venues), chunk_size, echo)
+  load(Artist, artist_rows(rng, artists), chunk_size, echo)
+  if venues and artists:
+    with bookings_deferred():
+      load(Show, show_rows(rng, shows, venues, artists, anchor), chunk_size, echo)
+  # COPY bypasses the counter bookkeeping; fill the counters in one pass.
+  reconcile(repair=True, echo=lambda line: None)
+  recount(db.session.connection())
+  db.session.commit()
+  if db.session.get_bind().dialect.name == 'postgresql':
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+  db.session.remove()
+  return {"seed": seed, "venues": venues, "artists": artists, "shows": shows, "anchor": anchor.isoformat()}
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Load a synthetic Fyyur dataset into the bench database.')
+  parser.add_argument('--venues', type=int, default=VENUES)
+  parser.add_argument('--artists', type=int, default=ARTISTS)
+  parser.add_argument('--shows', type=int, default=SHOWS)
+  parser.add_argument('--scale', type=float, default=1.0, help='Multiplies all three counts.')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--anchor', type=datetime.fromisoformat, help='Centre of the show dates (default: today 19:00).')
+  parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+  args = parser.parse_args()
+
+  with app.app_context():
+    dataset = generate(
+      venues=int(args.venues * args.scale),
+      artists=int(args.artists * args.scale),
+      shows=int(args.shows * args.scale),
+      seed=args.seed,
+      anchor=args.anchor,
+      chunk_size=args.chunk_size,
+    )
+  print(f"Generated {dataset['venues']} venues, {dataset['artists']} artists, {dataset['shows']} shows (seed {dataset['seed']})")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,459 @@
+#----------------------------------------------------------------------------#
+# Load test: latency, throughput and SQL statements for every route.
+#
+# Drives each route registered on the app with randomised arguments drawn
+# from the rows in the bench database (load them first with generate.py)
+# and reports, per route, p50/p95/p99 latency, requests per second and the
+# number of SQL statements a request runs.
+#
+#   python benchmarks/generate.py --scale 0.01
+#   python benchmarks/loadtest.py --output bench.json
+#   python benchmarks/loadtest.py --server --concurrency 8 --compare bench.json
+#
+# By default requests go through the Flask test client, in process. --server
+# starts a threaded local WSGI server and sends real HTTP requests from
+# --concurrency client threads instead. The page cache is off unless
+# --page-cache is given, so the numbers describe the handlers themselves.
+# Routes that write (form submissions, DELETE) only run with --writes.
+#
+# --output writes the results as JSON with stable key order, to diff
+# across commits. --compare reads such a file and exits with status 1 when
+# a route's p95 got more than --tolerance slower or it runs more statements.
+#----------------------------------------------------------------------------#
+
+import argparse
+import http.client
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from benchdb import ROOT
+from sqlalchemy import event
+from werkzeug.serving import make_server
+
+from app import create_app
+from forms import genres_choices
+from models import db, Venue, Artist, Show
+
+app = create_app()
+
+REQUESTS = 200
+WARMUP = 5
+TOLERANCE = 0.2
+
+# Endpoints left out of the "not driven" report.
+SKIP_ENDPOINTS = {'static'}
+
+
+#----------------------------------------------------------------------------#
+# SQL statements per request.
+#----------------------------------------------------------------------------#
+
+class StatementCounter:
+  '''
+  WSGI middleware counting the statements each request runs, in the thread
+  that serves it, and reporting them in an X-Bench-Queries header.
+  '''
+
+  def __init__(self, wsgi_app):
+    self.wsgi_app = wsgi_app
+    self.local = threading.local()
+
+  def record(self, *args):
+    if getattr(self.local, 'count', None) is not None:
+      self.local.count += 1
+
+  def __call__(self, environ, start_response):
+    self.local.count = 0
+
+    def counted_start_response(status, headers, exc_info=None):
+      headers.append(('X-Bench-Queries', str(self.local.count)))
+      return start_response(status, headers, exc_info)
+
+    try:
+      return self.wsgi_app(environ, counted_start_response)
+    finally:
+      self.local.count = None
+
+
+#----------------------------------------------------------------------------#
+# Scenarios.
+#----------------------------------------------------------------------------#
+
+class Scenario:
+  # One route: `build(rng)` returns (path, form data or None) per request.
+
+  def __init__(self, endpoint, method, build, writes=False):
+    self.endpoint = endpoint
+    self.method = method
+    self.build = build
+    self.writes = writes
+
+  @property
+  def name(self):
+    rule = next(rule for rule in app.url_map.iter_rules(self.endpoint) if self.method in rule.methods)
+    return f'{self.method} {rule.rule}'
+
+
+class Samples:
+  '''Ids and search terms to draw request arguments from, in a stable order.'''
+
+  def __init__(self, terms=1000):
+    def column(column, limit=None, distinct=False):
+      query = db.select(column).order_by(column).limit(limit)
+      return db.session.scalars(query.distinct() if distinct else query).all()
+
+    self.venue_ids = column(Venue.id)
+    self.artist_ids = column(Artist.id)
+    names = column(Venue.name, terms) + column(Artist.name, terms)
+    self.terms = [name.split()[1] for name in names if name and ' ' in name]
+    self.terms += [city for city in column(Venue.city, terms, distinct=True) if city]
+    db.session.remove()
+    if not self.venue_ids or not self.artist_ids:
+      sys.exit('The bench database is empty; run benchmarks/generate.py first.')
+
+
+def _venue_form(rng):
+  return {
+    "name": f'Load Test Venue {rng.randrange(10 ** 6)}',
+    "city": 'San Francisco',
+    "state": 'CA',
+    "address": '1015 Folsom Street',
+    "phone": '123-123-1234',
+    "genres": [rng.choice(genres_choices)[0]],
+    "facebook_link": 'https://www.facebook.com/loadtest',
+    "image_link": 'https://images.example.com/loadtest.jpg',
+    "website_link": 'https://loadtest.example.com',
+    "seeking_description": '',
+  }
+
+
+def _artist_form(rng):
+  form = _venue_form(rng)
+  del form['address']
+  form['name'] = f'Load Test Artist {rng.randrange(10 ** 6)}'
+  return form
+
+
+def _throwaway_venue(rng):
+  # Created outside the timed request so DELETE always has a target.
+  venue = Venue(name=f'Load Test Venue {rng.randrange(10 ** 6)}', genres=['Jazz'])
+  db.session.add(venue)
+  db.session.commit()
+  id = venue.id
+  db.session.remove()
+  return f'/venues/{id}', None
+
+
+def scenarios(samples):
+  venue = lambda rng: rng.choice(samples.venue_ids)
+  artist = lambda rng: rng.choice(samples.artist_ids)
+  term = lambda rng: {"search_term": rng.choice(samples.terms)}
+  start_time = lambda rng: (datetime.now() + timedelta(days=rng.randint(1, 365))).strftime('%Y-%m-%d %H:%M:%S')
+
+  return [
+    Scenario('index', 'GET', lambda rng: ('/', None)),
+    Scenario('venues.venues', 'GET', lambda rng: ('/venues', None)),
+    Scenario('venues.search_venues', 'POST', lambda rng: ('/venues/search', term(rng))),
+    Scenario('venues.show_venue', 'GET', lambda rng: (f'/venues/{venue(rng)}', None)),
+    Scenario('venues.create_venue_form', 'GET', lambda rng: ('/venues/create', None)),
+    Scenario('venues.edit_venue', 'GET', lambda rng: (f'/venues/{venue(rng)}/edit', None)),
+    Scenario('artists.artists', 'GET', lambda rng: ('/artists', None)),
+    Scenario('artists.search_artists', 'POST', lambda rng: ('/artists/search', term(rng))),
+    Scenario('artists.show_artist', 'GET', lambda rng: (f'/artists/{artist(rng)}', None)),
+    Scenario('artists.create_artist_form', 'GET', lambda rng: ('/artists/create', None)),
+    Scenario('artists.edit_artist', 'GET', lambda rng: (f'/artists/{artist(rng)}/edit', None)),
+    Scenario('shows.shows', 'GET', lambda rng: ('/shows', None)),
+    Scenario('shows.create_shows', 'GET', lambda rng: ('/shows/create', None)),
+    Scenario('calendars.venue_calendar', 'GET', lambda rng: (f'/venues/{venue(rng)}/calendar', None)),
+    Scenario('calendars.artist_calendar', 'GET', lambda rng: (f'/artists/{artist(rng)}/calendar?when=weekend', None)),
+    Scenario('calendars.city_calendar', 'GET', lambda rng: ('/calendar?city=San+Francisco&state=CA', None)),
+    Scenario('api.list_venues', 'GET', lambda rng: ('/api/v1/venues', None)),
+    Scenario('api.list_artists', 'GET', lambda rng: ('/api/v1/artists?fields=id,name', None)),
+    Scenario('api.list_shows', 'GET', lambda rng: ('/api/v1/shows', None)),
+    Scenario('api.venues_near', 'GET', lambda rng: (
+      f'/api/v1/venues/near?lat={rng.uniform(25, 49):.4f}&lon={rng.uniform(-124, -70):.4f}', None)),
+    Scenario('api.venue_calendar', 'GET', lambda rng: (f'/api/v1/venues/{venue(rng)}/calendar', None)),
+    Scenario('api.artist_calendar', 'GET', lambda rng: (f'/api/v1/artists/{artist(rng)}/calendar', None)),
+    Scenario('api.city_calendar', 'GET', lambda rng: ('/api/v1/calendar?city=San+Francisco&state=CA', None)),
+
+    Scenario('venues.create_venue_submission', 'POST', lambda rng: ('/venues/create', _venue_form(rng)), writes=True),
+    Scenario('venues.edit_venue_submission', 'POST', lambda rng: (f'/venues/{venue(rng)}/edit', _venue_form(rng)), writes=True),
+    Scenario('venues.delete_venue', 'DELETE', _throwaway_venue, writes=True),
+    Scenario('artists.create_artist_submission', 'POST', lambda rng: ('/artists/create', _artist_form(rng)), writes=True),
+    Scenario('artists.edit_artist_submission', 'POST', lambda rng: (f'/artists/{artist(rng)}/edit', _artist_form(rng)), writes=True),
+    Scenario('shows.create_show_submission', 'POST', lambda rng: ('/shows/create', {
+      "venue_id": venue(rng), "artist_id": artist(rng), "start_time": start_time(rng),
+    }), writes=True),
+  ]
+
+
+def uncovered(selected):
+  '''Endpoint/method pairs on the app that no scenario drives.'''
+  driven = {(scenario.endpoint, scenario.method) for scenario in selected}
+  missing = []
+  for rule in app.url_map.iter_rules():
+    if rule.endpoint in SKIP_ENDPOINTS:
+      continue
+    for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+      if (rule.endpoint, method) not in driven:
+        missing.append(f'{method} {rule.rule}')
+  return sorted(missing)
+
+
+#----------------------------------------------------------------------------#
+# Clients.
+#----------------------------------------------------------------------------#
+
+class TestClient:
+
+  def __init__(self):
+    self.client = app.test_client()
+
+  def request(self, method, path, data):
+    response = self.client.open(path, method=method, data=data)
+    body = response.get_data()
+    queries = int(response.headers.get('X-Bench-Queries', 0))
+    return response.status_code, len(body), queries
+
+  def close(self):
+    pass
+
+
+class HTTPClient:
+
+  def __init__(self, port):
+    self.conn = http.client.HTTPConnection('127.0.0.1', port)
+
+  def request(self, method, path, data):
+    body = urlencode(data, doseq=True) if data is not None else None
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data is not None else {}
+    self.conn.request(method, path, body=body, headers=headers)
+    response = self.conn.getresponse()
+    payload = response.read()
+    return response.status, len(payload), int(response.getheader('X-Bench-Queries', 0))
+
+  def close(self):
+    self.conn.close()
+
+
+class LocalServer:
+  '''Threaded werkzeug server on a free localhost port, run in the background.'''
+
+  def __init__(self, wsgi_app):
+    self.server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+    self.port = self.server.server_port
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+  def __enter__(self):
+    self.thread.start()
+    return self
+
+  def __exit__(self, *exc):
+    self.server.shutdown()
+
+
+#----------------------------------------------------------------------------#
+# Running and reporting.
+#----------------------------------------------------------------------------#
+
+def percentile(values, pct):
+  # Nearest-rank percentile of an already sorted list.
+  if not values:
+    return None
+  rank = max(1, -(-len(values) * pct // 100))
+  return values[int(rank) - 1]
+
+
+def run_scenario(scenario, make_client, requests, concurrency, warmup, seed):
+  # Builds every request up front (DELETE targets included) so only the
+  # requests themselves are timed.
+  rng = random.Random(f'{seed}:{scenario.endpoint}:{scenario.method}')
+  planned = [scenario.build(rng) for _ in range(warmup + requests)]
+  warm, timed = planned[:warmup], planned[warmup:]
+
+  client = make_client()
+  for path, data in warm:
+    client.request(scenario.method, path, data)
+  client.close()
+
+  latencies, queries, statuses = [], [], {}
+  lock = threading.Lock()
+  shares = [timed[i::concurrency] for i in range(concurrency)]
+
+  def worker(share):
+    client = make_client()
+    try:
+      for path, data in share:
+        started = time.perf_counter()
+        status, _, count = client.request(scenario.method, path, data)
+        elapsed = time.perf_counter() - started
+        with lock:
+          latencies.append(elapsed)
+          queries.append(count)
+          statuses[status] = statuses.get(status, 0) + 1
+    finally:
+      client.close()
+
+  started = time.perf_counter()
+  if concurrency == 1:
+    worker(timed)
+  else:
+    threads = [threading.Thread(target=worker, args=(share,)) for share in shares]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+  wall = time.perf_counter() - started
+
+  latencies.sort()
+  return {
+    "requests": len(latencies),
+    "errors": sum(count for status, count in statuses.items() if status >= 500),
+    "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    "rps": round(len(latencies) / wall, 1) if wall else None,
+    "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+    "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+    "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    "max_ms": round(latencies[-1] * 1000, 2),
+    "queries": {
+      "min": min(queries),
+      "max": max(queries),
+      "mean": round(sum(queries) / len(queries), 2),
+    },
+  }
+
+
+def _git_commit():
+  try:
+    return subprocess.run(
+      ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def _dataset():
+  counts = {}
+  for model in (Venue, Artist, Show):
+    counts[model.__tablename__.lower() + 's'] = db.session.scalar(db.select(db.func.count()).select_from(model))
+  db.session.remove()
+  return counts
+
+
+def compare(results, baseline, tolerance):
+  '''Prints per-route deltas against `baseline`; returns the regressed routes.'''
+  for key in ('mode', 'concurrency', 'database', 'dataset', 'page_cache'):
+    if results['meta'][key] != baseline.get('meta', {}).get(key):
+      print(f"warning: {key} differs from the baseline ({baseline.get('meta', {}).get(key)} -> {results['meta'][key]})")
+  regressions = []
+  for name, now in results['routes'].items():
+    before = baseline.get('routes', {}).get(name)
+    if before is None:
+      print(f'{name:<40} new route')
+      continue
+    change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+    more_queries = now['queries']['max'] > before['queries']['max']
+    flags = []
+    if change > tolerance:
+      flags.append(f'p95 +{change:.0%}')
+    if more_queries:
+      flags.append(f"queries {before['queries']['max']} -> {now['queries']['max']}")
+    if flags:
+      regressions.append(name)
+    print(f"{name:<40} p95 {before['p95_ms']:>8.2f} -> {now['p95_ms']:>8.2f} ms ({change:+.0%})  {', '.join(flags) or 'ok'}")
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Drive every Fyyur route and report latency, RPS and SQL counts.')
+  parser.add_argument('--requests', type=int, default=REQUESTS, help='Timed requests per route.')
+  parser.add_argument('--warmup', type=int, default=WARMUP, help='Untimed requests per route first.')
+  parser.add_argument('--server', action='store_true', help='Send HTTP requests to a local WSGI server.')
+  parser.add_argument('--concurrency', type=int, default=1, help='Client threads (with --server).')
+  parser.add_argument('--writes', action='store_true', help='Also drive the routes that write.')
+  parser.add_argument('--page-cache', action='store_true', help='Leave the page cache on.')
+  parser.add_argument('--route', action='append', help='Only run endpoints with this name (repeatable).')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--output', help='Write the results to this JSON file.')
+  parser.add_argument('--compare', help='Baseline JSON file from an earlier --output.')
+  parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Allowed p95 slowdown, as a fraction.')
+  args = parser.parse_args()
+
+  if args.concurrency > 1 and not args.server:
+    parser.error('--concurrency needs --server; the test client runs one request at a time')
+
+  app.config['WTF_CSRF_ENABLED'] = False
+  if not args.page_cache:
+    from cache import page_cache
+    page_cache.enabled = False
+
+  counter = StatementCounter(app.wsgi_app)
+  app.wsgi_app = counter
+
+  with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', counter.record)
+    dataset = _dataset()
+    samples = Samples()
+    selected = [
+      scenario for scenario in scenarios(samples)
+      if (args.writes or not scenario.writes) and (not args.route or scenario.endpoint in args.route)
+    ]
+
+    results = {
+      "meta": {
+        "commit": _git_commit(),
+        "date": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "database": db.engine.dialect.name,
+        "dataset": dataset,
+        "mode": 'server' if args.server else 'test-client',
+        "concurrency": args.concurrency,
+        "requests_per_route": args.requests,
+        "page_cache": args.page_cache,
+        "seed": args.seed,
+      },
+      "routes": {},
+      "not_driven": uncovered(selected) if not args.route else [],
+    }
+
+    def drive(make_client):
+      for scenario in selected:
+        stats = run_scenario(scenario, make_client, args.requests, args.concurrency, args.warmup, args.seed)
+        results['routes'][scenario.name] = stats
+        print(f"{scenario.name:<40} p50 {stats['p50_ms']:>8.2f}  p95 {stats['p95_ms']:>8.2f}  "
+              f"p99 {stats['p99_ms']:>8.2f} ms  {stats['rps']:>8.1f} req/s  "
+              f"queries {stats['queries']['max']:>3}  errors {stats['errors']}")
+
+    if args.server:
+      with LocalServer(app) as server:
+        drive(lambda: HTTPClient(server.port))
+    else:
+      drive(TestClient)
+    event.remove(db.engine, 'before_cursor_execute', counter.record)
+
+  for name in results['not_driven']:
+    print(f'{name:<40} not driven')
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+      f.write('\n')
+
+  failed = any(stats['errors'] for stats in results['routes'].values())
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    failed = bool(compare(results, baseline, args.tolerance)) or failed
+  if failed:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,68 @@
+#----------------------------------------------------------------------------#
+# Benchmark: memory and throughput of GET /api/v1/shows?format=ndjson.
+#
+# Seeds growing numbers of shows and streams the full export through the
+# test client, recording the Python heap peak (tracemalloc) while the body is
+# consumed. The peak should stay roughly flat as the table grows.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/ndjson_export.py
+#
+# WARNING: the tables in the target database are dropped and recreated.
+#----------------------------------------------------------------------------#
+
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchdb import bookings_deferred, reset_schema
+from app import create_app
+from models import db, Venue, Artist, Show
+
+app = create_app()
+
+SIZES = [10000, 100000, 300000]
+
+
+def seed(num_shows):
+  reset_schema()
+  db.session.add_all([Venue(name='Bench Venue', genres=['Jazz']), Artist(name='Bench Artist', genres=['Jazz'])])
+  db.session.flush()
+  start = datetime(2026, 1, 1)
+  with bookings_deferred():
+    db.session.execute(db.insert(Show), [
+      {"venue_id": 1, "artist_id": 1, "start_time": start + timedelta(minutes=i)}
+      for i in range(num_shows)
+    ])
+    db.session.commit()
+  db.session.remove()
+
+
+def export(client):
+  tracemalloc.start()
+  started = time.perf_counter()
+  response = client.get('/api/v1/shows?format=ndjson', buffered=False)
+  lines = 0
+  for chunk in response.response:
+    lines += chunk.count(b'\n') if isinstance(chunk, bytes) else chunk.count('\n')
+  response.close()
+  elapsed = time.perf_counter() - started
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return lines, elapsed, peak
+
+
+def main():
+  with app.app_context():
+    client = app.test_client()
+    for size in SIZES:
+      seed(size)
+      lines, elapsed, peak = export(client)
+      assert lines == size, (lines, size)
+      print(f"shows={size:>7}  rows/s={lines / elapsed:>9.0f}  peak heap={peak / 1024 / 1024:6.1f} MiB")
+    db.session.remove()
+    db.drop_all()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,127 @@
+#----------------------------------------------------------------------------#
+# Benchmark: GET /api/v1/venues/near over 100k located venues.
+#
+# Seeds --venues venues scattered around a few dozen city centres (about
+# 10 km either way) and times radius and nearest-neighbour searches from
+# random points near those cities, three ways:
+#
+#   full scan    distance of every venue sorted in SQL, no index (baseline)
+#   geohash      the Postgres path of geo.py, ix_venue_geohash cell scans
+#   in-process   the GridIndex fallback (GEO_SEARCH_IN_PROCESS)
+#
+# Every search is checked against the full scan.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_geo \
+#     python benchmarks/nearby_venues.py [--venues 100000] [--queries 200]
+#
+# WARNING: the tables in the target database are dropped and recreated.
+#----------------------------------------------------------------------------#
+
+import argparse
+import random
+import time
+
+from benchdb import reset_schema
+from app import create_app
+import geo
+from models import db, Venue
+
+app = create_app()
+
+CITIES = [
+  ('New York', 'NY', 40.7128, -74.0060), ('Los Angeles', 'CA', 34.0522, -118.2437),
+  ('San Francisco', 'CA', 37.7749, -122.4194), ('Chicago', 'IL', 41.8781, -87.6298),
+  ('Houston', 'TX', 29.7604, -95.3698), ('Austin', 'TX', 30.2672, -97.7431),
+  ('Phoenix', 'AZ', 33.4484, -112.0740), ('Philadelphia', 'PA', 39.9526, -75.1652),
+  ('Seattle', 'WA', 47.6062, -122.3321), ('Portland', 'OR', 45.5152, -122.6784),
+  ('Denver', 'CO', 39.7392, -104.9903), ('Boston', 'MA', 42.3601, -71.0589),
+  ('Nashville', 'TN', 36.1627, -86.7816), ('Atlanta', 'GA', 33.7490, -84.3880),
+  ('Miami', 'FL', 25.7617, -80.1918), ('New Orleans', 'LA', 29.9511, -90.0715),
+  ('Detroit', 'MI', 42.3314, -83.0458), ('Minneapolis', 'MN', 44.9778, -93.2650),
+  ('St. Louis', 'MO', 38.6270, -90.1994), ('Las Vegas', 'NV', 36.1699, -115.1398),
+  ('Salt Lake City', 'UT', 40.7608, -111.8910), ('Honolulu', 'HI', 21.3069, -157.8583),
+]
+# Standard deviation of the scatter around a city centre, in degrees.
+SPREAD = 0.1
+CHUNK_SIZE = 10000
+RADII_KM = [1, 5, 25]
+K = 20
+
+
+def seed(count, rng):
+  reset_schema()
+  rows = []
+  for i in range(1, count + 1):
+    city, state, lat, lon = rng.choice(CITIES)
+    lat, lon = rng.gauss(lat, SPREAD), rng.gauss(lon, SPREAD)
+    rows.append({
+      "name": f'Bench Venue {i}', "city": city, "state": state, "genres": ['Jazz'],
+      "latitude": lat, "longitude": lon, "geohash": geo.encode(lat, lon),
+    })
+  for start in range(0, count, CHUNK_SIZE):
+    db.session.execute(db.insert(Venue), rows[start:start + CHUNK_SIZE])
+  db.session.commit()
+  db.session.execute(db.text('ANALYZE "Venue"'))
+  db.session.commit()
+
+
+def full_scan(lat, lon, radius_km, limit):
+  distance = geo._distance_sql(Venue.latitude, Venue.longitude, lat, lon)
+  query = db.select(distance, Venue.id).where(Venue.latitude.isnot(None))
+  if radius_km is not None:
+    query = query.where(distance <= radius_km)
+  return [(round(d, 3), id) for d, id in db.session.execute(query.order_by(distance, Venue.id).limit(limit))]
+
+
+def searches(rng, count):
+  for _ in range(count):
+    _, _, lat, lon = rng.choice(CITIES)
+    yield rng.gauss(lat, SPREAD * 2), rng.gauss(lon, SPREAD * 2), rng.choice(RADII_KM + [None])
+
+
+def timed(search, queries):
+  timings, results = [], []
+  for lat, lon, radius_km in queries:
+    started = time.perf_counter()
+    results.append(search(lat, lon, radius_km))
+    timings.append((time.perf_counter() - started) * 1000)
+  timings.sort()
+  return timings, results
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--venues', type=int, default=100000)
+  parser.add_argument('--queries', type=int, default=200)
+  args = parser.parse_args()
+
+  rng = random.Random(23)
+  with app.app_context():
+    seed(args.venues, rng)
+    queries = list(searches(rng, args.queries))
+
+    def nearby(lat, lon, radius_km):
+      return [(hit['distance_km'], hit['id']) for hit in geo.nearby(lat, lon, radius_km, K)]
+
+    def in_process(lat, lon, radius_km):
+      app.config['GEO_SEARCH_IN_PROCESS'] = True
+      try:
+        return nearby(lat, lon, radius_km)
+      finally:
+        app.config['GEO_SEARCH_IN_PROCESS'] = False
+
+    baseline = None
+    in_process(0, 0, 1)  # build the index outside the timings
+    for name, search in [('full scan', lambda *q: full_scan(*q, K)), ('geohash', nearby), ('in-process', in_process)]:
+      timings, results = timed(search, queries)
+      if baseline is None:
+        baseline = results
+      mismatches = sum(result != expected for result, expected in zip(results, baseline))
+      print(f'{name:<11} p50 {timings[len(timings) // 2]:7.2f}  p95 {timings[int(len(timings) * 0.95)]:7.2f}  '
+            f'max {timings[-1]:7.2f} ms  {len(queries)} searches over {args.venues} venues, {mismatches} mismatches')
+    db.session.remove()
+    db.drop_all()
+
+
+if __name__ == '__main__':
+  main()
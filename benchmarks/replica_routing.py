@@ -0,0 +1,70 @@
+#----------------------------------------------------------------------------#
+# Checks read-replica routing end to end with two local databases.
+#
+# The primary and the "replica" are seeded with different venue names, so
+# the API response shows which engine served a read. By default two SQLite
+# files in a temp dir are used; point DATABASE_URL / DATABASE_REPLICA_URL at
+# two local Postgres databases to run the same check there.
+#
+#   python benchmarks/replica_routing.py
+#
+# WARNING: the tables in both databases are dropped and recreated.
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+import tempfile
+import time
+
+tmp = tempfile.mkdtemp(prefix='fyyur-replica-')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{tmp}/primary.db')
+os.environ.setdefault('DATABASE_REPLICA_URL', f'sqlite:///{tmp}/replica.db')
+os.environ.setdefault('REPLICA_STICKY_SECONDS', '1')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from models import db, Venue
+
+app = create_app()
+
+app.config['WTF_CSRF_ENABLED'] = False
+app.config['PAGE_CACHE_ENABLED'] = False
+
+
+def venue_names(client):
+  return [venue['name'] for venue in client.get('/api/v1/venues?fields=name').json['data']]
+
+
+def check(label, got, expected):
+  print(f"{'ok  ' if got == expected else 'FAIL'} {label}: {got}")
+  return got == expected
+
+
+def main():
+  with app.app_context():
+    for bind, name in [(None, 'Primary Venue'), ('replica', 'Replica Venue')]:
+      engine = db.engines[bind]
+      db.metadata.drop_all(engine)
+      db.metadata.create_all(engine)
+      with engine.begin() as conn:
+        conn.execute(db.insert(Venue), [{"name": name, "city": "SF", "state": "CA", "genres": ["Jazz"]}])
+
+  client = app.test_client()
+  ok = check('GET reads the replica', venue_names(client), ['Replica Venue'])
+
+  client.post('/venues/create', data={
+    "name": "New Venue", "city": "SF", "state": "CA", "address": "1 Main St",
+    "genres": ["Jazz"], "facebook_link": "https://facebook.com/new",
+  })
+  ok &= check('POST wrote to the primary, next GET reads it back',
+              venue_names(client), ['Primary Venue', 'New Venue'])
+  ok &= check('another browser still reads the replica', venue_names(app.test_client()), ['Replica Venue'])
+
+  time.sleep(app.config['REPLICA_STICKY_SECONDS'] + 0.1)
+  ok &= check('after the sticky window reads go back to the replica', venue_names(client), ['Replica Venue'])
+
+  sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+  main()
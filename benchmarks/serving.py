@@ -0,0 +1,173 @@
+#----------------------------------------------------------------------------#
+# Smoke benchmark: the development server against gunicorn.
+#
+# Starts each server in turn on a free localhost port against the bench
+# database (FYYUR_BENCH_DATABASE_URI, loaded by generate.py), sends it
+# HTTP requests from --concurrency client threads for --duration seconds,
+# cycling through the listing, detail and API pages, and reports requests
+# per second and latency percentiles:
+#
+#   dev server   app.run(), as `python app.py` starts it, with DEBUG off
+#   gunicorn     `gunicorn` with gunicorn.conf.py (preload, gthread workers)
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/serving.py [--concurrency 16] [--duration 10]
+#----------------------------------------------------------------------------#
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchdb import ROOT
+
+DEV_SERVER = "from app import create_app; create_app().run(host='127.0.0.1', port={port})"
+PAGES = ['/', '/venues', '/artists', '/shows', '/api/v1/venues?limit=50']
+DETAIL_PAGES = 20
+STARTUP_TIMEOUT = 60
+
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(('127.0.0.1', 0))
+    return sock.getsockname()[1]
+
+
+def commands(port):
+  return {
+    'dev server': [sys.executable, '-c', DEV_SERVER.format(port=port)],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}'],
+  }
+
+
+def get(port, path):
+  conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+  try:
+    conn.request('GET', path)
+    response = conn.getresponse()
+    return response.status, response.read()
+  finally:
+    conn.close()
+
+
+def wait_until_up(port, process, log):
+  deadline = time.monotonic() + STARTUP_TIMEOUT
+  while time.monotonic() < deadline:
+    if process.poll() is not None:
+      log.seek(0)
+      raise RuntimeError(f'server exited with status {process.returncode}:\n{log.read().decode()[-2000:]}')
+    try:
+      if get(port, '/')[0] == 200:
+        return
+    except OSError:
+      pass
+    time.sleep(0.2)
+  raise RuntimeError('server did not come up')
+
+
+def paths(port):
+  # Detail pages of rows that exist, looked up through the API.
+  found = list(PAGES)
+  for kind in ('venues', 'artists'):
+    status, body = get(port, f'/api/v1/{kind}?fields=id&limit={DETAIL_PAGES}')
+    if status == 200:
+      found += [f"/{kind}/{row['id']}" for row in json.loads(body)['data']]
+  return found
+
+
+def load(port, urls, concurrency, duration):
+  '''Drives the server from `concurrency` threads; returns (latencies, errors, elapsed).'''
+  latencies, errors = [], []
+  lock = threading.Lock()
+  stop = time.monotonic() + duration
+
+  def worker(offset):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    mine, failed = [], 0
+    index = offset
+    while time.monotonic() < stop:
+      path = urls[index % len(urls)]
+      index += 1
+      started = time.perf_counter()
+      try:
+        conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+          failed += 1
+      except (OSError, http.client.HTTPException):
+        failed += 1
+        conn.close()
+        continue
+      mine.append(time.perf_counter() - started)
+    conn.close()
+    with lock:
+      latencies.extend(mine)
+      errors.append(failed)
+
+  started = time.monotonic()
+  threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(concurrency)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return sorted(latencies), sum(errors), time.monotonic() - started
+
+
+def percentile(values, pct):
+  # Nearest-rank percentile of an already sorted list.
+  if not values:
+    return 0.0
+  return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--concurrency', type=int, default=16)
+  parser.add_argument('--duration', type=float, default=10)
+  parser.add_argument('--warmup', type=float, default=2)
+  parser.add_argument('--server', action='append', choices=['dev server', 'gunicorn'],
+                      help='Only run this server (repeatable).')
+  args = parser.parse_args()
+
+  env = dict(os.environ, DEBUG='0', PYTHONUNBUFFERED='1')
+  env.pop('FLASK_RUN_FROM_CLI', None)
+  if os.environ.get('FYYUR_BENCH_DATABASE_URI'):
+    env['DATABASE_URL'] = os.environ['FYYUR_BENCH_DATABASE_URI']
+
+  results = {}
+  for name in commands(0):
+    if args.server and name not in args.server:
+      continue
+    port = free_port()
+    command = commands(port)[name]
+    with tempfile.TemporaryFile() as log:
+      process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                 start_new_session=True)
+      try:
+        wait_until_up(port, process, log)
+        urls = paths(port)
+        load(port, urls, args.concurrency, args.warmup)
+        latencies, errors, elapsed = load(port, urls, args.concurrency, args.duration)
+      finally:
+        if process.poll() is None:
+          os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+    results[name] = rps = len(latencies) / elapsed
+    print(f'{name:<12} {rps:>8.1f} req/s  p50 {percentile(latencies, 50) * 1000:>7.1f}  '
+          f'p95 {percentile(latencies, 95) * 1000:>7.1f}  p99 {percentile(latencies, 99) * 1000:>7.1f} ms  '
+          f'{len(latencies)} requests, {errors} errors, {len(urls)} pages, concurrency {args.concurrency}')
+
+  if len(results) == 2 and results['dev server']:
+    print(f"gunicorn / dev server: {results['gunicorn'] / results['dev server']:.1f}x")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,115 @@
+#----------------------------------------------------------------------------#
+# Benchmark: double-booking checks (scheduling.py) on the bench database.
+#
+#   check     scheduling.conflicts() for one new show, against reading every
+#             show of the venue and artist and comparing in Python
+#   batch     scheduling.validate_batch() over --batch new shows (one query
+#             and interval trees), against one conflicts() call per show
+#   report    scheduling.find_conflicts() over every show: the Postgres
+#             self-join and the in-process sweep, which must agree
+#
+# Read-only: nothing is written to the database.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/show_conflicts.py [--checks 500] [--batch 5000]
+#----------------------------------------------------------------------------#
+
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from benchdb import disable_page_cache
+from app import create_app
+import scheduling
+from models import db, Show
+
+app = create_app()
+
+DURATIONS = [60, 90, 120, 180]
+
+def new_shows(rng, count):
+  bounds = db.session.execute(db.select(
+    db.func.max(Show.venue_id), db.func.max(Show.artist_id), db.func.min(Show.start_time), db.func.max(Show.start_time),
+  )).one()
+  venues, artists, first, last = bounds
+  span = int((last - first).total_seconds() // 60)
+  for _ in range(count):
+    yield {
+      "venue_id": rng.randint(1, venues),
+      "artist_id": rng.randint(1, artists),
+      "start_time": first + timedelta(minutes=rng.randrange(0, span, 30)),
+      "duration": rng.choice(DURATIONS),
+    }
+
+
+def naive_conflicts(row):
+  # No time bound: every show of the venue or artist comes back.
+  end = scheduling.end_of(row['start_time'], row['duration'])
+  shows = db.session.execute(
+    db.select(Show.id, Show.start_time, Show.duration)
+    .where(db.or_(Show.venue_id == row['venue_id'], Show.artist_id == row['artist_id']))
+  ).all()
+  return [show.id for show in shows
+          if show.start_time < end and scheduling.end_of(show.start_time, show.duration) > row['start_time']]
+
+
+def timed(function, items):
+  timings, results = [], []
+  for item in items:
+    started = time.perf_counter()
+    results.append(function(item))
+    timings.append((time.perf_counter() - started) * 1000)
+  timings.sort()
+  return timings, results
+
+
+def report(name, timings, note=''):
+  print(f'{name:<22} p50 {timings[len(timings) // 2]:8.2f}  p95 {timings[int(len(timings) * 0.95)]:8.2f} ms  {note}')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--checks', type=int, default=500)
+  parser.add_argument('--batch', type=int, default=5000)
+  args = parser.parse_args()
+
+  rng = random.Random(24)
+  disable_page_cache()
+  with app.app_context():
+    shows = db.session.execute(db.select(db.func.count()).select_from(Show)).scalar()
+    print(f'{shows} shows')
+
+    rows = list(new_shows(rng, args.checks))
+    indexed, found = timed(lambda row: sorted(clash.id for clash in scheduling.conflicts(
+      row['venue_id'], row['artist_id'], row['start_time'], row['duration'])), rows)
+    naive, expected = timed(lambda row: sorted(naive_conflicts(row)), rows)
+    assert found == expected
+    report('check: conflicts()', indexed, f'{sum(map(bool, found))} of {len(rows)} clash')
+    report('check: whole schedule', naive)
+
+    batch = list(enumerate(new_shows(rng, args.batch), 1))
+    started = time.perf_counter()
+    accepted, errors = scheduling.validate_batch(batch)
+    tree_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for _, row in batch:
+      scheduling.conflicts(row['venue_id'], row['artist_id'], row['start_time'], row['duration'])
+    loop_ms = (time.perf_counter() - started) * 1000
+    print(f'batch of {len(batch)}: validate_batch {tree_ms:.0f} ms ({len(errors)} rejected), '
+          f'one conflicts() per row {loop_ms:.0f} ms')
+
+    for kind in ('venue', 'artist'):
+      results = {}
+      for name, find in (('self-join', scheduling._find_conflicts_postgres), ('sweep', scheduling._find_conflicts_sweep)):
+        started = time.perf_counter()
+        results[name] = sorted((c.first_id, c.second_id) for c in find(kind))
+        elapsed = time.perf_counter() - started
+        print(f'report: {kind:<6} {name:<9} {len(results[name])} conflicts in {elapsed:.2f} s '
+              f'({shows / elapsed:,.0f} shows/s)')
+      assert results['self-join'] == results['sweep']
+    db.session.remove()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,107 @@
+#----------------------------------------------------------------------------#
+# Benchmark: import and start-up cost of the app.
+#
+# Runs `import app; app.create_app()` in a fresh interpreter under
+# `python -X importtime`, the way a worker or a CLI command starts, and
+# reports the wall time, the slowest imports by cumulative time and
+# whether the modules that are meant to load lazily (Babel, dateutil,
+# Alembic) stayed out. No database is needed: nothing connects at start.
+#
+#   python benchmarks/startup.py [--runs 5] [--top 15]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from benchdb import ROOT
+
+STATEMENT = 'import app; app.create_app()'
+# Loaded on first use only; see the Filters section of app.py and create_app.
+LAZY = ['babel', 'dateutil', 'alembic', 'flask_migrate']
+
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run():
+  '''One cold start: returns (wall seconds, [(module, self us, cumulative us, depth)]).'''
+  env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+  env.pop('FLASK_RUN_FROM_CLI', None)
+  code = f'import time; t = time.perf_counter(); {STATEMENT}; print(time.perf_counter() - t)'
+  result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+  modules = []
+  for line in result.stderr.splitlines():
+    match = _LINE.match(line)
+    if match:
+      own, cumulative, indent, name = match.groups()
+      modules.append((name, int(own), int(cumulative), len(indent) // 2))
+  return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def importer(modules, index):
+  '''The module whose import pulled in modules[index]: -X importtime lists a
+  module's imports before the module itself, one level deeper.'''
+  depth = modules[index][3]
+  for name, _, _, level in modules[index + 1:]:
+    if level < depth:
+      return name
+  return None
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--runs', type=int, default=5)
+  parser.add_argument('--top', type=int, default=15)
+  args = parser.parse_args()
+
+  walls, runs = [], []
+  for _ in range(args.runs):
+    wall, modules = run()
+    walls.append(wall)
+    runs.append(modules)
+
+  # Per-module times are the median over the runs, to damp the first run's
+  # cold filesystem cache. Listed: what app.py imports directly (a module
+  # already imported by an earlier one costs nothing here).
+  first = runs[0]
+  timings = [{name: (own, cumulative) for name, own, cumulative, _ in modules} for modules in runs]
+  rows = []
+  for index, (name, _, _, depth) in enumerate(first):
+    if (name == 'app' or importer(first, index) == 'app') and all(name in timing for timing in timings):
+      rows.append((name, depth,
+                   statistics.median(timing[name][0] for timing in timings),
+                   statistics.median(timing[name][1] for timing in timings)))
+  rows.sort(key=lambda row: row[3], reverse=True)
+
+  print(f'{STATEMENT!r}: median {statistics.median(walls) * 1000:.1f} ms over {args.runs} runs '
+        f'(min {min(walls) * 1000:.1f}), {len(first)} modules imported')
+  print()
+  print(f"{'module':<40} {'cumulative':>11} {'self':>9}")
+  for name, depth, own, cumulative in rows[:args.top]:
+    print(f"{'  ' * (depth - 1) + name:<40} {cumulative / 1000:>8.1f} ms {own / 1000:>6.1f} ms")
+
+  print()
+  failed = False
+  for package in LAZY:
+    found = [index for index, (name, _, _, _) in enumerate(first)
+             if name == package or name.startswith(package + '.')]
+    if found:
+      # The outermost module of the package, and what imported it. Only an
+      # import from this repo's own modules counts as a failure: Flask-WTF,
+      # for one, loads Babel itself when Flask-Babel happens to be installed.
+      top = min(found, key=lambda index: first[index][3])
+      by = importer(first, top)
+      ours = by is not None and os.path.exists(os.path.join(ROOT, by.split('.')[0] + '.py'))
+      failed |= ours
+      print(f"{'FAIL' if ours else 'note'} {package} imported at start-up, by {by}")
+    else:
+      print(f'ok   {package} not imported at start-up')
+  sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+  main()
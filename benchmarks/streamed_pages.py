@@ -0,0 +1,80 @@
+#----------------------------------------------------------------------------#
+# Benchmark: streamed against buffered rendering of the full list pages.
+#
+# Requests /shows?limit=all and /artists?limit=all through the test client
+# against the bench database (load it with generate.py first; nothing is
+# written) and reports the time to the first chunk, the total time and the
+# Python heap peak (tracemalloc) while the body is consumed. Each page is
+# rendered twice: streamed, as the app does, and buffered, the way the
+# handlers used to work: the whole result fetched, then rendered in one go.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/streamed_pages.py
+#----------------------------------------------------------------------------#
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from flask import render_template
+
+from benchdb import disable_page_cache
+from app import create_app
+from models import db
+import artists
+import shows
+
+app = create_app()
+
+PAGES = [('/shows?limit=all', shows), ('/artists?limit=all', artists)]
+
+
+@contextmanager
+def buffered(module):
+  # Swaps the view's streaming helpers for the fetch-everything-then-render
+  # behaviour they replaced.
+  saved = module.stream_page, module.stream_rows
+  module.stream_page = render_template
+  module.stream_rows = lambda query, keys, after=None: db.session.execute(query.order_by(*keys)).all()
+  try:
+    yield
+  finally:
+    module.stream_page, module.stream_rows = saved
+
+
+def fetch(client, url):
+  tracemalloc.start()
+  started = time.perf_counter()
+  response = client.get(url, buffered=False)
+  first = None
+  size = chunks = 0
+  for chunk in response.response:
+    if first is None:
+      first = time.perf_counter() - started
+    size += len(chunk)
+    chunks += 1
+  response.close()
+  elapsed = time.perf_counter() - started
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  assert response.status_code == 200, (url, response.status_code)
+  return first, elapsed, peak, size, chunks
+
+
+def main():
+  disable_page_cache()
+  client = app.test_client()
+  for url, module in PAGES:
+    client.get(url)
+    for mode in ('buffered', 'streamed'):
+      if mode == 'buffered':
+        with buffered(module):
+          first, elapsed, peak, size, chunks = fetch(client, url)
+      else:
+        first, elapsed, peak, size, chunks = fetch(client, url)
+      print(f'{url:<20} {mode:<9} first chunk {first * 1000:>8.1f} ms  total {elapsed * 1000:>8.1f} ms  '
+            f'peak heap {peak / 1024 / 1024:>7.1f} MiB  {size / 1024:>8.0f} KiB in {chunks} chunks')
+
+
+if __name__ == '__main__':
+  main()
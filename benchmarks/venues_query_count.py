@@ -0,0 +1,80 @@
+#----------------------------------------------------------------------------#
+# Benchmark: number of SQL statements issued by GET /venues.
+#
+# Seeds a scratch database with a growing number of venues (each with a few
+# upcoming shows) and counts the statements the /venues handler executes.
+# The count must stay flat as the catalog grows.
+#
+#   FYYUR_BENCH_DATABASE_URI=postgresql://localhost/fyyur_bench \
+#     python benchmarks/venues_query_count.py
+#
+# WARNING: the tables in the target database are dropped and recreated.
+#----------------------------------------------------------------------------#
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchdb import QueryCounter, bookings_deferred, disable_page_cache, reset_schema
+from app import create_app
+from models import db, Venue, Artist, Show
+
+app = create_app()
+
+SIZES = [10, 100, 1000, 5000]
+SHOWS_PER_VENUE = 3
+
+
+def seed(num_venues):
+  reset_schema()
+  artist = Artist(name='Bench Artist', genres=['Jazz'])
+  db.session.add(artist)
+  db.session.flush()
+  venues = [
+    {"name": f"Venue {i}", "city": f"City {i % 50}", "state": "CA", "genres": ['Jazz']}
+    for i in range(num_venues)
+  ]
+  db.session.execute(db.insert(Venue), venues)
+  venue_ids = db.session.scalars(db.select(Venue.id)).all()
+  start = datetime.now() + timedelta(days=1)
+  artist_id = artist.id
+  with bookings_deferred():
+    db.session.execute(db.insert(Show), [
+      {"venue_id": venue_id, "artist_id": artist_id, "start_time": start + timedelta(hours=n)}
+      for venue_id in venue_ids
+      for n in range(SHOWS_PER_VENUE)
+    ])
+    db.session.commit()
+
+
+def measure(client):
+  with QueryCounter() as queries:
+    started = time.perf_counter()
+    response = client.get('/venues')
+    elapsed = time.perf_counter() - started
+  assert response.status_code == 200, response.status_code
+  return queries.count, elapsed
+
+
+def main():
+  disable_page_cache()
+  results = []
+  with app.app_context():
+    client = app.test_client()
+    for size in SIZES:
+      seed(size)
+      queries, elapsed = measure(client)
+      db.session.remove()
+      results.append((size, queries, elapsed))
+      print(f"venues={size:>6}  queries={queries:>3}  time={elapsed * 1000:8.1f} ms")
+    db.drop_all()
+
+  counts = {queries for _, queries, _ in results}
+  if len(counts) != 1:
+    print('FAIL: query count grows with the number of venues')
+    sys.exit(1)
+  print('OK: query count is constant')
+
+
+if __name__ == '__main__':
+  main()
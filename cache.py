@@ -0,0 +1,257 @@
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered GET pages are cached under a key built from the endpoint, its view
+# arguments and the query string. While rendering, a view tags its page with
+# the records it shows: 'venue:1' for the venue's own page, 'ref:artist:4'
+# for an artist it merely links to. Write handlers call
+# page_cache.invalidate() with the tags they touched, which evicts exactly
+# the pages that displayed those records. A new show changes its venue's and
+# artist's pages ('venue:1', 'artist:4'); renaming an artist also changes
+# every page that links to it ('ref:artist:4').
+#
+# The default backend is a bounded in-process LRU with a TTL. Setting
+# PAGE_CACHE_URL = 'sqlite:////path/to/cache.db' shares one store between
+# worker processes, so an invalidation in one worker is seen by all of them.
+#----------------------------------------------------------------------------#
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from flask import Response, current_app, g, request, session
+
+
+class Entry:
+    __slots__ = ('status', 'mimetype', 'body', 'expires')
+
+    def __init__(self, status, mimetype, body, expires):
+        self.status = status
+        self.mimetype = mimetype
+        self.body = body
+        self.expires = expires
+
+
+class MemoryBackend:
+    '''Bounded LRU with per-entry expiry, safe to share between threads.'''
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.tags = defaultdict(set)
+        self.entry_tags = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.time():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, tags):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.entry_tags[key] = set(tags)
+            for tag in tags:
+                self.tags[tag].add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, key):
+        self.entries.pop(key, None)
+        for tag in self.entry_tags.pop(key, ()):
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def invalidate(self, tags):
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys |= self.tags.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+            self.entry_tags.clear()
+
+
+class SQLiteBackend:
+    '''
+    Shared store in a local SQLite file. Capacity is enforced by dropping the
+    entries stored first, which is close enough to LRU for a page cache.
+    '''
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        # A connection of its own, closed again: this runs in the gunicorn
+        # master, and a connection kept here would be inherited by every
+        # worker it forks.
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            conn.executescript('''
+                PRAGMA journal_mode = WAL;
+                CREATE TABLE IF NOT EXISTS page (
+                    key TEXT PRIMARY KEY,
+                    status INTEGER,
+                    mimetype TEXT,
+                    body BLOB,
+                    expires REAL,
+                    stored REAL
+                );
+                CREATE TABLE IF NOT EXISTS page_tag (
+                    tag TEXT,
+                    key TEXT,
+                    PRIMARY KEY (tag, key)
+                );
+                CREATE INDEX IF NOT EXISTS ix_page_stored ON page (stored);
+            ''')
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT status, mimetype, body, expires FROM page WHERE key = ? AND expires >= ?',
+            (key, time.time()),
+        ).fetchone()
+        return Entry(*row) if row else None
+
+    def set(self, key, entry, tags):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO page VALUES (?, ?, ?, ?, ?, ?)',
+                (key, entry.status, entry.mimetype, entry.body, entry.expires, time.time()),
+            )
+            conn.executemany('INSERT OR IGNORE INTO page_tag VALUES (?, ?)', [(tag, key) for tag in tags])
+            dropped = conn.execute(
+                'DELETE FROM page WHERE expires < ? OR key IN '
+                '(SELECT key FROM page ORDER BY stored DESC LIMIT -1 OFFSET ?)',
+                (time.time(), self.max_entries),
+            ).rowcount
+            if dropped:
+                conn.execute('DELETE FROM page_tag WHERE key NOT IN (SELECT key FROM page)')
+
+    def invalidate(self, tags):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            placeholders = ','.join('?' * len(tags))
+            evicted = conn.execute(
+                f'DELETE FROM page WHERE key IN (SELECT key FROM page_tag WHERE tag IN ({placeholders}))',
+                tags,
+            ).rowcount
+            conn.execute(f'DELETE FROM page_tag WHERE tag IN ({placeholders})', tags)
+            return evicted
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM page')
+            conn.execute('DELETE FROM page_tag')
+
+
+class PageCache:
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        max_entries = app.config.get('PAGE_CACHE_SIZE', 512)
+        url = app.config.get('PAGE_CACHE_URL')
+        if url and url.startswith('sqlite:///'):
+            self.backend = SQLiteBackend(url[len('sqlite:///'):], max_entries)
+        else:
+            self.backend = MemoryBackend(max_entries)
+        app.extensions['page_cache'] = self
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.evictions += self.backend.invalidate(list(tags))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def cached(self, view):
+        '''Caches the 200 responses of a GET view.'''
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are rendered into the layout, so those
+            # requests neither read nor fill the cache.
+            if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            key = page_key()
+            entry = self.backend.get(key)
+            if entry is not None:
+                self.hits += 1
+                response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            self.misses += 1
+            g.cache_tags = set()
+            response = current_app.make_response(view(*args, **kwargs))
+            # A streamed page (streaming.py) would have to be buffered whole.
+            if response.status_code == 200 and not response.direct_passthrough and not response.is_streamed:
+                entry = Entry(response.status_code, response.mimetype, response.get_data(), time.time() + self.ttl)
+                self.backend.set(key, entry, g.cache_tags)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+
+def page_key():
+    view_args = json.dumps(request.view_args or {}, sort_keys=True, default=str)
+    query = sorted(request.args.items(multi=True))
+    # Set by conditional.py: a page is only reused under the ETag it was stored with.
+    etag = g.get('page_etag', '')
+    return f'{request.endpoint}|{view_args}|{json.dumps(query)}|{etag}'
+
+
+def cache_tags(*tags):
+    '''Tags the page being rendered with the records it depends on.'''
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
+
+
+page_cache = PageCache()
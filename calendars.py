@@ -0,0 +1,197 @@
+#----------------------------------------------------------------------------#
+# Calendars: the shows of a venue, an artist or a city between two days.
+#
+#   GET /venues/<id>/calendar?from=2026-10-23&to=2026-10-25
+#   GET /artists/<id>/calendar?when=weekend
+#   GET /calendar?city=Austin&state=TX&from=2026-11-01
+#
+# and the same under /api/v1 as JSON (see api.py). `from` and `to` are days,
+# both included; without them the calendar covers the next DEFAULT_DAYS
+# days, and ?when=weekend the coming Friday to Sunday (what is left of it
+# on a Saturday or Sunday). A range is at most MAX_DAYS days long.
+#
+# The shows are selected by a range on start_time: for a venue or an artist
+# a range scan of ix_show_venue_id_start_time / ix_show_artist_id_start_time.
+# For a city Postgres either runs that venue range scan once per venue of
+# the city, or, when the city has many venues for the shows in the range,
+# reads the range through the BRIN index on start_time
+# (ix_show_start_time_brin, a few pages per month partition) and keeps the
+# city's venues. The shows are grouped by day in SQL: one row per day
+# holding its show count and its shows as a JSON array in start time order.
+#----------------------------------------------------------------------------#
+
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from sqlalchemy import Date, JSON, bindparam, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from cache import page_cache, cache_tags
+from models import db, Venue, Artist, Show
+
+bp = Blueprint('calendars', __name__)
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 92
+
+
+def date_range(args, today=None):
+  '''(first, last) day from ?from=&to= or ?when=weekend; raises ValueError for a bad range.'''
+  today = today or date.today()
+  if args.get('when') == 'weekend':
+    return today + timedelta(days=max(0, 4 - today.weekday())), today + timedelta(days=6 - today.weekday())
+
+  try:
+    first = date.fromisoformat(args['from']) if args.get('from') else today
+    last = date.fromisoformat(args['to']) if args.get('to') else first + timedelta(days=DEFAULT_DAYS - 1)
+  except ValueError:
+    raise ValueError('from and to must be dates (YYYY-MM-DD)')
+  if last < first:
+    raise ValueError('to must not be before from')
+  if (last - first).days >= MAX_DAYS:
+    raise ValueError(f'a calendar covers at most {MAX_DAYS} days')
+  return first, last
+
+
+def _json_list(columns, order_by, postgres):
+  # One JSON array per group, of {column name: value} objects.
+  pairs = [item for column in columns for item in (literal_column(f"'{column.key}'"), column)]
+  if postgres:
+    return func.json_agg(aggregate_order_by(func.json_build_object(*pairs), *order_by), type_=JSON)
+  # SQLite aggregates rows in the order of the (ordered) subquery.
+  return func.json_group_array(func.json_object(*pairs), type_=JSON)
+
+
+@lru_cache(maxsize=None)
+def _calendar_query(filters, postgres):
+  # Built once per set of filters; the values are bound at execution.
+  rows = (
+    select(
+      func.date(Show.start_time, type_=Date).label('day'),
+      Show.id,
+      Show.start_time,
+      Show.duration,
+      Venue.id.label('venue_id'),
+      Venue.name.label('venue_name'),
+      Artist.id.label('artist_id'),
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+    )
+    .join(Venue, Show.venue_id == Venue.id)
+    .join(Artist, Show.artist_id == Artist.id)
+    .where(Show.start_time >= bindparam('start'), Show.start_time < bindparam('stop'))
+  )
+  columns = {'venue_id': Show.venue_id, 'artist_id': Show.artist_id, 'city': Venue.city, 'state': Venue.state}
+  for name in filters:
+    rows = rows.where(columns[name] == bindparam(name))
+  if not postgres:
+    rows = rows.order_by(Show.start_time, Show.id)
+  rows = rows.subquery('rows')
+
+  shows = [column for column in rows.c if column.key != 'day']
+  return (
+    select(rows.c.day, func.count().label('count'),
+           _json_list(shows, [rows.c.start_time, rows.c.id], postgres).label('shows'))
+    .group_by(rows.c.day)
+    .order_by(rows.c.day)
+  )
+
+
+def calendar_days(first, last, venue_id=None, artist_id=None, city=None, state=None):
+  '''
+  Returns [{"day", "count", "shows"}] for the days from `first` to `last`
+  that have shows of the venue, the artist or the city (and state). Each
+  show is {"id", "start_time", "duration", "venue_id", "venue_name",
+  "artist_id", "artist_name", "artist_image_link"}.
+  '''
+  postgres = db.session.get_bind().dialect.name == 'postgresql'
+  filters = {name: value for name, value in
+             (('venue_id', venue_id), ('artist_id', artist_id), ('city', city), ('state', state or None))
+             if value is not None}
+  days = db.session.execute(_calendar_query(tuple(filters), postgres), {
+    "start": datetime.combine(first, time()),
+    "stop": datetime.combine(last + timedelta(days=1), time()),
+    **filters,
+  }).all()
+
+  calendar = []
+  for day, count, day_shows in days:
+    for show in day_shows:
+      show['start_time'] = datetime.fromisoformat(show['start_time'])
+    calendar.append({"day": day, "count": count, "shows": day_shows})
+  return calendar
+
+
+def _link(**params):
+  # This calendar (same venue, artist or city) with other query arguments.
+  keep = {name: request.args[name] for name in ('city', 'state') if request.args.get(name)}
+  return url_for(request.endpoint, **request.view_args, **keep, **params)
+
+
+def _page(title, first, last, days, **context):
+  cache_tags(*{f'ref:artist:{show["artist_id"]}' for day in days for show in day["shows"]},
+             *{f'ref:venue:{show["venue_id"]}' for day in days for show in day["shows"]})
+  span = timedelta(days=(last - first).days + 1)
+  links = {
+    "previous": _link(**{"from": (first - span).isoformat(), "to": (first - timedelta(days=1)).isoformat()}),
+    "next": _link(**{"from": (last + timedelta(days=1)).isoformat(), "to": (last + span).isoformat()}),
+    "weekend": _link(when='weekend'),
+    "week": _link(),
+  }
+  return render_template('pages/calendar.html', title=title, first=first, last=last, days=days, links=links,
+                         **context)
+
+
+def _bad_range(error):
+  flash(str(error))
+  return redirect(_link())
+
+
+#  Calendars
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/<int:venue_id>/calendar')
+@page_cache.cached
+def venue_calendar(venue_id):
+  venue = db.session.get(Venue, venue_id)
+  if not venue:
+    flash('Venue not found')
+    return redirect(url_for('index'))
+  try:
+    first, last = date_range(request.args)
+  except ValueError as e:
+    return _bad_range(e)
+  cache_tags(f'venue:{venue_id}')
+  return _page(venue.name, first, last, calendar_days(first, last, venue_id=venue_id), venue=venue)
+
+
+@bp.route('/artists/<int:artist_id>/calendar')
+@page_cache.cached
+def artist_calendar(artist_id):
+  artist = db.session.get(Artist, artist_id)
+  if not artist:
+    flash('Artist not found')
+    return redirect(url_for('index'))
+  try:
+    first, last = date_range(request.args)
+  except ValueError as e:
+    return _bad_range(e)
+  cache_tags(f'artist:{artist_id}')
+  return _page(artist.name, first, last, calendar_days(first, last, artist_id=artist_id), artist=artist)
+
+
+@bp.route('/calendar')
+@page_cache.cached
+def city_calendar():
+  city, state = request.args.get('city'), request.args.get('state')
+  if not city:
+    flash('Pick a city to see its calendar')
+    return redirect(url_for('venues.venues'))
+  try:
+    first, last = date_range(request.args)
+  except ValueError as e:
+    return _bad_range(e)
+  cache_tags('shows')
+  title = f'{city}, {state}' if state else city
+  return _page(title, first, last, calendar_days(first, last, city=city, state=state), city=city, state=state)
@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Gzip response compression.
+#
+# GzipMiddleware wraps the WSGI app and compresses responses as their body
+# is produced, so a streamed body (NDJSON export, streamed templates) is
+# compressed chunk by chunk instead of being buffered whole. A response is
+# compressed when:
+#
+#   - the client accepts gzip (Accept-Encoding, q > 0);
+#   - its Content-Type is in COMPRESS_MIMETYPES;
+#   - it has no Content-Encoding yet (the precompressed files under
+#     /assets/, see assets.py), no Cache-Control: no-transform, and is not
+#     a 206 or a response without a body;
+#   - it is at least COMPRESS_MIN_SIZE bytes. Without a Content-Length the
+#     first chunks are held back until that much has been produced; a body
+#     that ends short goes out as it is.
+#
+# Every response of an allowed type gets Vary: Accept-Encoding, compressed
+# or not, so a shared cache never hands the gzip body to a client that did
+# not ask for it (or the reverse). A strong ETag is made weak when the body
+# is compressed. benchmarks/compression.py measures the levels.
+#----------------------------------------------------------------------------#
+
+import itertools
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+# Compressed output is flushed to the client once this much input is
+# pending, so streamed bodies keep flowing without a flush per tiny chunk.
+FLUSH_BYTES = 16 * 1024
+
+NO_BODY_STATUSES = (204, 206, 304)
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers, *names):
+    names = {name.lower() for name in names}
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+
+def _add_vary(headers):
+    vary = _header(headers, 'Vary')
+    if vary is None:
+        return headers + [('Vary', 'Accept-Encoding')]
+    fields = [field.strip().lower() for field in vary.split(',')]
+    if '*' in fields or 'accept-encoding' in fields:
+        return headers
+    return _without(headers, 'Vary') + [('Vary', f'{vary}, Accept-Encoding')]
+
+
+class GzipMiddleware:
+
+    def __init__(self, wsgi_app, level=6, min_size=500, mimetypes=('text/html',)):
+        self.wsgi_app = wsgi_app
+        self.level = level
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+
+    def __call__(self, environ, start_response):
+        accepts = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', '')).quality('gzip') > 0
+        response = _Response(self, environ, start_response, accepts)
+        response.app_iter = self.wsgi_app(environ, response.start_response)
+        return response
+
+    def eligible(self, code, headers):
+        '''Whether the response's encoding would depend on Accept-Encoding.'''
+        content_type = (_header(headers, 'Content-Type') or '').split(';')[0].strip().lower()
+        cache_control = (_header(headers, 'Cache-Control') or '').lower()
+        return (
+            # A 304 has no Content-Type but must carry the Vary of the 200.
+            (content_type in self.mimetypes or (code == 304 and not content_type))
+            and _header(headers, 'Content-Encoding') is None
+            and 'no-transform' not in cache_control
+        )
+
+
+class _Response:
+    '''The body iterable returned to the server; it also owns start_response.'''
+
+    def __init__(self, middleware, environ, start_response, accepts):
+        self.middleware = middleware
+        self.head = environ.get('REQUEST_METHOD') == 'HEAD'
+        self.accepts = accepts
+        self.server_start_response = start_response
+        self.status = None
+        self.headers = None
+        self.compress = False
+        self.pending = []
+        self.app_iter = None
+
+    def start_response(self, status, headers, exc_info=None):
+        if exc_info is not None:
+            # An error page replacing this response: nothing to hold back.
+            self.status = None
+            return self.server_start_response(status, headers, exc_info)
+
+        code = int(status.split(' ', 1)[0])
+        eligible = self.middleware.eligible(code, headers)
+        if eligible:
+            headers = _add_vary(headers)
+        length = _header(headers, 'Content-Length')
+        self.compress = (
+            eligible and self.accepts and not self.head and code not in NO_BODY_STATUSES
+            and (length is None or int(length) >= self.middleware.min_size)
+        )
+        self.status, self.headers = status, headers
+        if not self.compress:
+            self._start(headers)
+        return self.pending.append
+
+    def _start(self, headers):
+        if self.status is not None:
+            self.server_start_response(self.status, headers)
+            self.status = None
+
+    def __iter__(self):
+        body = iter(self.app_iter)
+        if self.headers is None:
+            # A generator app only calls start_response on its first step.
+            first = next(body, None)
+            if first is not None:
+                self.pending.append(first)
+        if not self.compress:
+            yield from self.pending
+            yield from body
+            return
+
+        # Hold back the start of a body of unknown length until it is
+        # known to reach the threshold.
+        held, size = list(self.pending), sum(map(len, self.pending))
+        if _header(self.headers, 'Content-Length') is None and size < self.middleware.min_size:
+            for chunk in body:
+                held.append(chunk)
+                size += len(chunk)
+                if size >= self.middleware.min_size:
+                    break
+            else:
+                self._start(self.headers + [('Content-Length', str(size))])
+                yield b''.join(held)
+                return
+
+        headers = _without(self.headers, 'Content-Length') + [('Content-Encoding', 'gzip')]
+        etag = _header(headers, 'ETag')
+        if etag is not None and not etag.startswith('W/'):
+            headers = _without(headers, 'ETag') + [('ETag', f'W/{etag}')]
+        self._start(headers)
+
+        compressor = zlib.compressobj(self.middleware.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        unflushed = 0
+        for chunk in itertools.chain(held, body):
+            data = compressor.compress(chunk)
+            unflushed += len(chunk)
+            if unflushed >= FLUSH_BYTES:
+                data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                unflushed = 0
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def close(self):
+        if hasattr(self.app_iter, 'close'):
+            self.app_iter.close()
+
+
+class Compression:
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        app.wsgi_app = GzipMiddleware(
+            app.wsgi_app,
+            level=app.config.get('COMPRESS_LEVEL', 6),
+            min_size=app.config.get('COMPRESS_MIN_SIZE', 500),
+            mimetypes=app.config.get('COMPRESS_MIMETYPES', ('text/html',)),
+        )
+        app.extensions['compression'] = self
+
+
+compression = Compression()
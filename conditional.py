@@ -0,0 +1,193 @@
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#
+# The venue, artist and show pages send an ETag and a Last-Modified header
+# computed by one aggregate query over the updated_at and version columns
+# of the rows they show (models.py), plus the start time of the last show
+# that has begun, since a page also changes when a show moves from upcoming
+# to past. A request whose If-None-Match (or, without one, If-Modified-Since)
+# still matches is answered with 304 before the page's own queries run or
+# its template renders.
+#
+# updated_at moves on every write path: ORM inserts and updates through the
+# column defaults, the counter updates in counters.py through the column's
+# onupdate. Creating or deleting a show updates its venue's and its
+# artist's counters. Deleting a venue or an artist leaves nothing behind to
+# carry an updated_at, so the delete stamps the time in the CounterState row
+# 'deleted:Venue' or 'deleted:Artist' (mapper events below), and the
+# listings take that time as one more validator. Each listing validator is
+# then two index probes, whatever the size of the table.
+#
+# The ETag is also part of the page cache key (cache.py), so a cached page
+# is never served under the validators of a newer one.
+#----------------------------------------------------------------------------#
+
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, request, session
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Venue, Artist, Show, CounterState
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ConditionalGet:
+
+    def __init__(self, app=None):
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CONDITIONAL_GET_ENABLED', True)
+        app.extensions['conditional_get'] = self
+
+    def validated(self, validators):
+        '''
+        Sends ETag/Last-Modified with the 200 responses of a GET view and
+        answers 304 when they still match. `validators(**view_args)` returns
+        (etag, last_modified), or None to let the view handle a missing record.
+        '''
+
+        def decorator(view):
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # A 304 would leave pending flash messages unrendered.
+                if not self.enabled or request.method not in READ_METHODS or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                found = validators(**kwargs)
+                if found is None:
+                    return view(*args, **kwargs)
+                etag, last_modified = found
+                if not_modified(etag, last_modified):
+                    response = current_app.response_class(status=304)
+                    _set_validators(response, etag, last_modified)
+                    return response
+
+                g.page_etag = etag
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    _set_validators(response, etag, last_modified)
+                return response
+
+            return wrapper
+
+        return decorator
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and _http_time(last_modified) <= since
+
+
+def _http_time(value):
+    # Stored times are naive local time; HTTP dates are whole seconds in UTC.
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _http_time(last_modified)
+    # Caches may keep the page but must ask before reusing it.
+    response.cache_control.no_cache = True
+
+
+def _validators(parts, *times):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    times = [time for time in times if time is not None]
+    return digest, max(times) if times else None
+
+
+#----------------------------------------------------------------------------#
+# Validators of the pages.
+#----------------------------------------------------------------------------#
+
+def _last_started(now):
+    return func.max(Show.start_time).filter(Show.start_time <= now)
+
+
+def _record(model, owner, other, other_key, record_id):
+    now = datetime.now()
+    row = db.session.execute(
+        select(
+            model.version,
+            model.updated_at,
+            func.count(Show.id),
+            func.max(Show.updated_at),
+            func.max(other.updated_at),
+            _last_started(now),
+        )
+        .select_from(model)
+        .outerjoin(Show, owner == model.id)
+        .outerjoin(other, other.id == other_key)
+        .where(model.id == record_id)
+        .group_by(model.id)
+    ).first()
+    if row is None:
+        return None
+    return _validators(tuple(row), row[1], row[3], row[4], row[5])
+
+
+def venue_page(venue_id):
+    '''The venue, its shows and the artists playing them.'''
+    return _record(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+
+def artist_page(artist_id):
+    '''The artist, its shows and the venues hosting them.'''
+    return _record(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+
+def _deleted_state(model):
+    return f'deleted:{model.__tablename__}'
+
+
+def _listing(model):
+    row = db.session.execute(select(
+        select(func.max(model.updated_at)).scalar_subquery(),
+        select(CounterState.rolled_over_at).where(CounterState.name == _deleted_state(model)).scalar_subquery(),
+    )).one()
+    return _validators(tuple(row), *row)
+
+
+def venue_listing():
+    return _listing(Venue)
+
+
+def artist_listing():
+    return _listing(Artist)
+
+
+def show_listing():
+    '''Upcoming shows with their venue and artist names; every part is a single index probe.'''
+    now = datetime.now()
+    row = db.session.execute(select(
+        select(func.max(Show.updated_at)).scalar_subquery(),
+        select(func.max(Venue.updated_at)).scalar_subquery(),
+        select(func.max(Artist.updated_at)).scalar_subquery(),
+        select(func.max(Show.start_time)).where(Show.start_time <= now).scalar_subquery(),
+    )).one()
+    return _validators(tuple(row), *row)
+
+
+@event.listens_for(Venue, 'after_delete')
+@event.listens_for(Artist, 'after_delete')
+def _deleted(mapper, connection, target):
+    state = CounterState.__table__
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    insert = dialect.insert(state).values(name=_deleted_state(mapper.class_), rolled_over_at=datetime.now())
+    connection.execute(insert.on_conflict_do_update(
+        index_elements=[state.c.name], set_={'rolled_over_at': insert.excluded.rolled_over_at},
+    ))
+
+
+conditional_get = ConditionalGet()
@@ -0,0 +1,245 @@
+#----------------------------------------------------------------------------#
+# Denormalized show counters.
+#
+# Venue and Artist carry upcoming_shows_count and past_shows_count so the
+# listings and search results never have to count over the Show table.
+#
+# A show counts as upcoming when it starts at or after the rollover point
+# stored in CounterState ('shows'), and as past otherwise:
+#
+#   - every ORM insert or delete of a Show adjusts the counters of its venue
+#     and artist in the same transaction (mapper events below); bulk loads
+#     call count_shows() themselves, see importer.py;
+#   - `flask counters rollover`, run from cron every few minutes, moves the
+#     shows that started since the last run from upcoming to past and
+#     advances the rollover point, so the counts lag real time by at most
+#     one interval;
+#   - `flask counters reconcile` recounts from the Show table and reports
+#     any drift; --repair fixes it.
+#
+# Writers take a share lock on the CounterState row and the rollover and
+# repair take an exclusive one, so a show is never classified against a
+# rollover point that is moving underneath it.
+#----------------------------------------------------------------------------#
+
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, func, or_, select
+
+from cache import page_cache
+from models import db, Venue, Artist, Show, CounterState
+
+SHOWS = 'shows'
+REPORTED_ROWS = 20
+
+# model -> Show column pointing at it
+OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def watermark(connection, lock=None):
+    '''
+    Returns the rollover point, creating it on first use. `lock` is None,
+    'share' (writers) or 'update' (rollover and repair).
+    '''
+    state = CounterState.__table__
+    query = select(state.c.rolled_over_at).where(state.c.name == SHOWS)
+    if lock is not None:
+        query = query.with_for_update(read=(lock == 'share'))
+    value = connection.execute(query).scalar()
+    if value is None:
+        value = datetime.now()
+        connection.execute(state.insert().values(name=SHOWS, rolled_over_at=value))
+    return value
+
+
+def _bump(connection, model, deltas):
+    if not deltas:
+        return
+    table = model.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.id == bindparam('_id'))
+        .values(
+            upcoming_shows_count=table.c.upcoming_shows_count + bindparam('_upcoming'),
+            past_shows_count=table.c.past_shows_count + bindparam('_past'),
+        ),
+        # In id order, so concurrent writers lock rows in the same order.
+        [{"_id": id, "_upcoming": upcoming, "_past": past} for id, (upcoming, past) in sorted(deltas.items())],
+    )
+
+
+def count_shows(connection, shows, sign=1):
+    '''
+    Adds shows, given as (venue_id, artist_id, start_time) tuples, to the
+    counters of their venues and artists; sign=-1 takes them away.
+    '''
+    since = watermark(connection, lock='share')
+    deltas = {Venue: defaultdict(lambda: [0, 0]), Artist: defaultdict(lambda: [0, 0])}
+    for venue_id, artist_id, start_time in shows:
+        slot = 0 if start_time >= since else 1
+        deltas[Venue][int(venue_id)][slot] += sign
+        deltas[Artist][int(artist_id)][slot] += sign
+    for model, model_deltas in deltas.items():
+        _bump(connection, model, model_deltas)
+
+
+def count_shows_from(connection, shows, sign=1):
+    '''
+    count_shows() for a whole table or subquery of shows at once; `shows`
+    needs venue_id, artist_id and start_time columns.
+    '''
+    since = watermark(connection, lock='share')
+    for model, owner in OWNERS:
+        grouped = (
+            select(
+                shows.c[owner.key].label('id'),
+                func.count().filter(shows.c.start_time >= since).label('upcoming'),
+                func.count().filter(shows.c.start_time < since).label('past'),
+            )
+            .group_by(shows.c[owner.key])
+            .subquery()
+        )
+        table = model.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.id == grouped.c.id)
+            .values(
+                upcoming_shows_count=table.c.upcoming_shows_count + sign * grouped.c.upcoming,
+                past_shows_count=table.c.past_shows_count + sign * grouped.c.past,
+            )
+        )
+
+
+@event.listens_for(Show, 'after_insert')
+def _show_inserted(mapper, connection, show):
+    count_shows(connection, [(show.venue_id, show.artist_id, show.start_time)])
+
+
+@event.listens_for(Show, 'after_delete')
+def _show_deleted(mapper, connection, show):
+    count_shows(connection, [(show.venue_id, show.artist_id, show.start_time)], sign=-1)
+
+
+#----------------------------------------------------------------------------#
+# Rollover and reconciliation.
+#----------------------------------------------------------------------------#
+
+def rollover(now=None):
+    '''
+    Moves shows that started since the last rollover from upcoming to past.
+    Returns (previous rollover point, new rollover point, shows moved).
+    '''
+    connection = db.session.connection()
+    since = watermark(connection, lock='update')
+    until = now or datetime.now()
+    if until <= since:
+        db.session.rollback()
+        return since, since, 0
+
+    window = (Show.start_time >= since, Show.start_time < until)
+    moved = connection.execute(select(func.count()).select_from(Show).where(*window)).scalar()
+    for model, owner in OWNERS:
+        started = select(owner.label('id'), func.count().label('shows')).where(*window).group_by(owner).subquery()
+        table = model.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.id == started.c.id)
+            .values(
+                upcoming_shows_count=table.c.upcoming_shows_count - started.c.shows,
+                past_shows_count=table.c.past_shows_count + started.c.shows,
+            )
+        )
+    state = CounterState.__table__
+    connection.execute(state.update().where(state.c.name == SHOWS).values(rolled_over_at=until))
+    db.session.commit()
+    return since, until, moved
+
+
+def drift(model, since):
+    '''Rows of `model` whose stored counters differ from a recount, with the expected values.'''
+    owner = dict(OWNERS)[model]
+    truth = (
+        select(
+            owner.label('id'),
+            func.count().filter(Show.start_time >= since).label('upcoming'),
+            func.count().filter(Show.start_time < since).label('past'),
+        )
+        .group_by(owner)
+        .subquery()
+    )
+    expected_upcoming = func.coalesce(truth.c.upcoming, 0)
+    expected_past = func.coalesce(truth.c.past, 0)
+    return (
+        select(
+            model.id,
+            model.upcoming_shows_count,
+            model.past_shows_count,
+            expected_upcoming.label('expected_upcoming'),
+            expected_past.label('expected_past'),
+        )
+        .outerjoin(truth, truth.c.id == model.id)
+        .where(or_(model.upcoming_shows_count != expected_upcoming, model.past_shows_count != expected_past))
+    )
+
+
+def reconcile(repair=False, echo=print):
+    '''Reports (and with repair=True fixes) drifted counters. Returns the number of drifted rows.'''
+    connection = db.session.connection()
+    since = watermark(connection, lock='update' if repair else None)
+    total = 0
+    for model, _ in OWNERS:
+        query = drift(model, since)
+        drifted = connection.execute(select(func.count()).select_from(query.subquery())).scalar()
+        total += drifted
+        echo(f'{model.__tablename__}: {drifted} rows drifted')
+        for row in db.session.execute(query.order_by(model.id).limit(REPORTED_ROWS)):
+            echo(f'  id {row.id}: upcoming {row.upcoming_shows_count} (expected {row.expected_upcoming}), '
+                 f'past {row.past_shows_count} (expected {row.expected_past})')
+        if repair and drifted:
+            fixes = query.subquery()
+            table = model.__table__
+            connection.execute(
+                table.update()
+                .where(table.c.id == fixes.c.id)
+                .values(upcoming_shows_count=fixes.c.expected_upcoming, past_shows_count=fixes.c.expected_past)
+            )
+    if repair:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return total
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group('counters')
+def counters_command():
+    '''Maintain the denormalized upcoming/past show counters.'''
+
+
+@counters_command.command('rollover')
+@with_appcontext
+def rollover_command():
+    '''Move shows that have started from upcoming to past.'''
+    since, until, moved = rollover()
+    if moved:
+        page_cache.invalidate('venues')
+    click.echo(f'{moved} shows moved to past ({since:%Y-%m-%d %H:%M:%S} .. {until:%Y-%m-%d %H:%M:%S}).')
+
+
+@counters_command.command('reconcile')
+@click.option('--repair', is_flag=True, help='Rewrite the counters that drifted.')
+@with_appcontext
+def reconcile_command(repair):
+    '''Recount shows per venue and artist and compare with the stored counters.'''
+    drifted = reconcile(repair, echo=click.echo)
+    if drifted and repair:
+        page_cache.invalidate('venues')
+        click.echo(f'Repaired {drifted} rows.')
+    elif drifted:
+        raise SystemExit(1)
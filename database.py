@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Database engine setup: statement timeouts and read-replica routing.
+#----------------------------------------------------------------------------#
+
+import time
+
+from flask import current_app, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+PRIMARY_UNTIL = '_primary_until'
+
+
+def init_engines(app, db):
+    '''Applies DB_STATEMENT_TIMEOUT_MS to every Postgres engine of the app.'''
+    timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+    if not timeout:
+        return
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name != 'postgresql':
+            continue
+
+        @event.listens_for(engine, 'connect')
+        def set_statement_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET statement_timeout = {int(timeout)}')
+            cursor.close()
+            dbapi_connection.commit()
+
+
+#----------------------------------------------------------------------------#
+# Read-replica routing.
+#
+# When SQLALCHEMY_BINDS has a 'replica' engine, RoutingSession sends the
+# queries of GET/HEAD requests there and everything else to the primary:
+#
+#   - flushes and INSERT/UPDATE/DELETE statements always use the primary,
+#     and once a session has written it stays on the primary;
+#   - after a request commits a write, the browser is pinned to the primary
+#     for REPLICA_STICKY_SECONDS, so the redirect that follows a form POST
+#     reads its own write instead of a lagging replica;
+#   - CLI commands and anything else outside a request use the primary.
+#
+# Without a replica bind the session behaves exactly like the default one.
+#----------------------------------------------------------------------------#
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if REPLICA_BIND not in self._db.engines or not has_request_context():
+            return False
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+            return False
+        if self.info.get('wrote') or request.method not in READ_METHODS:
+            return False
+        return flask_session.get(PRIMARY_UNTIL, 0) < time.time()
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _pin_to_primary(session):
+    # Read-after-write across requests: remember the write in the browser's
+    # session for as long as the replica may be behind.
+    if session.info.pop('wrote', False) and has_request_context():
+        sticky = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        flask_session[PRIMARY_UNTIL] = time.time() + sticky
@@ -0,0 +1,195 @@
+#----------------------------------------------------------------------------#
+# Genres.
+#
+# Venue.genres and Artist.genres hold a clean array of values from
+# forms.genres_choices, spelled as there, each at most once. The edit
+# handlers used to assign ','.join(genres) to the column; an ARRAY column
+# iterates a string, so 'Hip-Hop' was stored as {H,i,p,-,H,o,p}.
+# clean_genres() repairs those and is what migration f3a9c2d8b6e1 ran over
+# every row.
+#
+#   GET /venues?genre=Jazz    GET /artists?genre=Jazz
+#
+# filter the listings with genres @> ARRAY['Jazz'], answered from the GIN
+# index on the column (ix_venue_genres, ix_artist_genres). SQLite keeps the
+# genres as JSON and uses json_each.
+#
+# Both pages also show how many venues/artists list each genre. Those are
+# read from the GenreCount table, kept like the show counters of counters.py:
+#
+#   - every ORM insert, genres change or delete of a Venue or Artist adjusts
+#     the counts of its genres in the same transaction (mapper events below);
+#     bulk loads call count_genres() themselves, see importer.py;
+#   - `flask genres recount` rebuilds the table from the genres arrays in one
+#     pass over unnest(genres), for data written behind the ORM's back.
+#----------------------------------------------------------------------------#
+
+from collections import Counter
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+from cache import page_cache
+from forms import genres_choices
+from models import db, Venue, Artist, GenreCount
+
+GENRES = [value for value, _ in genres_choices]
+
+_CANONICAL = {genre.lower(): genre for genre in GENRES}
+
+
+def find_genre(name):
+    '''The genres_choices spelling of `name` (any case), or None.'''
+    return _CANONICAL.get(' '.join((name or '').split()).lower())
+
+
+def clean_genres(values):
+    '''
+    Returns (genres, rejected): the known genres in `values`, canonical and
+    without repeats, and the values that are not genres at all. `values` may
+    be a list, a comma-separated string, or an array a string was exploded
+    into one character per element.
+    '''
+    if isinstance(values, str):
+        values = [values]
+    values = [value for value in (values or []) if value]
+    if values and all(len(value) == 1 for value in values) and len(values) > 1:
+        values = [''.join(values)]
+
+    genres, rejected = [], []
+    for value in values:
+        for name in value.strip('{}').split(','):
+            if not name.strip():
+                continue
+            genre = find_genre(name.strip().strip('"'))
+            if genre is None:
+                rejected.append(name.strip())
+            elif genre not in genres:
+                genres.append(genre)
+    return genres, rejected
+
+
+def _postgres():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def has_genre(model, genre):
+    '''WHERE clause keeping the rows of `model` that list `genre`.'''
+    if _postgres():
+        return model.genres.contains([genre])
+    # SQLite stores the JSON variant of the column: look through its elements.
+    values = db.func.json_each(model.genres).table_valued('value')
+    return db.exists(db.select(1).select_from(values).where(values.c.value == genre))
+
+
+def genre_counts(model):
+    '''{genre: rows listing it} for every genre, in genres_choices order, from GenreCount.'''
+    query = db.select(GenreCount.genre, GenreCount.count).where(GenreCount.owner == model.__tablename__)
+    counts = dict(db.session.execute(query).all())
+    return {genre: counts.get(genre, 0) for genre in GENRES}
+
+
+#----------------------------------------------------------------------------#
+# Bookkeeping.
+#----------------------------------------------------------------------------#
+
+def _bump(connection, model, deltas):
+    deltas = {genre: delta for genre, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = GenreCount.__table__
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    insert = dialect.insert(table)
+    connection.execute(
+        insert.on_conflict_do_update(
+            index_elements=[table.c.owner, table.c.genre],
+            set_={'count': table.c.count + insert.excluded.count},
+        ),
+        # In genre order, so concurrent writers lock rows in the same order.
+        [{"owner": model.__tablename__, "genre": genre, "count": delta} for genre, delta in sorted(deltas.items())],
+    )
+
+
+def count_genres(connection, model, genre_lists, sign=1):
+    '''
+    Adds rows of `model` listing `genre_lists` (the genres of each row) to
+    the genre counts; sign=-1 takes them away.
+    '''
+    deltas = Counter()
+    for genres in genre_lists:
+        deltas.update(set(genres or ()))
+    _bump(connection, model, {genre: sign * count for genre, count in deltas.items()})
+
+
+def _recounted(connection, model):
+    # {genre: rows listing it}, counted in one pass over the genres arrays.
+    if connection.dialect.name == 'postgresql':
+        listed = db.select(model.id, db.func.unnest(model.genres).label('genre')).subquery()
+        id, genre = listed.c.id, listed.c.genre
+        query = db.select(genre, db.func.count(db.distinct(id)))
+    else:
+        listed = db.func.json_each(model.genres).table_valued('value')
+        id, genre = model.id, listed.c.value
+        query = db.select(genre, db.func.count(db.distinct(id))).select_from(model).join(listed, db.true())
+    return dict(connection.execute(query.group_by(genre)).all())
+
+
+def recount(connection):
+    '''Rebuilds GenreCount from the genres arrays. Returns {model: {genre: count}}.'''
+    table = GenreCount.__table__
+    connection.execute(table.delete())
+    counts = {}
+    for model in (Venue, Artist):
+        counts[model] = _recounted(connection, model)
+        _bump(connection, model, counts[model])
+    return counts
+
+
+@event.listens_for(Venue, 'after_insert')
+@event.listens_for(Artist, 'after_insert')
+def _listed(mapper, connection, target):
+    count_genres(connection, mapper.class_, [target.genres])
+
+
+@event.listens_for(Venue, 'before_update')
+@event.listens_for(Artist, 'before_update')
+def _relisted(mapper, connection, target):
+    history = db.inspect(target).attrs.genres.history
+    if not history.has_changes():
+        return
+    if history.deleted:
+        old = history.deleted[0]
+    else:
+        # The old value was never loaded; the row still holds it.
+        table = mapper.local_table
+        old = connection.execute(db.select(table.c.genres).where(table.c.id == target.id)).scalar()
+    old, new = set(old or ()), set(target.genres or ())
+    _bump(connection, mapper.class_, {**{genre: -1 for genre in old - new}, **{genre: 1 for genre in new - old}})
+
+
+@event.listens_for(Venue, 'before_delete')
+@event.listens_for(Artist, 'before_delete')
+def _unlisted(mapper, connection, target):
+    count_genres(connection, mapper.class_, [target.genres], sign=-1)
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group('genres')
+def genres_command():
+    '''Maintain the per-genre venue and artist counts.'''
+
+
+@genres_command.command('recount')
+@with_appcontext
+def recount_command():
+    '''Recount the venues and artists listing each genre.'''
+    counts = recount(db.session.connection())
+    db.session.commit()
+    page_cache.invalidate('venues', 'artists')
+    for model, model_counts in counts.items():
+        click.echo(f'{model.__tablename__}: {sum(model_counts.values())} genre listings in {len(model_counts)} genres.')
@@ -0,0 +1,372 @@
+#----------------------------------------------------------------------------#
+# Venues near a point.
+#
+#   GET /api/v1/venues/near?lat=40.71&lon=-74.0&radius_km=5   within 5 km
+#   GET /api/v1/venues/near?lat=40.71&lon=-74.0&limit=10      10 nearest
+#
+# Venue.latitude/longitude are filled by `flask geocode` from a local
+# gazetteer file (see the command below). Each located venue also stores
+# the geohash of its position (GEOHASH_PRECISION characters): the cell of a
+# grid that halves in each direction with every bit, so venues that share a
+# prefix are close together, and a btree index on the column
+# (ix_venue_geohash, varchar_pattern_ops) answers "every venue in cell
+# 'dr5r'" as one range scan of a LIKE 'dr5r%'.
+#
+# A search picks the smallest cells whose 3x3 block around the point covers
+# the radius, reads only the venues in those nine cells, and orders them by
+# great-circle distance. A nearest-neighbour search without a radius starts
+# from small cells and widens the block until the k-th venue found is
+# closer than the edge of the block, so nothing outside it can be nearer.
+#
+# On Postgres the cells are scanned and the distances sorted in SQL. Any
+# other database (or GEO_SEARCH_IN_PROCESS) uses an in-process copy of the
+# geohashes, sorted so a cell is a bisect range, which is rebuilt lazily
+# after invalidate() or INDEX_TTL seconds, as search.py does.
+#----------------------------------------------------------------------------#
+
+import csv
+import heapq
+import math
+import threading
+import time
+from bisect import bisect_left
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, or_, select
+
+from models import db, Venue
+from pagination import clamp_limit
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+INDEX_TTL = 300
+
+# Stored geohash length: cells of about 5 x 5 m.
+GEOHASH_PRECISION = 9
+# Cell size a nearest-neighbour search starts from (about 1.2 x 0.6 km).
+KNN_START_PRECISION = 6
+# Venues geocoded per transaction by `flask geocode`.
+GEOCODE_BATCH_SIZE = 1000
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BITS = {char: index for index, char in enumerate(_BASE32)}
+
+
+#----------------------------------------------------------------------------#
+# Geohash and distance.
+#----------------------------------------------------------------------------#
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    '''The geohash of a point, `precision` characters long.'''
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, span = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (span[0] + span[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_BASE32[bits])
+            bits, bit = 0, 0
+    return ''.join(chars)
+
+
+def bounds(geohash):
+    '''(south, north, west, east) of a geohash cell.'''
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = _BITS[char]
+        for shift in range(4, -1, -1):
+            target = lon_range if even else lat_range
+            middle = (target[0] + target[1]) / 2
+            if bits >> shift & 1:
+                target[0] = middle
+            else:
+                target[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    '''Great-circle (haversine) distance between two points.'''
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _distance_sql(latitude, longitude, lat, lon):
+    # distance_km() in SQL, so both paths order and cut off alike.
+    phi1, phi2 = func.radians(latitude), math.radians(lat)
+    a = (func.power(func.sin((phi2 - phi1) / 2), 2)
+         + func.cos(phi1) * math.cos(phi2) * func.power(func.sin(func.radians(lon - longitude) / 2), 2))
+    return 2 * EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)))
+
+
+def covering(lat, lon, precision):
+    '''
+    Returns (cells, reach_km): the 3x3 block of geohash cells of `precision`
+    characters around the point, and how far from the point the block
+    reaches in every direction. Precision 0 is the whole world ([''], inf).
+    '''
+    if precision == 0:
+        return [''], math.inf
+    south, north, west, east = bounds(encode(lat, lon, precision))
+    height, width = north - south, east - west
+    cells = []
+    for row in (-1, 0, 1):
+        cell_lat = lat + row * height
+        if not -90 <= cell_lat <= 90:
+            continue
+        for column in (-1, 0, 1):
+            cell_lon = (lon + column * width + 180) % 360 - 180
+            cell = encode(cell_lat, cell_lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+
+    top, bottom = min(90.0, north + height), max(-90.0, south - height)
+    if top == 90.0 or bottom == -90.0 or width * 3 >= 360:
+        return cells, 0.0
+    # A degree of longitude is shortest at the latitude of the block closest to a pole.
+    cos_lat = math.cos(math.radians(max(abs(top), abs(bottom))))
+    reach = min(
+        (top - lat) * KM_PER_DEGREE,
+        (lat - bottom) * KM_PER_DEGREE,
+        (lon - (west - width)) * KM_PER_DEGREE * cos_lat,
+        ((east + width) - lon) * KM_PER_DEGREE * cos_lat,
+    )
+    return cells, reach
+
+
+def precision_for(lat, lon, radius_km):
+    '''The longest precision whose covering() block reaches `radius_km`.'''
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if covering(lat, lon, precision)[1] >= radius_km:
+            return precision
+    return 0
+
+
+#----------------------------------------------------------------------------#
+# Public API.
+#----------------------------------------------------------------------------#
+
+def nearby(lat, lon, radius_km=None, limit=DEFAULT_LIMIT):
+    '''
+    Returns at most `limit` {"id", "name", "city", "state", "latitude",
+    "longitude", "distance_km"} dicts, nearest first: the venues within
+    `radius_km` of the point, or the nearest ones when it is None.
+    '''
+    limit = clamp_limit(limit, DEFAULT_LIMIT, MAX_LIMIT)
+    find = _find_in_process
+    if db.session.get_bind().dialect.name == 'postgresql' and not current_app.config.get('GEO_SEARCH_IN_PROCESS'):
+        find = _find_postgres
+
+    if radius_km is not None:
+        cells, _ = covering(lat, lon, precision_for(lat, lon, radius_km))
+        hits = find(lat, lon, cells, radius_km, limit)
+    else:
+        for precision in range(KNN_START_PRECISION, -1, -1):
+            cells, reach = covering(lat, lon, precision)
+            hits = find(lat, lon, cells, None, limit)
+            if len(hits) == limit and hits[-1][0] <= reach:
+                break
+    return _details(hits)
+
+
+def _details(hits):
+    if not hits:
+        return []
+    rows = {row.id: row for row in db.session.execute(
+        select(Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude)
+        .where(Venue.id.in_([id for _, id in hits]))
+    )}
+    return [{
+        "id": id,
+        "name": rows[id].name,
+        "city": rows[id].city,
+        "state": rows[id].state,
+        "latitude": rows[id].latitude,
+        "longitude": rows[id].longitude,
+        "distance_km": round(distance, 3),
+    } for distance, id in hits if id in rows]
+
+
+#----------------------------------------------------------------------------#
+# Postgres.
+#----------------------------------------------------------------------------#
+
+def _find_postgres(lat, lon, cells, radius_km, limit):
+    distance = _distance_sql(Venue.latitude, Venue.longitude, lat, lon).label('distance')
+    query = select(distance, Venue.id).where(Venue.geohash.isnot(None))
+    prefixes = [cell for cell in cells if cell]
+    if prefixes:
+        # A literal LIKE 'prefix%' per cell, each a range scan of ix_venue_geohash.
+        query = query.where(or_(*(Venue.geohash.like(f'{prefix}%') for prefix in prefixes)))
+    if radius_km is not None:
+        query = query.where(distance <= radius_km)
+    return [tuple(row) for row in db.session.execute(query.order_by(distance, Venue.id).limit(limit))]
+
+
+#----------------------------------------------------------------------------#
+# In-process fallback.
+#----------------------------------------------------------------------------#
+
+class GridIndex:
+    '''Located venues sorted by geohash, so every cell is a contiguous slice.'''
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.geohashes = [geohash for geohash, _, _, _ in rows]
+        self.points = [(id, lat, lon) for _, id, lat, lon in rows]
+        self.built_at = time.monotonic()
+
+    def find(self, lat, lon, cells, radius_km, limit):
+        '''Returns [(distance_km, id)] of the `limit` nearest venues in `cells`.'''
+        hits = []
+        for cell in cells:
+            start = bisect_left(self.geohashes, cell)
+            stop = bisect_left(self.geohashes, cell + '~') if cell else len(self.geohashes)
+            for id, venue_lat, venue_lon in self.points[start:stop]:
+                distance = distance_km(lat, lon, venue_lat, venue_lon)
+                if radius_km is None or distance <= radius_km:
+                    hits.append((distance, id))
+        return heapq.nsmallest(limit, hits)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def invalidate():
+    '''Drops the in-process index after venues were located or moved.'''
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def _index():
+    with _indexes_lock:
+        index = _indexes.get('Venue')
+        if index is None or time.monotonic() - index.built_at > INDEX_TTL:
+            rows = db.session.execute(
+                select(Venue.geohash, Venue.id, Venue.latitude, Venue.longitude).where(Venue.geohash.isnot(None))
+            ).all()
+            index = _indexes['Venue'] = GridIndex(rows)
+        return index
+
+
+def _find_in_process(lat, lon, cells, radius_km, limit):
+    return _index().find(lat, lon, cells, radius_km, limit)
+
+
+#----------------------------------------------------------------------------#
+# Geocoding.
+#
+#   flask geocode gazetteer.csv            venues without coordinates
+#   flask geocode US.txt --all             every venue, again
+#
+# The gazetteer is a local file, either a CSV with city, state, latitude
+# and longitude columns (and optionally address, for venues that need more
+# than their city's centre), or a GeoNames dump (US.txt, cities500.txt ...),
+# whose populated places are matched on name and admin1 code (the state).
+# Venues are matched on address, city and state first, then on city and
+# state, ignoring case; the ones left unmatched keep NULL coordinates and
+# are counted by city in the report.
+#----------------------------------------------------------------------------#
+
+def _key(*parts):
+    return tuple(' '.join((part or '').replace('.', '').split()).lower() for part in parts)
+
+
+def read_gazetteer(path):
+    '''{(city, state) or (address, city, state): (latitude, longitude)} from `path`.'''
+    places = {}
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(file):
+                point = float(row['latitude']), float(row['longitude'])
+                if row.get('address'):
+                    places[_key(row['address'], row['city'], row['state'])] = point
+                else:
+                    places[_key(row['city'], row['state'])] = point
+            return places
+
+        # GeoNames: name, asciiname, latitude, longitude, feature class,
+        # admin1 code and population are columns 1, 2, 4, 5, 6, 10 and 14.
+        population = {}
+        for columns in csv.reader(file, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(columns) < 15 or columns[6] != 'P':
+                continue
+            people = int(columns[14] or 0)
+            for name in {columns[1], columns[2]}:
+                key = _key(name, columns[10])
+                # Several places share a name within a state; keep the biggest.
+                if people >= population.get(key, -1):
+                    population[key] = people
+                    places[key] = float(columns[4]), float(columns[5])
+    return places
+
+
+def geocode(places, everything=False, batch_size=GEOCODE_BATCH_SIZE, echo=print):
+    '''Locates venues from `places` (see read_gazetteer); returns (located, unmatched).'''
+    table = Venue.__table__
+    update = (
+        table.update()
+        .where(table.c.id == bindparam('venue_id'))
+        .values(
+            latitude=bindparam('lat'), longitude=bindparam('lon'), geohash=bindparam('hash'),
+            version=table.c.version + 1,
+        )
+    )
+    query = select(Venue.id, Venue.address, Venue.city, Venue.state).order_by(Venue.id).limit(batch_size)
+    if not everything:
+        query = query.where(Venue.latitude.is_(None))
+
+    located, unmatched, last_id = 0, {}, 0
+    while True:
+        rows = db.session.execute(query.where(Venue.id > last_id)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changes = []
+        for row in rows:
+            point = places.get(_key(row.address, row.city, row.state)) or places.get(_key(row.city, row.state))
+            if point is None:
+                area = f'{row.city}, {row.state}'
+                unmatched[area] = unmatched.get(area, 0) + 1
+                continue
+            changes.append({"venue_id": row.id, "lat": point[0], "lon": point[1], "hash": encode(*point)})
+        if changes:
+            db.session.execute(update, changes)
+        db.session.commit()
+        located += len(changes)
+        echo(f'{located} venues located (up to id {last_id}).')
+
+    invalidate()
+    return located, unmatched
+
+
+@click.command('geocode')
+@click.argument('gazetteer', type=click.Path(exists=True, dir_okay=False))
+@click.option('--all', 'everything', is_flag=True, help='Locate venues that already have coordinates again.')
+@click.option('--batch-size', default=GEOCODE_BATCH_SIZE, show_default=True, help='Venues per transaction.')
+@with_appcontext
+def geocode_command(gazetteer, everything, batch_size):
+    '''Fill in venue coordinates from a local gazetteer file.'''
+    places = read_gazetteer(gazetteer)
+    click.echo(f'{len(places)} places read from {gazetteer}.')
+    located, unmatched = geocode(places, everything, batch_size, echo=click.echo)
+    for area, count in sorted(unmatched.items(), key=lambda item: -item[1])[:20]:
+        click.echo(f'Not in the gazetteer: {area} ({count} venues)')
+    click.echo(f'Done: {located} venues located, {sum(unmatched.values())} not found.')
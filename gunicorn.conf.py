@@ -0,0 +1,97 @@
+#----------------------------------------------------------------------------#
+# Gunicorn settings, read automatically when gunicorn starts in this
+# directory:
+#
+#   gunicorn
+#
+# The app is loaded once in the master (preload_app) and the workers are
+# forked from it, so the imported modules, templates and compiled regexes
+# are shared copy-on-write instead of loaded once per worker. Each worker
+# then drops the database engines' pools it inherited (post_fork), so no
+# two processes ever use the same pooled connection.
+#
+# Workers are gthread workers: WEB_CONCURRENCY processes of GUNICORN_THREADS
+# threads each, sized by autotune() unless set. A worker restarts after
+# GUNICORN_MAX_REQUESTS requests (plus jitter, so they do not all restart
+# together), which bounds the growth of per-process caches and leaks; it
+# finishes its in-flight requests first.
+#
+# DEBUG defaults to off here; see config.py.
+#----------------------------------------------------------------------------#
+
+import glob
+import os
+
+os.environ.setdefault('DEBUG', '0')
+
+# Names only: `config` itself would be read as gunicorn's own config setting.
+from config import METRICS_DIR, SQLALCHEMY_ENGINE_OPTIONS, env_bool
+
+
+def autotune(cpus, pool_size, max_overflow, max_connections):
+    '''(workers, threads) for `cpus` cores and the app's connection pool.
+
+    A worker gets one thread per pooled connection, so a request never has
+    to wait for one; the overflow connections are headroom. Workers start
+    from the usual 2 * cores + 1 and are capped so that all of them holding
+    pool_size + max_overflow connections stay within max_connections.
+    '''
+    threads = max(1, pool_size)
+    workers = 2 * cpus + 1
+    per_worker = pool_size + max_overflow
+    if max_connections and per_worker:
+        workers = min(workers, max(1, max_connections // per_worker))
+    return workers, threads
+
+
+# Connections the app may open on the database, across all workers. The
+# default leaves room below Postgres' max_connections of 100 for migrations,
+# psql and the CLI commands.
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 90))
+
+_workers, _threads = autotune(
+    os.cpu_count() or 1,
+    SQLALCHEMY_ENGINE_OPTIONS['pool_size'],
+    SQLALCHEMY_ENGINE_OPTIONS['max_overflow'],
+    DB_MAX_CONNECTIONS,
+)
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+preload_app = env_bool('GUNICORN_PRELOAD', True)
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or _workers
+threads = int(os.environ.get('GUNICORN_THREADS', 0)) or _threads
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def on_starting(server):
+    # Counters of the workers of a previous run would be summed into
+    # /metrics (see metrics.py).
+    if METRICS_DIR:
+        for path in glob.glob(os.path.join(METRICS_DIR, '*.db')):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # close=False: the connections belong to the master; closing them here
+    # would send a terminate message on sockets the master still owns.
+    from wsgi import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    if METRICS_DIR:
+        from metrics import mark_process_dead
+        mark_process_dead(worker.pid, METRICS_DIR)
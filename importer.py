@@ -0,0 +1,383 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+#   flask import venues  venues.csv
+#   flask import artists artists.ndjson --chunk-size 10000
+#   flask import shows   shows.csv
+#
+# Rows are validated with the rules declared on VenueForm / ArtistForm /
+# ShowForm, compiled once per run instead of instantiating a form per row.
+# Shows may reference their venue and artist by id (venue_id, artist_id) or
+# by exact name (venue_name, artist_name); references are resolved with one
+# query per chunk. A show without a duration gets the form's default, and
+# one that double-books its venue or artist, against the stored shows or an
+# earlier row, is rejected (scheduling.validate_batch).
+#
+# Every chunk is loaded and committed in its own transaction: Postgres COPY
+# on Postgres, a batched executemany elsewhere. Loaded shows are added to the
+# venue and artist show counters in the same transaction. After each commit the row
+# number is written to <file>.<kind>.progress so a failed run picks up where
+# it stopped when started again (pass --restart to ignore it).
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from wtforms.fields import BooleanField, DateTimeField, IntegerField, SelectField, SelectMultipleField
+from wtforms.fields.core import UnboundField
+from wtforms.validators import URL, DataRequired, NumberRange
+
+import scheduling
+import search
+from cache import page_cache
+from counters import count_shows
+from forms import ArtistForm, ShowForm, VenueForm
+from genres import count_genres
+from models import db, Venue, Artist, Show
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+# Form field name -> model column name, where they differ.
+FIELD_COLUMNS = {'website_link': 'website'}
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'on'}
+
+
+class RowError(ValueError):
+    pass
+
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+
+class Rule:
+    '''The checks one form field applies, precompiled from its declaration.'''
+
+    def __init__(self, name, unbound):
+        validators = unbound.kwargs.get('validators') or []
+        self.name = name
+        self.column = FIELD_COLUMNS.get(name, name)
+        self.field_class = unbound.field_class
+        self.required = any(isinstance(v, DataRequired) for v in validators)
+        self.url = next((v for v in validators if isinstance(v, URL)), None)
+        self.range = next((v for v in validators if isinstance(v, NumberRange)), None)
+        self.default = unbound.kwargs.get('default')
+        choices = unbound.kwargs.get('choices')
+        self.choices = {value for value, _ in choices} if choices else None
+        formats = unbound.kwargs.get('format', '%Y-%m-%d %H:%M:%S')
+        self.formats = [formats] if isinstance(formats, str) else list(formats)
+
+    def clean(self, raw):
+        if issubclass(self.field_class, BooleanField):
+            if isinstance(raw, bool):
+                return raw
+            return str(raw or '').strip().lower() in TRUE_VALUES
+
+        if issubclass(self.field_class, SelectMultipleField):
+            if isinstance(raw, str):
+                values = [value.strip() for value in raw.split(',') if value.strip()]
+            else:
+                values = list(raw or [])
+            if self.required and not values:
+                raise RowError(f'{self.name}: This field is required.')
+            if self.choices is not None:
+                invalid = [value for value in values if value not in self.choices]
+                if invalid:
+                    raise RowError(f"{self.name}: '{', '.join(invalid)}' is not a valid choice.")
+            return values
+
+        value = raw.strip() if isinstance(raw, str) else raw
+        if self.required and not value:
+            raise RowError(f'{self.name}: This field is required.')
+
+        if issubclass(self.field_class, IntegerField):
+            if value is None or value == '':
+                return self.default
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise RowError(f'{self.name}: Not a valid integer value.')
+            low, high = (self.range.min, self.range.max) if self.range else (None, None)
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise RowError(f'{self.name}: Number must be between {low} and {high}.')
+            return value
+
+        if issubclass(self.field_class, DateTimeField):
+            if not value:
+                return None
+            for format in self.formats:
+                try:
+                    return datetime.strptime(value, format)
+                except ValueError:
+                    pass
+            raise RowError(f'{self.name}: Not a valid datetime value.')
+
+        if issubclass(self.field_class, SelectField) and self.choices is not None and value not in self.choices:
+            raise RowError(f'{self.name}: Not a valid choice.')
+
+        if self.url is not None:
+            match = self.url.regex.match(value or '')
+            if not match or not self.url.validate_hostname(match.group('host')):
+                raise RowError(f'{self.name}: Invalid URL.')
+
+        return value if value != '' else None
+
+
+class RowValidator:
+
+    def __init__(self, form_class):
+        self.rules = [
+            Rule(name, attr)
+            for name, attr in vars(form_class).items()
+            if isinstance(attr, UnboundField)
+        ]
+
+    def __call__(self, row):
+        '''Returns the row as model column values, or raises RowError.'''
+        cleaned = {}
+        for rule in self.rules:
+            raw = row.get(rule.name, row.get(rule.column))
+            cleaned[rule.column] = rule.clean(raw)
+        return cleaned
+
+
+#----------------------------------------------------------------------------#
+# Input.
+#----------------------------------------------------------------------------#
+
+def read_rows(path, format):
+    '''Yields (row number, dict) pairs, numbered from 1.'''
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'ndjson':
+            number = 0
+            for line in f:
+                if line.strip():
+                    number += 1
+                    yield number, json.loads(line)
+        else:
+            yield from enumerate(csv.DictReader(f), start=1)
+
+
+def chunks(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+#----------------------------------------------------------------------------#
+# Foreign keys.
+#----------------------------------------------------------------------------#
+
+def _lookup(model, ids, names):
+    '''Maps the ids that exist and the names that are unique to ids, in two queries at most.'''
+    by_id, by_name = set(), {}
+    if ids:
+        by_id = set(db.session.scalars(db.select(model.id).where(model.id.in_(ids))))
+    if names:
+        seen = {}
+        for name, id in db.session.execute(db.select(model.name, model.id).where(model.name.in_(names))):
+            seen.setdefault(name, []).append(id)
+        by_name = {name: ids[0] for name, ids in seen.items() if len(ids) == 1}
+    return by_id, by_name
+
+
+def _reference(row, prefix):
+    id = row.get(f'{prefix}_id')
+    if id not in (None, ''):
+        try:
+            return int(id), None
+        except (TypeError, ValueError):
+            raise RowError(f'{prefix}_id: Not a valid integer.')
+    name = (row.get(f'{prefix}_name') or '').strip()
+    if not name:
+        raise RowError(f'{prefix}_id: This field is required.')
+    return None, name
+
+
+def resolve_show_references(chunk):
+    '''
+    Fills in venue_id/artist_id for a chunk of validated show rows. Returns
+    the resolved (row number, row) pairs and (row number, error) pairs for
+    the rest.
+    '''
+    refs = []
+    errors = []
+    for number, raw, cleaned in chunk:
+        try:
+            refs.append((number, cleaned, _reference(raw, 'venue'), _reference(raw, 'artist')))
+        except RowError as e:
+            errors.append((number, str(e)))
+
+    venue_ids, venue_names = _lookup(
+        Venue, {v[0] for _, _, v, _ in refs if v[0]}, {v[1] for _, _, v, _ in refs if v[1]})
+    artist_ids, artist_names = _lookup(
+        Artist, {a[0] for _, _, _, a in refs if a[0]}, {a[1] for _, _, _, a in refs if a[1]})
+
+    resolved = []
+    for number, cleaned, (venue_id, venue_name), (artist_id, artist_name) in refs:
+        venue = venue_id if venue_id in venue_ids else venue_names.get(venue_name)
+        artist = artist_id if artist_id in artist_ids else artist_names.get(artist_name)
+        if venue is None:
+            errors.append((number, f'venue {venue_id or venue_name!r} not found or ambiguous'))
+        elif artist is None:
+            errors.append((number, f'artist {artist_id or artist_name!r} not found or ambiguous'))
+        else:
+            cleaned['venue_id'] = venue
+            cleaned['artist_id'] = artist
+            resolved.append((number, cleaned))
+    return resolved, errors
+
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+def _pg_array(values):
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for value in values)
+    return '{' + ','.join(f'"{value}"' for value in escaped) + '}'
+
+
+def _copy_value(value):
+    if isinstance(value, list):
+        return _pg_array(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def copy_rows(model, columns, rows):
+    '''Loads rows with COPY ... FROM STDIN (Postgres only), inside the session's transaction.'''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "{model.__tablename__}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+def insert_rows(model, columns, rows):
+    db.session.execute(db.insert(model), [{column: row[column] for column in columns} for row in rows])
+
+
+KINDS = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+}
+
+
+def _progress_path(path, kind):
+    return f'{path}.{kind}.progress'
+
+
+def _read_progress(path):
+    try:
+        with open(path) as f:
+            return json.load(f)['rows']
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def _write_progress(path, rows):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({"rows": rows}, f)
+    os.replace(tmp, path)
+
+
+def run_import(kind, path, format=None, chunk_size=DEFAULT_CHUNK_SIZE, restart=False, echo=print):
+    model, form_class = KINDS[kind]
+    format = format or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    validate = RowValidator(form_class)
+    use_copy = db.session.get_bind().dialect.name == 'postgresql'
+    load = copy_rows if use_copy else insert_rows
+
+    progress_path = _progress_path(path, kind)
+    skip = 0 if restart else _read_progress(progress_path)
+    if skip:
+        echo(f'Resuming after row {skip} ({progress_path}).')
+
+    loaded = rejected = 0
+    started = time.perf_counter()
+    rows = ((number, row) for number, row in read_rows(path, format) if number > skip)
+
+    for chunk in chunks(rows, chunk_size):
+        valid, errors = [], []
+        for number, raw in chunk:
+            try:
+                valid.append((number, raw, validate(raw)))
+            except RowError as e:
+                errors.append((number, str(e)))
+
+        if model is Show:
+            resolved, fk_errors = resolve_show_references(valid)
+            # Rows double-booking a venue or artist would fail the whole
+            # chunk on the Booking constraints; turn them away one by one.
+            resolved, clashes = scheduling.validate_batch(resolved)
+            errors.extend(fk_errors + clashes)
+            cleaned = [row for _, row in resolved]
+        else:
+            cleaned = [row for _, _, row in valid]
+
+        if cleaned:
+            columns = list(cleaned[0])
+            try:
+                load(model, columns, cleaned)
+                if model is Show:
+                    count_shows(db.session.connection(), [
+                        (row['venue_id'], row['artist_id'], row['start_time']) for row in cleaned
+                    ])
+                else:
+                    count_genres(db.session.connection(), model, [row['genres'] for row in cleaned])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        _write_progress(progress_path, chunk[-1][0])
+
+        for number, error in errors[:max(0, MAX_REPORTED_ERRORS - rejected)]:
+            echo(f'  row {number}: {error}')
+        loaded += len(cleaned)
+        rejected += len(errors)
+        elapsed = time.perf_counter() - started
+        echo(f'{loaded} rows loaded, {rejected} rejected, {loaded / elapsed:.0f} rows/s')
+
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return loaded, rejected
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True,
+              help='Rows per transaction.')
+@click.option('--restart', is_flag=True, help='Ignore saved progress and start from the first row.')
+@with_appcontext
+def import_command(kind, path, format, chunk_size, restart):
+    '''Bulk-load venues, artists or shows from a CSV or NDJSON file.'''
+    loaded, rejected = run_import(kind, path, format, chunk_size, restart, echo=click.echo)
+    page_cache.clear()
+    search.invalidate()
+    click.echo(f'Done: {loaded} rows loaded, {rejected} rejected.')
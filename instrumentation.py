@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Per-request timings.
+#
+# Every request records how many SQL statements it ran and how long they
+# took, how long its templates took to render, and the time left over in
+# the handler itself. The numbers go out in a Server-Timing header, which
+# the browser's network panel shows next to the request:
+#
+#   Server-Timing: db;dur=12.4;desc="3 queries", render;dur=8.1, app;dur=2.0, total;dur=22.5
+#
+# Requests slower than SLOW_REQUEST_MS are also written to the `fyyur.slow`
+# logger as one JSON object per line, with the SLOW_REQUEST_STATEMENTS
+# slowest statements of the request (SQL text only, never the parameters).
+#
+# Statements that run after the response has left the view (a streamed
+# NDJSON body) are not included.
+#----------------------------------------------------------------------------#
+
+import heapq
+import itertools
+import json
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import (
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    request_finished,
+    request_started,
+    template_rendered,
+)
+from sqlalchemy import event
+
+STATEMENT_TEXT_LIMIT = 1000
+
+slow_log = logging.getLogger('fyyur.slow')
+
+
+class RequestStats:
+
+    def __init__(self, top):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.render_started = []
+        self.top = top
+        self.slowest = []
+        self._seq = itertools.count()
+
+    def add_statement(self, statement, elapsed):
+        self.queries += 1
+        self.db += elapsed
+        if self.top:
+            # Min-heap of the `top` slowest so far; the sequence breaks ties.
+            item = (elapsed, next(self._seq), statement)
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def timings(self):
+        total = time.perf_counter() - self.started
+        return {
+            "total": total,
+            "db": self.db,
+            "render": self.render,
+            "app": max(0.0, total - self.db - self.render),
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class Instrumentation:
+
+    def __init__(self, app=None, db=None):
+        self.server_timing = True
+        self.slow_ms = 0
+        self.top = 5
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.server_timing = app.config.get('SERVER_TIMING_ENABLED', True)
+        self.slow_ms = app.config.get('SLOW_REQUEST_MS', 0)
+        self.top = app.config.get('SLOW_REQUEST_STATEMENTS', 5)
+        self._configure_log(app.config.get('SLOW_REQUEST_LOG'))
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(engine, 'handle_error', self._handle_error)
+
+        request_started.connect(self._request_started, app)
+        request_finished.connect(self._request_finished, app)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._rendered, app)
+        app.extensions['instrumentation'] = self
+
+    def _configure_log(self, path):
+        if slow_log.handlers:
+            return
+        handler = logging.FileHandler(path) if path else logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_log.addHandler(handler)
+        slow_log.setLevel(logging.INFO)
+        slow_log.propagate = False
+
+    @staticmethod
+    def current():
+        '''The RequestStats of the request being handled, or None.'''
+        if has_request_context():
+            return g.get('request_stats')
+        return None
+
+    # SQLAlchemy engine events.
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        stats = self.current()
+        if stats is not None:
+            stats.add_statement(statement, time.perf_counter() - started)
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute.
+        if context.connection is not None and getattr(context, 'cursor', None) is not None:
+            started = context.connection.info.get('query_started')
+            if started:
+                started.pop()
+
+    # Flask signals.
+
+    def _request_started(self, app, **extra):
+        g.request_stats = RequestStats(self.top if self.slow_ms else 0)
+
+    def _before_render(self, app, template, context, **extra):
+        stats = self.current()
+        if stats is not None:
+            stats.render_started.append(time.perf_counter())
+
+    def _rendered(self, app, template, context, **extra):
+        stats = self.current()
+        if stats is not None and stats.render_started:
+            stats.render += time.perf_counter() - stats.render_started.pop()
+
+    def _request_finished(self, app, response, **extra):
+        stats = self.current()
+        if stats is None:
+            return
+        timings = stats.timings()
+        if self.server_timing:
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={_ms(timings["db"])};desc="{stats.queries} queries"',
+                f'render;dur={_ms(timings["render"])}',
+                f'app;dur={_ms(timings["app"])}',
+                f'total;dur={_ms(timings["total"])}',
+            ])
+        if self.slow_ms and timings['total'] * 1000 >= self.slow_ms:
+            self._log_slow(stats, timings, response)
+
+    def _log_slow(self, stats, timings, response):
+        slow_log.info(json.dumps({
+            "time": datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            "method": request.method,
+            "path": request.full_path.rstrip('?'),
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "total_ms": _ms(timings['total']),
+            "db_ms": _ms(timings['db']),
+            "render_ms": _ms(timings['render']),
+            "app_ms": _ms(timings['app']),
+            "queries": stats.queries,
+            "slowest": [{
+                "ms": _ms(elapsed),
+                "statement": statement[:STATEMENT_TEXT_LIMIT],
+            } for elapsed, _, statement in sorted(stats.slowest, reverse=True)],
+        }))
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,376 @@
+#----------------------------------------------------------------------------#
+# Prometheus metrics.
+#
+#   GET /metrics   text exposition format, version 0.0.4
+#
+#   fyyur_http_request_duration_seconds{method,route,status}   histogram
+#   fyyur_http_exceptions_total{method,route}                   counter
+#   fyyur_db_queries_total{route}                               counter
+#   fyyur_db_errors_total{route}                                counter
+#   fyyur_db_pool_*{engine,pid}                                 gauges
+#
+# `route` is the URL rule ('/artists/<int:artist_id>'), never the raw path,
+# so the number of series stays bounded; unmatched URLs are '<unmatched>'.
+#
+# With one process the values live in memory. With several (gunicorn and
+# friends) set METRICS_DIR to a directory shared by the workers: each
+# process then keeps its values in memory-mapped files of its own,
+# counter_<pid>.db and gauge_<pid>.db, and /metrics sums the counters of
+# every file, so any worker answers for all of them. Counters of workers
+# that have exited keep counting towards the totals; their pool gauges are
+# dropped. Empty the directory before the server starts.
+#----------------------------------------------------------------------------#
+
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, Response, got_request_exception, has_request_context, request, request_finished
+from sqlalchemy import event
+
+from instrumentation import instrumentation
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# name -> (type, help)
+FAMILIES = {
+    'fyyur_http_request_duration_seconds': ('histogram', 'Time spent handling a request.'),
+    'fyyur_http_exceptions_total': ('counter', 'Requests that raised an unhandled exception.'),
+    'fyyur_db_queries_total': ('counter', 'SQL statements run while handling requests.'),
+    'fyyur_db_errors_total': ('counter', 'SQL statements that failed.'),
+    'fyyur_db_pool_size': ('gauge', 'Configured size of the connection pool.'),
+    'fyyur_db_pool_checked_out': ('gauge', 'Connections currently in use.'),
+    'fyyur_db_pool_checked_in': ('gauge', 'Idle connections held by the pool.'),
+    'fyyur_db_pool_overflow': ('gauge', 'Connections opened beyond pool_size (negative while the pool fills up).'),
+}
+
+# gauge -> QueuePool method
+POOL_GAUGES = {
+    'fyyur_db_pool_size': 'size',
+    'fyyur_db_pool_checked_out': 'checkedout',
+    'fyyur_db_pool_checked_in': 'checkedin',
+    'fyyur_db_pool_overflow': 'overflow',
+}
+
+
+def _key(family, sample, labels):
+    return json.dumps([family, sample, sorted(labels.items())])
+
+
+#----------------------------------------------------------------------------#
+# Storage.
+#----------------------------------------------------------------------------#
+
+class MmapFile:
+    '''
+    Append-only table of key -> float64 in a memory-mapped file, written by
+    one process. Layout: an 8-byte header holding the bytes in use, then
+    entries of [key length: int32][utf-8 key, padded][value: float64], the
+    values 8-byte aligned. The header is bumped only after an entry is
+    complete, so readers in other processes never see half of one.
+    '''
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < self.INITIAL_SIZE:
+            self.file.truncate(self.INITIAL_SIZE)
+            size = self.INITIAL_SIZE
+        self.capacity = size
+        self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        self.used = struct.unpack_from('q', self.map, 0)[0] or 8
+        self.positions = {key: position for key, _, position in self.entries(self.map, self.used)}
+
+    @staticmethod
+    def entries(data, used):
+        position = 8
+        while position < used:
+            length = struct.unpack_from('i', data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+            position += 4 + length + (-(4 + length) % 8)
+            yield key, struct.unpack_from('d', data, position)[0], position
+            position += 8
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < 8:
+            return {}
+        return {key: value for key, value, _ in cls.entries(data, struct.unpack_from('q', data, 0)[0])}
+
+    def _position(self, key):
+        position = self.positions.get(key)
+        if position is not None:
+            return position
+        encoded = key.encode('utf-8')
+        entry = 4 + len(encoded) + (-(4 + len(encoded)) % 8) + 8
+        while self.used + entry > self.capacity:
+            self.capacity *= 2
+            self.map.close()
+            self.file.truncate(self.capacity)
+            self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        struct.pack_into('i', self.map, self.used, len(encoded))
+        self.map[self.used + 4:self.used + 4 + len(encoded)] = encoded
+        position = self.used + entry - 8
+        struct.pack_into('d', self.map, position, 0.0)
+        self.used += entry
+        struct.pack_into('q', self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def get(self, key):
+        position = self.positions.get(key)
+        return struct.unpack_from('d', self.map, position)[0] if position is not None else 0.0
+
+    def set(self, key, value):
+        struct.pack_into('d', self.map, self._position(key), value)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class MemoryStore:
+    '''Values of this process only.'''
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self.lock:
+            self.counters[key] += amount
+
+    def set(self, key, value):
+        with self.lock:
+            self.gauges[key] = value
+
+    def collect(self):
+        with self.lock:
+            return dict(self.counters), [(os.getpid(), dict(self.gauges))]
+
+
+class MultiProcessStore:
+    '''Per-process mmap files in a shared directory, merged when read.'''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.pid = None
+        self.files = {}
+
+    def _file(self, kind):
+        # Opened lazily, and again after a fork: the child must not write
+        # into the files of the process it was forked from.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.files = {}
+        if kind not in self.files:
+            self.files[kind] = MmapFile(os.path.join(self.directory, f'{kind}_{self.pid}.db'))
+        return self.files[kind]
+
+    def inc(self, key, amount):
+        with self.lock:
+            counters = self._file('counter')
+            counters.set(key, counters.get(key) + amount)
+
+    def set(self, key, value):
+        with self.lock:
+            self._file('gauge').set(key, value)
+
+    def collect(self):
+        counters = defaultdict(float)
+        for path in glob.glob(os.path.join(self.directory, 'counter_*.db')):
+            for key, value in MmapFile.read(path).items():
+                counters[key] += value
+        gauges = []
+        for path in glob.glob(os.path.join(self.directory, 'gauge_*.db')):
+            pid = int(os.path.basename(path)[len('gauge_'):-len('.db')])
+            if _alive(pid):
+                gauges.append((pid, MmapFile.read(path)))
+        return counters, gauges
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def mark_process_dead(pid, directory):
+    '''Drops the gauges of an exited worker; call from the server's child-exit hook.'''
+    try:
+        os.remove(os.path.join(directory, f'gauge_{pid}.db'))
+    except FileNotFoundError:
+        pass
+
+
+#----------------------------------------------------------------------------#
+# Exposition.
+#----------------------------------------------------------------------------#
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _sample_line(sample, labels, value):
+    if labels:
+        pairs = ','.join(f'{name}="{_escape(label)}"' for name, label in labels)
+        return f'{sample}{{{pairs}}} {_format_value(value)}'
+    return f'{sample} {_format_value(value)}'
+
+
+def _series_order(item):
+    # Each label set together, buckets in `le` order, then _sum and _count.
+    (sample, labels), _ = item
+    le = dict(labels).get('le')
+    rest = [pair for pair in labels if pair[0] != 'le']
+    suffix = sample.rsplit('_', 1)[-1]
+    return rest, {'bucket': 0, 'sum': 1, 'count': 2}.get(suffix, 0), float(le) if le is not None else 0.0
+
+
+def exposition(counters, gauges):
+    samples = defaultdict(list)
+    for key, value in counters.items():
+        family, sample, labels = json.loads(key)
+        labels = [tuple(pair) for pair in labels]
+        # `le` goes last, where Prometheus' own clients put it.
+        labels = [pair for pair in labels if pair[0] != 'le'] + [pair for pair in labels if pair[0] == 'le']
+        samples[family].append(((sample, labels), value))
+    for pid, values in gauges:
+        for key, value in values.items():
+            family, sample, labels = json.loads(key)
+            labels = sorted([tuple(pair) for pair in labels] + [('pid', str(pid))])
+            samples[family].append(((sample, labels), value))
+
+    lines = []
+    for family, (kind, help) in FAMILIES.items():
+        lines.append(f'# HELP {family} {help}')
+        lines.append(f'# TYPE {family} {kind}')
+        for (sample, labels), value in sorted(samples.get(family, []), key=_series_order):
+            lines.append(_sample_line(sample, labels, value))
+    return '\n'.join(lines) + '\n'
+
+
+#----------------------------------------------------------------------------#
+# Collection.
+#----------------------------------------------------------------------------#
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else '<unmatched>'
+
+
+class Metrics:
+
+    def __init__(self, app=None, db=None):
+        self.store = MemoryStore()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        directory = app.config.get('METRICS_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.store = MultiProcessStore(directory)
+
+        with app.app_context():
+            engines = dict(db.engines)
+        for bind, engine in engines.items():
+            event.listen(engine, 'handle_error', self._db_error)
+            self._watch_pool(engine, bind or 'default')
+
+        request_finished.connect(self._request_finished, app)
+        got_request_exception.connect(self._request_exception, app)
+        app.register_blueprint(blueprint)
+        app.extensions['metrics'] = self
+
+    def inc(self, family, labels, amount=1.0, sample=None):
+        self.store.inc(_key(family, sample or family, labels), amount)
+
+    def observe(self, family, labels, value):
+        for bound in BUCKETS:
+            if value <= bound:
+                self.inc(family, dict(labels, le=_format_value(bound)), sample=f'{family}_bucket')
+        self.inc(family, labels, value, sample=f'{family}_sum')
+        self.inc(family, labels, sample=f'{family}_count')
+
+    def set(self, family, labels, value):
+        self.store.set(_key(family, family, labels), value)
+
+    def _watch_pool(self, engine, name):
+        if not any(hasattr(engine.pool, method) for method in POOL_GAUGES.values()):
+            return
+
+        def update(returning=False):
+            # engine.pool, not the pool at startup: dispose() (gunicorn's
+            # post_fork) swaps in a new pool, and the listeners move to it.
+            pool = engine.pool
+            values = {
+                gauge: getattr(pool, method)() for gauge, method in POOL_GAUGES.items() if hasattr(pool, method)
+            }
+            if returning:
+                # 'checkin' fires just before the connection is back in the pool.
+                values['fyyur_db_pool_checked_out'] -= 1
+                values['fyyur_db_pool_checked_in'] += 1
+            for gauge, value in values.items():
+                self.set(gauge, {"engine": name}, value)
+
+        event.listen(engine.pool, 'checkout', lambda *args: update())
+        event.listen(engine.pool, 'checkin', lambda *args: update(returning=True))
+        event.listen(engine.pool, 'close', lambda *args: update())
+        event.listen(engine, 'engine_disposed', lambda *args: update())
+
+    def _db_error(self, context):
+        self.inc('fyyur_db_errors_total', {"route": _route() if has_request_context() else '<none>'})
+
+    def _request_finished(self, app, response, **extra):
+        stats = instrumentation.current()
+        if stats is None:
+            return
+        route = _route()
+        self.observe('fyyur_http_request_duration_seconds', {
+            "method": request.method,
+            "route": route,
+            "status": str(response.status_code),
+        }, time.perf_counter() - stats.started)
+        if stats.queries:
+            self.inc('fyyur_db_queries_total', {"route": route}, stats.queries)
+
+    def _request_exception(self, app, exception, **extra):
+        self.inc('fyyur_http_exceptions_total', {"method": request.method, "route": _route()})
+
+    def render(self):
+        return exposition(*self.store.collect())
+
+
+metrics = Metrics()
+
+blueprint = Blueprint('metrics', __name__)
+
+
+@blueprint.route('/metrics')
+def export():
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,67 @@
+"""add hot path indexes
+
+Composite (venue_id, start_time) / (artist_id, start_time) indexes on Show for
+the venue and artist detail pages and /shows, a (city, state) index on Venue
+for the area listing, and pg_trgm GIN indexes on Venue.name / Artist.name so
+the ilike('%term%') searches stop scanning the whole table.
+
+pg_trgm is a contrib extension that not every server ships. When it is not
+available the trigram indexes are skipped with a notice. The rest of the
+migration still runs, and search.py then matches word prefixes through
+search_document (d8f3b2a7c1e4) instead of substrings. Rerun this upgrade
+after installing the contrib package to add them (downgrade to a553574d0a27
+first).
+
+Every index is built with CREATE INDEX CONCURRENTLY, which cannot run inside
+a transaction, so the statements are issued from an autocommit block. If a
+concurrent build fails it leaves an INVALID index behind; rerunning the
+upgrade drops and rebuilds it thanks to the DROP ... IF EXISTS below.
+
+Revision ID: 3f1c9b7d2a64
+Revises: a553574d0a27
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9b7d2a64'
+down_revision = 'a553574d0a27'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_show_venue_id_start_time', 'CREATE INDEX CONCURRENTLY ix_show_venue_id_start_time ON "Show" (venue_id, start_time)'),
+    ('ix_show_artist_id_start_time', 'CREATE INDEX CONCURRENTLY ix_show_artist_id_start_time ON "Show" (artist_id, start_time)'),
+    ('ix_venue_city_state', 'CREATE INDEX CONCURRENTLY ix_venue_city_state ON "Venue" (city, state)'),
+]
+TRGM_INDEXES = [
+    ('ix_venue_name_trgm', 'CREATE INDEX CONCURRENTLY ix_venue_name_trgm ON "Venue" USING gin (name gin_trgm_ops)'),
+    ('ix_artist_name_trgm', 'CREATE INDEX CONCURRENTLY ix_artist_name_trgm ON "Artist" USING gin (name gin_trgm_ops)'),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    trgm = bind.execute(sa.text(
+        "SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )).scalar() > 0
+    if trgm:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    else:
+        print('pg_trgm is not available on this server; skipping the trigram indexes '
+              '(searches match word prefixes only)')
+
+    with op.get_context().autocommit_block():
+        for name, create in INDEXES + (TRGM_INDEXES if trgm else []):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            op.execute(create)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES + TRGM_INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
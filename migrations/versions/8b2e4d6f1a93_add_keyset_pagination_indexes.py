@@ -0,0 +1,45 @@
+"""add keyset pagination indexes
+
+Indexes matching the sort keys of the paginated listings, so every page of
+/venues, /artists and /shows is an index range scan no matter how deep:
+
+  /venues   (coalesce(city), coalesce(state), coalesce(name), id)
+  /artists  (coalesce(name), id)
+  /shows    (start_time, id)
+
+Built concurrently, like 3f1c9b7d2a64.
+
+Revision ID: 8b2e4d6f1a93
+Revises: 3f1c9b7d2a64
+Create Date: 2026-10-18 11:02:17.554120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a93'
+down_revision = '3f1c9b7d2a64'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_venue_area_name_id', "CREATE INDEX CONCURRENTLY ix_venue_area_name_id ON \"Venue\" (coalesce(city, ''), coalesce(state, ''), coalesce(name, ''), id)"),
+    ('ix_artist_name_id', "CREATE INDEX CONCURRENTLY ix_artist_name_id ON \"Artist\" (coalesce(name, ''), id)"),
+    ('ix_show_start_time_id', 'CREATE INDEX CONCURRENTLY ix_show_start_time_id ON "Show" (start_time, id)'),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, create in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            op.execute(create)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,43 @@
+"""add latitude, longitude and geohash to Venue
+
+Coordinates are filled by `flask geocode` (see geo.py); existing venues
+start without any and are left out of the nearby search until located.
+ix_venue_geohash uses varchar_pattern_ops so LIKE 'prefix%' is a range scan
+whatever the database collation. It is built CONCURRENTLY from an
+autocommit block, as in 3f1c9b7d2a64.
+
+Revision ID: a4c7e9b2d5f8
+Revises: f3a9c2d8b6e1
+Create Date: 2026-10-18 20:14:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e9b2d5f8'
+down_revision = 'f3a9c2d8b6e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_venue_geohash')
+        op.execute('CREATE INDEX CONCURRENTLY ix_venue_geohash ON "Venue" (geohash varchar_pattern_ops)')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_venue_geohash')
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
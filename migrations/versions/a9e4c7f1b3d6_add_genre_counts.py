@@ -0,0 +1,44 @@
+"""add the GenreCount table behind the listings' genre counts
+
+The /venues and /artists pages showed how many rows list each genre by
+counting over unnest(genres) of the whole table on every render. GenreCount
+keeps those counts per (owner, genre); the ORM writes adjust them (see
+genres.py). It is backfilled here in one pass over each table.
+
+Revision ID: a9e4c7f1b3d6
+Revises: d8f3b2a7c1e4
+Create Date: 2026-10-19 09:41:27.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4c7f1b3d6'
+down_revision = 'd8f3b2a7c1e4'
+branch_labels = None
+depends_on = None
+
+
+OWNERS = ['Venue', 'Artist']
+
+
+def upgrade():
+    op.create_table('GenreCount',
+    sa.Column('owner', sa.String(length=40), nullable=False),
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('owner', 'genre')
+    )
+    for owner in OWNERS:
+        op.execute(f"""
+            INSERT INTO "GenreCount" (owner, genre, count)
+            SELECT '{owner}', genre, count(*)
+            FROM (SELECT DISTINCT id, unnest(genres) AS genre FROM "{owner}") listed
+            GROUP BY genre
+        """)
+
+
+def downgrade():
+    op.drop_table('GenreCount')
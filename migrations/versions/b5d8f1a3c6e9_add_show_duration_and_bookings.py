@@ -0,0 +1,93 @@
+"""add Show.duration and the Booking table refusing double bookings
+
+Existing shows get the default duration of 120 minutes. A CHECK keeps
+durations within 1..MAX_SHOW_MINUTES, which the conflict checks of
+scheduling.py rely on.
+
+Postgres cannot put an exclusion constraint on the partitioned Show table
+(d7a3f9e1c5b2), so every show is booked in "Booking" instead: its id, venue,
+artist and tsrange, with one GiST exclusion constraint per venue and per
+artist. The ids are compared as single-value int4ranges, which the
+built-in range opclass indexes, so btree_gist is not needed. start_time is
+a timestamp without time zone, hence tsrange rather than tstzrange.
+
+A trigger on Show keeps the bookings in step with inserts, deletes and
+changes of time, duration, venue or artist. Existing shows are booked in
+start_time order; a show clashing with an earlier one is left unbooked and
+counted here, and `flask schedule conflicts` lists the pairs.
+
+Revision ID: b5d8f1a3c6e9
+Revises: a4c7e9b2d5f8
+Create Date: 2026-10-18 21:03:12.457720
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d8f1a3c6e9'
+down_revision = 'a4c7e9b2d5f8'
+branch_labels = None
+depends_on = None
+
+
+MAX_SHOW_MINUTES = 24 * 60
+
+
+def upgrade():
+    op.execute(f'ALTER TABLE "Show" ADD COLUMN duration integer NOT NULL DEFAULT 120 '
+               f'CONSTRAINT ck_show_duration CHECK (duration BETWEEN 1 AND {MAX_SHOW_MINUTES})')
+    op.execute('''
+        CREATE TABLE "Booking" (
+            show_id integer PRIMARY KEY,
+            venue_id integer NOT NULL,
+            artist_id integer NOT NULL,
+            during tsrange NOT NULL,
+            CONSTRAINT booking_venue_excl
+                EXCLUDE USING gist (int4range(venue_id, venue_id, '[]') WITH =, during WITH &&),
+            CONSTRAINT booking_artist_excl
+                EXCLUDE USING gist (int4range(artist_id, artist_id, '[]') WITH =, during WITH &&)
+        )
+    ''')
+    op.execute('''
+        CREATE FUNCTION book_show() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM "Booking" WHERE show_id = OLD.id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                INSERT INTO "Booking" (show_id, venue_id, artist_id, during)
+                VALUES (NEW.id, NEW.venue_id, NEW.artist_id,
+                        tsrange(NEW.start_time, NEW.start_time + make_interval(mins => NEW.duration)));
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    ''')
+    # Row triggers on a partitioned table are cloned to every partition,
+    # including the ones `flask partitions create` adds later.
+    op.execute('CREATE TRIGGER show_booked AFTER INSERT OR DELETE ON "Show" '
+               'FOR EACH ROW EXECUTE FUNCTION book_show()')
+    op.execute('CREATE TRIGGER show_rebooked AFTER UPDATE OF start_time, duration, venue_id, artist_id ON "Show" '
+               'FOR EACH ROW EXECUTE FUNCTION book_show()')
+
+    bind = op.get_bind()
+    booked = bind.execute(sa.text('''
+        INSERT INTO "Booking" (show_id, venue_id, artist_id, during)
+        SELECT id, venue_id, artist_id, tsrange(start_time, start_time + make_interval(mins => duration))
+        FROM "Show" ORDER BY start_time, id
+        ON CONFLICT DO NOTHING
+    ''')).rowcount
+    total = bind.execute(sa.text('SELECT count(*) FROM "Show"')).scalar()
+    if total > booked:
+        print(f'{total - booked} of {total} shows clash with an earlier one and were left unbooked; '
+              f'see `flask schedule conflicts`')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER show_rebooked ON "Show"')
+    op.execute('DROP TRIGGER show_booked ON "Show"')
+    op.execute('DROP FUNCTION book_show()')
+    op.execute('DROP TABLE "Booking"')
+    op.execute('ALTER TABLE "Show" DROP COLUMN duration')
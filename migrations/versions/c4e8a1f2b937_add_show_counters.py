@@ -0,0 +1,62 @@
+"""add denormalized show counters
+
+upcoming_shows_count / past_shows_count on Venue and Artist, and the
+CounterState row holding the point that separates upcoming from past
+shows (see counters.py). The counters are backfilled from Show against
+that point.
+
+Revision ID: c4e8a1f2b937
+Revises: 8b2e4d6f1a93
+Create Date: 2026-10-18 14:21:40.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1f2b937'
+down_revision = '8b2e4d6f1a93'
+branch_labels = None
+depends_on = None
+
+
+OWNERS = [('Venue', 'venue_id'), ('Artist', 'artist_id')]
+
+
+def upgrade():
+    op.create_table('CounterState',
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("""INSERT INTO "CounterState" (name, rolled_over_at) VALUES ('shows', LOCALTIMESTAMP)""")
+
+    for table, owner in OWNERS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+        op.execute(f"""
+            UPDATE "{table}" SET
+                upcoming_shows_count = counts.upcoming,
+                past_shows_count = counts.past
+            FROM (
+                SELECT {owner} AS id,
+                       count(*) FILTER (WHERE start_time >= state.rolled_over_at) AS upcoming,
+                       count(*) FILTER (WHERE start_time < state.rolled_over_at) AS past
+                FROM "Show", "CounterState" state
+                WHERE state.name = 'shows'
+                GROUP BY {owner}
+            ) counts
+            WHERE "{table}".id = counts.id
+        """)
+
+
+def downgrade():
+    for table, _ in reversed(OWNERS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
+
+    op.drop_table('CounterState')
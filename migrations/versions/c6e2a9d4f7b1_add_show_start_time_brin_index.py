@@ -0,0 +1,31 @@
+"""add a BRIN index on Show.start_time for the citywide calendar
+
+/calendar?city= (calendars.py) selects every show of a date range and then
+keeps the city's venues, which neither (venue_id, start_time) nor
+(artist_id, start_time) can serve. Shows are mostly inserted in start_time
+order, so a BRIN index of a few pages per partition finds the block ranges
+of a day or a week. Built inside the transaction: Show is partitioned
+(d7a3f9e1c5b2) and cannot be indexed concurrently.
+
+Revision ID: c6e2a9d4f7b1
+Revises: b5d8f1a3c6e9
+Create Date: 2026-10-18 22:41:37.218904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e2a9d4f7b1'
+down_revision = 'b5d8f1a3c6e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_brin', 'Show', ['start_time'], unique=False, postgresql_using='brin')
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_brin', table_name='Show')
@@ -0,0 +1,103 @@
+"""partition Show by month of start_time
+
+Rebuilds "Show" as a table partitioned by RANGE (start_time): one partition
+per calendar month from the first show up to MONTHS_AHEAD months from now,
+plus a DEFAULT partition for anything outside them. `flask partitions`
+(partitions.py) keeps creating months ahead and archives old ones.
+
+A partitioned table's primary key must include the partition key, so the
+key becomes (id, start_time); ids still come from "Show_id_seq" and stay
+unique. The rows are copied into the new table inside the migration's
+transaction, which holds an exclusive lock on Show for the duration: run
+it in a maintenance window on large databases.
+
+Revision ID: d7a3f9e1c5b2
+Revises: c4e8a1f2b937
+Create Date: 2026-10-18 16:05:12.804417
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f9e1c5b2'
+down_revision = 'c4e8a1f2b937'
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 6
+
+INDEXES = [
+    'CREATE INDEX ix_show_venue_id_start_time ON "Show" (venue_id, start_time)',
+    'CREATE INDEX ix_show_artist_id_start_time ON "Show" (artist_id, start_time)',
+    'CREATE INDEX ix_show_start_time_id ON "Show" (start_time, id)',
+]
+OLD_INDEXES = ['ix_show_venue_id_start_time', 'ix_show_artist_id_start_time', 'ix_show_start_time_id']
+
+
+def _month(day, offset=0):
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _set_aside(old_name):
+    # Index and primary key names are schema-wide; free them for the new table.
+    op.execute(f'ALTER TABLE "Show" RENAME TO "{old_name}"')
+    op.execute(f'ALTER TABLE "{old_name}" RENAME CONSTRAINT "Show_pkey" TO "{old_name}_pkey"')
+    for name in OLD_INDEXES:
+        op.execute(f'ALTER INDEX IF EXISTS {name} RENAME TO {name}_old')
+
+
+def _copy_and_drop(old_name):
+    op.execute(f'INSERT INTO "Show" (id, start_time, venue_id, artist_id) '
+               f'SELECT id, start_time, venue_id, artist_id FROM "{old_name}"')
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    op.execute(f'DROP TABLE "{old_name}"')
+
+
+def upgrade():
+    _set_aside('Show_unpartitioned')
+    op.execute('''
+        CREATE TABLE "Show" (
+            id integer NOT NULL DEFAULT nextval('"Show_id_seq"'::regclass),
+            start_time timestamp without time zone NOT NULL,
+            venue_id integer NOT NULL REFERENCES "Venue" (id),
+            artist_id integer NOT NULL REFERENCES "Artist" (id),
+            PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    ''')
+    op.execute('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT')
+
+    first = op.get_bind().execute(sa.text('SELECT min(start_time) FROM "Show_unpartitioned"')).scalar()
+    month = _month(min(first.date(), date.today()) if first else date.today())
+    last = _month(date.today(), MONTHS_AHEAD)
+    while month <= last:
+        upper = _month(month, 1)
+        op.execute(f'CREATE TABLE "Show_p{month.year:04d}_{month.month:02d}" PARTITION OF "Show" '
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')")
+        month = upper
+
+    for create in INDEXES:
+        op.execute(create)
+    _copy_and_drop('Show_unpartitioned')
+
+
+def downgrade():
+    # Archived partitions (schema "archive") are not brought back.
+    _set_aside('Show_partitioned')
+    op.execute('''
+        CREATE TABLE "Show" (
+            id integer NOT NULL DEFAULT nextval('"Show_id_seq"'::regclass),
+            start_time timestamp without time zone NOT NULL,
+            venue_id integer NOT NULL REFERENCES "Venue" (id),
+            artist_id integer NOT NULL REFERENCES "Artist" (id),
+            CONSTRAINT "Show_pkey" PRIMARY KEY (id)
+        )
+    ''')
+    for create in INDEXES:
+        op.execute(create)
+    _copy_and_drop('Show_partitioned')
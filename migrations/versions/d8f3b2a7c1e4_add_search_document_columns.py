@@ -0,0 +1,74 @@
+"""add indexed full-text search documents to Venue and Artist
+
+The searches of search.py matched to_tsvector(concat_ws(...)) computed on
+the fly, so every search scanned the table and built a tsvector per row.
+Venue and Artist now store that document in a generated tsvector column,
+search_document, with a GIN index. make_search_document() wraps the
+expression as IMMUTABLE, which a generated column requires:
+array_to_string() is only STABLE in general, but not for varchar[].
+
+Where pg_trgm is installed (see 3f1c9b7d2a64), city and state get trigram
+GIN indexes too. The ILIKE branches of the search then each have an index
+and the whole WHERE is a BitmapOr. Without pg_trgm the ILIKEs are
+unindexed and the search scans the table for substring matches.
+
+Adding a stored column rewrites the two tables under an exclusive lock.
+The indexes are built CONCURRENTLY from an autocommit block.
+
+Revision ID: d8f3b2a7c1e4
+Revises: c6e2a9d4f7b1
+Create Date: 2026-10-18 23:12:05.640183
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b2a7c1e4'
+down_revision = 'c6e2a9d4f7b1'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['Venue', 'Artist']
+TRGM_COLUMNS = ['city', 'state']
+
+
+def _has_trgm():
+    return op.get_bind().execute(sa.text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() > 0
+
+
+def upgrade():
+    op.execute('''
+        CREATE OR REPLACE FUNCTION make_search_document(name text, city text, state text, genres varchar[])
+        RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT to_tsvector('simple', concat_ws(' ', name, city, state, array_to_string(genres, ' '))) $$
+    ''')
+    for table in TABLES:
+        op.execute(f'ALTER TABLE "{table}" ADD COLUMN search_document tsvector GENERATED ALWAYS AS '
+                   f'(make_search_document(name, city, state, genres)) STORED')
+    trgm = _has_trgm()
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            index = f'ix_{table.lower()}_search_document'
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index}')
+            op.execute(f'CREATE INDEX CONCURRENTLY {index} ON "{table}" USING gin (search_document)')
+            if not trgm:
+                continue
+            for column in TRGM_COLUMNS:
+                index = f'ix_{table.lower()}_{column}_trgm'
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index}')
+                op.execute(f'CREATE INDEX CONCURRENTLY {index} ON "{table}" USING gin ({column} gin_trgm_ops)')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in reversed(TABLES):
+            for column in reversed(TRGM_COLUMNS):
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_{table.lower()}_{column}_trgm')
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_{table.lower()}_search_document')
+    for table in reversed(TABLES):
+        op.execute(f'ALTER TABLE "{table}" DROP COLUMN search_document')
+    op.execute('DROP FUNCTION make_search_document(text, text, text, varchar[])')
@@ -0,0 +1,52 @@
+"""add updated_at and version to Venue, Artist and Show
+
+The validators behind the ETag/Last-Modified headers (see conditional.py).
+Existing rows start at version 1, updated now. The updated_at indexes serve
+the max(updated_at) probes of the listing pages. The Venue and Artist ones
+are built concurrently, outside the transaction, so writes to those tables
+are not blocked while they build. Show's is built inside the transaction:
+Show is partitioned (d7a3f9e1c5b2) and Postgres cannot build an index
+concurrently on a partitioned table.
+
+Revision ID: e2b6c8d4f0a7
+Revises: d7a3f9e1c5b2
+Create Date: 2026-10-18 17:36:05.104528
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6c8d4f0a7'
+down_revision = 'd7a3f9e1c5b2'
+branch_labels = None
+depends_on = None
+
+
+TABLES = [('Venue', 'ix_venue_updated_at'), ('Artist', 'ix_artist_updated_at')]
+PARTITIONED = [('Show', 'ix_show_updated_at')]
+
+
+def upgrade():
+    for table, index in TABLES + PARTITIONED:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('LOCALTIMESTAMP'), nullable=False))
+            batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    for table, index in PARTITIONED:
+        op.create_index(index, table, ['updated_at'], unique=False)
+    with op.get_context().autocommit_block():
+        for table, index in TABLES:
+            op.create_index(index, table, ['updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table, index in reversed(TABLES):
+            op.drop_index(index, table_name=table, postgresql_concurrently=True)
+    for table, index in reversed(PARTITIONED):
+        op.drop_index(index, table_name=table)
+    for table, index in reversed(TABLES + PARTITIONED):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version')
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,131 @@
+"""clean Venue/Artist genres and add GIN indexes on them
+
+The edit handlers assigned ','.join(genres) to the genres array, which
+stored every character as an element ({J,a,z,z,",",P,o,p}). Every row is
+rewritten with clean_genres() below (a frozen copy of the one in
+genres.py, with the genre list of forms.genres_choices at the time, so
+later edits there do not change this migration): exploded strings are
+joined back,
+comma-separated values split, names matched to forms.genres_choices
+(any case) and repeats dropped. Values that are not a genre are dropped
+and reported; a row left without any genre gets 'Other', the column being
+NOT NULL and the forms requiring at least one. Rewritten rows get a new
+version and updated_at, so their cached pages and ETags change.
+
+The migrations before this one still create Artist.genres as a plain
+varchar column (ca930ccd48d7); where it is one, it is first turned into a
+one-element array, which the cleanup then splits.
+
+The GIN indexes serve the ?genre= filter of /venues and /artists and the
+per-genre counts. They are built CONCURRENTLY from an autocommit block,
+as in 3f1c9b7d2a64. The cleanup is not undone on downgrade.
+
+Revision ID: f3a9c2d8b6e1
+Revises: e2b6c8d4f0a7
+Create Date: 2026-10-18 19:02:44.610385
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c2d8b6e1'
+down_revision = 'e2b6c8d4f0a7'
+branch_labels = None
+depends_on = None
+
+
+TABLES = [('Venue', 'ix_venue_genres'), ('Artist', 'ix_artist_genres')]
+BATCH_SIZE = 1000
+FALLBACK = ['Other']
+
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+    'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+    'Rock n Roll', 'Soul', 'Other',
+]
+_CANONICAL = {genre.lower(): genre for genre in GENRES}
+
+
+def find_genre(name):
+    return _CANONICAL.get(' '.join((name or '').split()).lower())
+
+
+def clean_genres(values):
+    # (known genres, canonical and without repeats; values that are not genres)
+    if isinstance(values, str):
+        values = [values]
+    values = [value for value in (values or []) if value]
+    if values and all(len(value) == 1 for value in values) and len(values) > 1:
+        values = [''.join(values)]
+
+    genres, rejected = [], []
+    for value in values:
+        for name in value.strip('{}').split(','):
+            if not name.strip():
+                continue
+            genre = find_genre(name.strip().strip('"'))
+            if genre is None:
+                rejected.append(name.strip())
+            elif genre not in genres:
+                genres.append(genre)
+    return genres, rejected
+
+
+def _make_array(table_name):
+    data_type = op.get_bind().execute(sa.text(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = :table AND column_name = 'genres'"
+    ), {"table": table_name}).scalar()
+    if data_type != 'ARRAY':
+        op.execute(f'ALTER TABLE "{table_name}" ALTER COLUMN genres TYPE varchar[] '
+                   f'USING array_remove(ARRAY[genres], NULL)::varchar[]')
+
+
+def _clean(table_name):
+    bind = op.get_bind()
+    table = sa.table(
+        table_name,
+        sa.column('id', sa.Integer),
+        sa.column('genres', postgresql.ARRAY(sa.String)),
+        sa.column('version', sa.Integer),
+        sa.column('updated_at', sa.DateTime),
+    )
+    update = (
+        table.update()
+        .where(table.c.id == sa.bindparam('row_id'))
+        .values(genres=sa.bindparam('clean'), version=table.c.version + 1, updated_at=sa.text('LOCALTIMESTAMP'))
+    )
+
+    changed, rejected = [], {}
+    for row_id, genres in bind.execute(sa.select(table.c.id, table.c.genres).order_by(table.c.id)):
+        clean, dropped = clean_genres(genres)
+        for value in dropped:
+            rejected[value] = rejected.get(value, 0) + 1
+        clean = clean or FALLBACK
+        if clean != genres:
+            changed.append({"row_id": row_id, "clean": clean})
+    for start in range(0, len(changed), BATCH_SIZE):
+        bind.execute(update, changed[start:start + BATCH_SIZE])
+
+    print(f'{table_name}: rewrote the genres of {len(changed)} rows')
+    for value, count in sorted(rejected.items(), key=lambda item: -item[1]):
+        print(f'{table_name}: dropped unknown genre {value!r} from {count} rows')
+
+
+def upgrade():
+    for table, _ in TABLES:
+        _make_array(table)
+        _clean(table)
+
+    with op.get_context().autocommit_block():
+        for table, index in TABLES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index}')
+            op.execute(f'CREATE INDEX CONCURRENTLY {index} ON "{table}" USING gin (genres)')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for _, index in reversed(TABLES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index}')
@@ -1,6 +1,14 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql
+from database import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-db = SQLAlchemy()
+# Postgres stores genres as a native array (the dialect type, for @> and
+# friends); other databases (SQLite in development) fall back to a JSON list.
+Genres = postgresql.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite', 'mysql')
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -8,6 +16,16 @@ db = SQLAlchemy()
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    # The pg_trgm GIN index on name lives in migration 3f1c9b7d2a64 only,
+    # because it needs the pg_trgm extension to exist first.
+    __table_args__ = (
+        db.Index('ix_venue_city_state', 'city', 'state'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+        # genres @> ARRAY[...] for the ?genre= filter (genres.py).
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        # LIKE 'prefix%' range scans for the nearby search (geo.py).
+        db.Index('ix_venue_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -19,24 +37,55 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.ARRAY(db.String()), nullable=False)
+    genres = db.Column(Genres, nullable=False)
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
     website = db.Column(db.String(120))
     shows = db.relationship('Show', backref='venue', lazy=True)
 
+    # Filled by `flask geocode`; geohash is geo.encode(latitude, longitude).
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+
+    # Maintained by counters.py; see CounterState for what "upcoming" means.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Validators for conditional GET (see conditional.py). updated_at moves
+    # on every write to the row, counter updates included; version counts
+    # ORM updates and guards them against concurrent edits.
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+    @classmethod
+    def area_sort_key(cls):
+      # Keyset for the /venues listing; matches index ix_venue_area_name_id.
+      return [
+        db.func.coalesce(cls.city, ''),
+        db.func.coalesce(cls.state, ''),
+        db.func.coalesce(cls.name, ''),
+        cls.id,
+      ]
+
     def __repr__(self):
       return f'<Venue {self.id} {self.name} {self.city} {self.state} {self.address} {self.phone} {self.image_link} {self.facebook_link} {self.genres} {self.seeking_talent} {self.seeking_description} {self.website} {self.shows}>'
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_artist_updated_at', 'updated_at'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(Genres, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
@@ -46,20 +95,117 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     shows = db.relationship('Show', backref='artist', lazy=True)
 
+    # Maintained by counters.py; see CounterState for what "upcoming" means.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Conditional GET validators, as on Venue.
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+    @classmethod
+    def name_sort_key(cls):
+      # Keyset for the /artists listing; matches index ix_artist_name_id.
+      return [db.func.coalesce(cls.name, ''), cls.id]
+
     def __repr__(self):
       return f'<Artist {self.id} {self.name} {self.city} {self.state} {self.phone} {self.genres} {self.image_link} {self.facebook_link} {self.seeking_talent} {self.seeking_description} {self.website} {self.shows}>'
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+# Show lengths, in minutes. The double-booking checks (scheduling.py) rely
+# on the upper bound to keep their index range scans short.
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 24 * 60
+
 class Show(db.Model):
     __tablename__ = 'Show'
+    # On Postgres the table is partitioned by month of start_time, with
+    # (id, start_time) as its primary key (migration d7a3f9e1c5b2 and
+    # partitions.py); the mapping keeps id alone as the identity. Every show
+    # is also booked in the "Booking" table, whose exclusion constraints
+    # refuse double bookings (scheduling.py).
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_show_updated_at', 'updated_at'),
+        # Citywide calendars (calendars.py): shows are added roughly in
+        # start_time order, so a few block ranges cover a day.
+        db.Index('ix_show_start_time_brin', 'start_time', postgresql_using='brin'),
+        db.CheckConstraint(f'duration BETWEEN 1 AND {MAX_SHOW_MINUTES}', name='ck_show_duration'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
+    duration = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_MINUTES,
+                         server_default=str(DEFAULT_SHOW_MINUTES))
 
     # Foreign keys
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
 
+    # Conditional GET validators, as on Venue.
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
     def __repr__(self):
-      return f'<Show {self.id} {self.venue_id} {self.artist_id} {self.start_time}>'
\ No newline at end of file
+      return f'<Show {self.id} {self.venue_id} {self.artist_id} {self.start_time}>'
+
+class CounterState(db.Model):
+    # One row per set of denormalized counters. The show counters treat a
+    # show as upcoming when it starts at or after rolled_over_at; the
+    # rollover job moves that point forward (see counters.py). The rows
+    # 'deleted:Venue' and 'deleted:Artist' hold the time of the last delete
+    # instead, a validator of the listings (see conditional.py).
+    __tablename__ = 'CounterState'
+
+    name = db.Column(db.String(40), primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+      return f'<CounterState {self.name} {self.rolled_over_at}>'
+
+class GenreCount(db.Model):
+    # How many venues ('Venue') or artists ('Artist') list each genre, kept
+    # up to date by the writes themselves (see genres.py) so the listings
+    # read their genre counts instead of counting over every row.
+    __tablename__ = 'GenreCount'
+
+    owner = db.Column(db.String(40), primary_key=True)
+    genre = db.Column(db.String(120), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+      return f'<GenreCount {self.owner} {self.genre} {self.count}>'
+
+# Keyset pagination indexes (migration 8b2e4d6f1a93). Names are nullable, so
+# the sort keys coalesce them and the indexes are built on the same expressions.
+db.Index('ix_venue_area_name_id', *Venue.area_sort_key())
+db.Index('ix_artist_name_id', *Artist.name_sort_key())
+
+# Full-text search document (search.py, migration d8f3b2a7c1e4), Postgres
+# only: a stored generated tsvector column with a GIN index on Venue and
+# Artist. It is left unmapped so SQLite keeps creating the plain tables;
+# these listeners give create_all() databases on Postgres the same objects.
+# array_to_string() is only STABLE in general, hence the IMMUTABLE wrapper.
+SEARCH_DOCUMENT_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION make_search_document(name text, city text, state text, genres varchar[])
+    RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$ SELECT to_tsvector('simple', concat_ws(' ', name, city, state, array_to_string(genres, ' '))) $$
+'''
+
+db.event.listen(db.metadata, 'before_create', db.DDL(SEARCH_DOCUMENT_FUNCTION).execute_if(dialect='postgresql'))
+for _model in (Venue, Artist):
+    db.event.listen(_model.__table__, 'after_create', db.DDL(
+        'ALTER TABLE %(fullname)s ADD COLUMN search_document tsvector GENERATED ALWAYS AS '
+        '(make_search_document(name, city, state, genres)) STORED'
+    ).execute_if(dialect='postgresql'))
+    db.event.listen(_model.__table__, 'after_create', db.DDL(
+        f'CREATE INDEX ix_{_model.__tablename__.lower()}_search_document ON %(fullname)s USING gin (search_document)'
+    ).execute_if(dialect='postgresql'))
+del _model
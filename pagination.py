@@ -0,0 +1,159 @@
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#
+# Pages are addressed by the sort key of their first/last row instead of an
+# OFFSET, so page 1000 is served by the same index range scan as page 1:
+#
+#   WHERE (name, id) > (:last_name, :last_id) ORDER BY name, id LIMIT :n
+#
+# The sort key must be unique (end it with the primary key) and should match
+# an index, see migration 8b2e4d6f1a93.
+#----------------------------------------------------------------------------#
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import literal, tuple_
+
+from models import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def clamp_limit(limit, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+#----------------------------------------------------------------------------#
+# Cursors.
+#----------------------------------------------------------------------------#
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    raise TypeError(f'cannot encode {value!r} in a cursor')
+
+
+def _decode_value(obj):
+    if '$dt' in obj:
+        return datetime.fromisoformat(obj['$dt'])
+    return obj
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=_encode_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _fits(key, value):
+    # Whether `value` can stand for `key` in a seek(); a null compares to nothing.
+    if value is None:
+        return True
+    try:
+        expected = key.type.python_type
+    except NotImplementedError:
+        return True
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor, keys):
+    # Returns the values of `keys`, or None for a missing or tampered cursor
+    # (wrong length, or a value of the wrong type for its key) so the caller
+    # just starts again from the first page.
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw, object_hook=_decode_value)
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != len(keys):
+        return None
+    if not all(_fits(key, value) for key, value in zip(keys, values)):
+        return None
+    return values
+
+
+#----------------------------------------------------------------------------#
+# Paging.
+#----------------------------------------------------------------------------#
+
+class Page:
+
+    def __init__(self, items, next_cursor, prev_cursor, limit):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.limit = limit
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def seek(query, keys, values, backwards=False):
+    '''Restricts `query` to rows whose `keys` sort after (or before) `values`.'''
+    row_key = tuple_(*keys)
+    bound = tuple_(*(literal(value, key.type) for key, value in zip(keys, values)))
+    return query.where(row_key < bound if backwards else row_key > bound)
+
+
+def paginate(query, keys, limit=None, after=None, before=None):
+    '''
+    Runs `query` (a select()) ordered by `keys` and returns one Page of rows.
+
+    `after` / `before` are cursors taken from a previous Page's next_cursor /
+    prev_cursor. Only one of them is honoured; `before` wins.
+    '''
+    limit = clamp_limit(limit)
+    labels = [f'_key{i}' for i in range(len(keys))]
+    query = query.add_columns(*(key.label(label) for key, label in zip(keys, labels)))
+
+    backwards = False
+    cursor = decode_cursor(before, keys)
+    if cursor is not None:
+        backwards = True
+    else:
+        cursor = decode_cursor(after, keys)
+
+    if cursor is not None:
+        query = seek(query, keys, cursor, backwards)
+
+    order = [key.desc() for key in keys] if backwards else list(keys)
+    rows = db.session.execute(query.order_by(*order).limit(limit + 1)).all()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    def key_of(row):
+        return encode_cursor(row._mapping[label] for label in labels)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if more or backwards:
+            next_cursor = key_of(rows[-1])
+        if (more and backwards) or (cursor is not None and not backwards):
+            prev_cursor = key_of(rows[0])
+    return Page(rows, next_cursor, prev_cursor, limit)
+
+
+def page_args(args):
+    '''Pulls limit/after/before out of request.args for paginate().'''
+    return {
+        "limit": args.get('limit'),
+        "after": args.get('after'),
+        "before": args.get('before'),
+    }
@@ -0,0 +1,192 @@
+#----------------------------------------------------------------------------#
+# Monthly partitions of Show (Postgres).
+#
+# Migration d7a3f9e1c5b2 turns Show into a table partitioned by range of
+# start_time, one partition per calendar month ("Show_p2026_10" holds
+# October 2026) plus "Show_default" for anything no month partition covers.
+# Queries filtering on start_time (the upcoming shows) only scan the months
+# they can match.
+#
+#   flask partitions list
+#   flask partitions create --months-ahead 6
+#   flask partitions archive --older-than 24 [--batch-size 3] [--drop]
+#
+# `create` should run from cron well ahead of the last month: it adds the
+# partitions up to --months-ahead months from now, moving any rows that
+# already landed in the default partition. `archive` detaches the month
+# partitions that ended more than --older-than months ago, oldest first,
+# --batch-size per transaction, and moves them to the `archive` schema
+# (or drops them with --drop). Archived shows are taken off the venue and
+# artist show counters, and their bookings (scheduling.py) are dropped, in
+# the same transaction.
+#----------------------------------------------------------------------------#
+
+import re
+from datetime import date
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import column, table, text
+
+from cache import page_cache
+from counters import count_shows_from
+from scheduling import book_shows_from, has_bookings, unbook_shows_from
+from models import db, Show
+
+PARENT = Show.__tablename__
+DEFAULT_PARTITION = f'{PARENT}_default'
+ARCHIVE_SCHEMA = 'archive'
+_NAME_RE = re.compile(rf'^{PARENT}_p(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(day, offset=0):
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT}_p{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        'SELECT count(*) FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)'
+    ), {"name": f'"{PARENT}"'}).scalar() > 0
+
+
+def partitions(connection):
+    '''Returns [(month, name)] of the attached month partitions, oldest first.'''
+    names = connection.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(:name)'
+    ), {"name": f'"{PARENT}"'}).scalars()
+    months = []
+    for name in names:
+        match = _NAME_RE.match(name)
+        if match:
+            months.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(months)
+
+
+def create_partition(connection, month):
+    '''
+    Creates the partition for `month`. Rows for that month that went to the
+    default partition in the meantime are moved into it first, since
+    Postgres refuses to attach a range the default partition still holds.
+    '''
+    name = partition_name(month)
+    lower, upper = month.isoformat(), month_start(month, 1).isoformat()
+    bounds = {"lower": lower, "upper": upper}
+    stray = connection.execute(text(
+        f'SELECT count(*) FROM "{DEFAULT_PARTITION}" WHERE start_time >= :lower AND start_time < :upper'
+    ), bounds).scalar()
+    if not stray:
+        connection.execute(text(
+            f'CREATE TABLE "{name}" PARTITION OF "{PARENT}" FOR VALUES FROM (\'{lower}\') TO (\'{upper}\')'
+        ))
+        return 0
+
+    connection.execute(text(f'CREATE TABLE "{name}" (LIKE "{PARENT}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    connection.execute(text(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE start_time >= :lower AND start_time < :upper RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ), bounds)
+    connection.execute(text(
+        f'ALTER TABLE "{PARENT}" ATTACH PARTITION "{name}" FOR VALUES FROM (\'{lower}\') TO (\'{upper}\')'
+    ))
+    if has_bookings(connection):
+        # Leaving the default partition unbooked them; the new table had no trigger yet.
+        book_shows_from(connection, name)
+    return stray
+
+
+def ensure_partitions(connection, months_ahead, today=None):
+    '''Creates the missing partitions from this month to `months_ahead` months on. Returns the new names.'''
+    today = today or date.today()
+    existing = {month for month, _ in partitions(connection)}
+    created = []
+    for offset in range(months_ahead + 1):
+        month = month_start(today, offset)
+        if month not in existing:
+            create_partition(connection, month)
+            created.append(partition_name(month))
+    return created
+
+
+def archive_partition(connection, name, drop=False):
+    '''Detaches one month partition, uncounts its shows, and archives or drops it.'''
+    shows = table(name, column('venue_id'), column('artist_id'), column('start_time'))
+    count_shows_from(connection, shows, sign=-1)
+    if has_bookings(connection):
+        unbook_shows_from(connection, name)
+    connection.execute(text(f'ALTER TABLE "{PARENT}" DETACH PARTITION "{name}"'))
+    if drop:
+        connection.execute(text(f'DROP TABLE "{name}"'))
+    else:
+        connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}'))
+        connection.execute(text(f'ALTER TABLE "{name}" SET SCHEMA {ARCHIVE_SCHEMA}'))
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+def _connection():
+    connection = db.session.connection()
+    if not is_partitioned(connection):
+        raise click.ClickException(f'"{PARENT}" is not partitioned here; run `flask db upgrade` on Postgres first.')
+    return connection
+
+
+@click.group('partitions')
+def partitions_command():
+    '''Manage the monthly partitions of the Show table.'''
+
+
+@partitions_command.command('list')
+@with_appcontext
+def list_command():
+    '''List month partitions with their estimated row counts.'''
+    connection = _connection()
+    for _, name in partitions(connection) + [(None, DEFAULT_PARTITION)]:
+        rows = connection.execute(text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)'),
+                                  {"name": f'"{name}"'}).scalar()
+        click.echo(f'{name:<20} ~{max(rows or 0, 0)} rows')
+    db.session.rollback()
+
+
+@partitions_command.command('create')
+@click.option('--months-ahead', default=6, show_default=True, help='Create partitions up to this many months from now.')
+@with_appcontext
+def create_command(months_ahead):
+    '''Create the month partitions that do not exist yet.'''
+    created = ensure_partitions(_connection(), months_ahead)
+    db.session.commit()
+    click.echo(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else '.'}")
+
+
+@partitions_command.command('archive')
+@click.option('--older-than', default=24, show_default=True, help='Archive months that ended this many months ago.')
+@click.option('--batch-size', default=3, show_default=True, help='Partitions per transaction.')
+@click.option('--drop', is_flag=True, help='Drop the partitions instead of moving them to the archive schema.')
+@with_appcontext
+def archive_command(older_than, batch_size, drop):
+    '''Detach old month partitions and archive or drop them.'''
+    cutoff = month_start(date.today(), -older_than)
+    old = [name for month, name in partitions(_connection()) if month_start(month, 1) <= cutoff]
+    db.session.rollback()
+
+    for start in range(0, len(old), batch_size):
+        batch = old[start:start + batch_size]
+        connection = db.session.connection()
+        for name in batch:
+            archive_partition(connection, name, drop)
+        db.session.commit()
+        click.echo(f"{'Dropped' if drop else 'Archived'} {', '.join(batch)}")
+
+    if old:
+        # Archived shows disappear from detail pages as well as the counters.
+        page_cache.clear()
+    click.echo(f'{len(old)} partitions before {cutoff} processed.')
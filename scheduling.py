@@ -0,0 +1,321 @@
+#----------------------------------------------------------------------------#
+# Double-booking checks.
+#
+# A show occupies its venue and its artist from start_time for `duration`
+# minutes, the half-open range [start, start + duration). Two shows clash
+# when they share a venue or an artist and their ranges overlap.
+#
+# Show.duration is at most MAX_SHOW_MINUTES (a CHECK constraint), so a show
+# overlapping [start, end) must start in (start - MAX_SHOW_MINUTES, end):
+# conflicts() reads that slice of ix_show_venue_id_start_time and
+# ix_show_artist_id_start_time, a logarithmic probe and a handful of rows
+# whatever the size of the table.
+#
+# On Postgres the rule is also enforced by the database. Show is
+# partitioned by month and Postgres has no exclusion constraint across
+# partitions, so migration b5d8f1a3c6e9 adds a "Booking" table holding the
+# tsrange of every show, kept in step by a trigger on Show, with two GiST
+# exclusion constraints: no two bookings of a venue (or of an artist) may
+# overlap. An insert that clashes, from the forms, `flask import` or raw
+# SQL, fails with an exclusion violation (SQLSTATE 23P01).
+#
+#   flask schedule conflicts [--kind venue] [--csv conflicts.csv]
+#
+# reports every clashing pair already stored, for instance those booked
+# before the constraint existed (the migration leaves them unbooked).
+#----------------------------------------------------------------------------#
+
+import csv
+from collections import namedtuple
+from datetime import timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, column, func, or_, select, table, text, tuple_
+from sqlalchemy.orm import aliased
+
+from models import db, Show, MAX_SHOW_MINUTES
+from streaming import STREAM_BATCH_SIZE, stream_rows
+
+BOOKINGS = 'Booking'
+EXCLUSION_VIOLATION = '23P01'
+MAX_DURATION = timedelta(minutes=MAX_SHOW_MINUTES)
+
+# A stored show another one clashes with; kind is 'venue' or 'artist'.
+Clash = namedtuple('Clash', 'kind id venue_id artist_id start_time end_time')
+
+
+def end_of(start_time, duration):
+    return start_time + timedelta(minutes=duration)
+
+
+def describe(clash):
+    return (f'the {clash.kind} is already booked from {clash.start_time:%Y-%m-%d %H:%M} '
+            f'to {clash.end_time:%Y-%m-%d %H:%M} (show {clash.id})')
+
+
+def is_clash(error):
+    '''Whether a DBAPI error (or SQLAlchemy's wrapper of one) is a Booking exclusion violation.'''
+    return getattr(getattr(error, 'orig', error), 'pgcode', None) == EXCLUSION_VIOLATION
+
+
+#----------------------------------------------------------------------------#
+# One show.
+#----------------------------------------------------------------------------#
+
+def conflicts(venue_id, artist_id, start_time, duration, exclude_id=None):
+    '''Returns the stored shows a show at the venue and artist would clash with, as Clash tuples.'''
+    end_time = end_of(start_time, duration)
+    window = (Show.start_time > start_time - MAX_DURATION, Show.start_time < end_time)
+    query = (
+        select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration)
+        .where(or_(Show.venue_id == venue_id, Show.artist_id == artist_id), *window)
+        .order_by(Show.start_time, Show.id)
+    )
+    if exclude_id is not None:
+        query = query.where(Show.id != exclude_id)
+
+    clashes = []
+    for row in db.session.execute(query):
+        row_end = end_of(row.start_time, row.duration)
+        if row_end <= start_time:
+            continue
+        kind = 'venue' if str(row.venue_id) == str(venue_id) else 'artist'
+        clashes.append(Clash(kind, row.id, row.venue_id, row.artist_id, row.start_time, row_end))
+    return clashes
+
+
+#----------------------------------------------------------------------------#
+# Batches.
+#----------------------------------------------------------------------------#
+
+class IntervalTree:
+    '''
+    Static interval tree over half-open [start, end) intervals.
+
+    The intervals are kept sorted by start and read as an implicit balanced
+    binary tree, the middle of every slice being the root of that slice;
+    each node also records the latest end in its subtree. overlapping()
+    skips every subtree that ends before the query starts, and everything
+    right of a node that starts after the query ends: O(log n + hits).
+    '''
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.max_end = [None] * len(self.intervals)
+        self._build(0, len(self.intervals))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        end = self.intervals[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > end:
+                end = child
+        self.max_end[mid] = end
+        return end
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def overlapping(self, start, end):
+        '''Returns the (start, end, value) intervals overlapping [start, end), by start.'''
+        hits, stack = [], [(0, len(self.intervals))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] <= start:
+                continue
+            interval = self.intervals[mid]
+            if interval[0] < end:
+                if interval[1] > start:
+                    hits.append(interval)
+                stack.append((mid + 1, hi))
+            stack.append((lo, mid))
+        hits.sort(key=lambda interval: (interval[0], interval[1]))
+        return hits
+
+
+def validate_batch(rows):
+    '''
+    Checks a batch of new shows, [(row number, {"venue_id", "artist_id",
+    "start_time", "duration"})], against the stored shows and each other.
+    Returns (accepted, errors): the rows that clash with nothing stored and
+    no earlier row of the batch, and (row number, message) for the rest.
+
+    The stored shows that can matter (same venues or artists, within the
+    batch's time span) are read in one query; clashes are then looked up
+    in an IntervalTree per venue and per artist.
+    '''
+    if not rows:
+        return [], []
+    spans = [(number, row, end_of(row['start_time'], row['duration'])) for number, row in rows]
+    venues = {row['venue_id'] for _, row, _ in spans}
+    artists = {row['artist_id'] for _, row, _ in spans}
+    stored = db.session.execute(
+        select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration)
+        .where(or_(Show.venue_id.in_(venues), Show.artist_id.in_(artists)))
+        .where(Show.start_time > min(row['start_time'] for _, row, _ in spans) - MAX_DURATION)
+        .where(Show.start_time < max(end for _, _, end in spans))
+    ).all()
+
+    # Only the venues and artists of the batch are ever looked up.
+    intervals = {('venue', id): [] for id in venues}
+    intervals.update({('artist', id): [] for id in artists})
+    bookings = [(venue_id, artist_id, start, start + timedelta(minutes=minutes), ('show', id))
+                for id, venue_id, artist_id, start, minutes in stored]
+    bookings += [(row['venue_id'], row['artist_id'], row['start_time'], end, ('row', number)) for number, row, end in spans]
+    for venue_id, artist_id, start, end, source in bookings:
+        for key in (('venue', venue_id), ('artist', artist_id)):
+            if key in intervals:
+                intervals[key].append((start, end, source))
+    trees = {key: IntervalTree(bookings) for key, bookings in intervals.items()}
+
+    accepted, errors = [], []
+    for number, row, end in spans:
+        clash = None
+        for kind in ('venue', 'artist'):
+            for _, _, (source, other) in trees[(kind, row[f'{kind}_id'])].overlapping(row['start_time'], end):
+                if source == 'show' or other < number:
+                    clash = f'{kind} {row[f"{kind}_id"]} is already booked then ({source} {other})'
+                    break
+            if clash:
+                break
+        if clash:
+            errors.append((number, clash))
+        else:
+            accepted.append((number, row))
+    return accepted, errors
+
+
+#----------------------------------------------------------------------------#
+# Conflicts report.
+#----------------------------------------------------------------------------#
+
+# Two stored shows sharing the venue or artist `key_id` that overlap.
+Conflict = namedtuple('Conflict', 'kind key_id first_id first_start first_end second_id second_start second_end')
+
+
+def find_conflicts(kind):
+    '''
+    Yields every Conflict between stored shows of the same venue (kind
+    'venue') or artist ('artist'), by key and start time, from a
+    server-side cursor.
+
+    On Postgres each show is joined to the shows of its key starting within
+    it: one probe of ix_show_<kind>_id_start_time per show, so the report
+    grows as n log n rather than with the square of a busy venue's
+    schedule. Elsewhere the shows are swept in (key, start_time) order,
+    holding only those still running at the current start time.
+    '''
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return _find_conflicts_postgres(kind)
+    return _find_conflicts_sweep(kind)
+
+
+def _find_conflicts_postgres(kind):
+    first, second = aliased(Show), aliased(Show)
+    key = getattr(first, f'{kind}_id')
+    query = (
+        select(key, first.id, first.start_time, first.duration, second.id, second.start_time, second.duration)
+        .join(second, and_(
+            getattr(second, f'{kind}_id') == key,
+            tuple_(second.start_time, second.id) > tuple_(first.start_time, first.id),
+            second.start_time < first.start_time + func.make_interval(0, 0, 0, 0, 0, first.duration),
+        ))
+        .order_by(key, first.start_time, first.id, second.start_time, second.id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    result = db.session.execute(query)
+    try:
+        for key_id, first_id, first_start, first_minutes, second_id, second_start, second_minutes in result:
+            yield Conflict(kind, key_id, first_id, first_start, end_of(first_start, first_minutes),
+                           second_id, second_start, end_of(second_start, second_minutes))
+    finally:
+        result.close()
+
+
+def _find_conflicts_sweep(kind):
+    key = getattr(Show, f'{kind}_id')
+    query = select(key.label('key_id'), Show.start_time, Show.id, Show.duration)
+    current, running = None, []
+    for row in stream_rows(query, [key, Show.start_time, Show.id]):
+        if row.key_id != current:
+            current, running = row.key_id, []
+        end = end_of(row.start_time, row.duration)
+        running = [show for show in running if show[2] > row.start_time]
+        for other_id, other_start, other_end in running:
+            yield Conflict(kind, current, other_id, other_start, other_end, row.id, row.start_time, end)
+        running.append((row.id, row.start_time, end))
+
+
+#----------------------------------------------------------------------------#
+# The Booking table (Postgres).
+#----------------------------------------------------------------------------#
+
+def has_bookings(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {"name": f'"{BOOKINGS}"'}).scalar()
+
+
+def book_shows_from(connection, shows):
+    '''
+    Books the shows of `shows` (a table or partition with Show's columns)
+    that were loaded behind the trigger's back, e.g. into a partition
+    before it was attached. Shows that clash are left unbooked.
+    '''
+    connection.execute(text(
+        f'INSERT INTO "{BOOKINGS}" (show_id, venue_id, artist_id, during) '
+        f"SELECT id, venue_id, artist_id, tsrange(start_time, start_time + make_interval(mins => duration)) "
+        f'FROM "{shows}" ORDER BY start_time, id ON CONFLICT DO NOTHING'
+    ))
+
+
+def unbook_shows_from(connection, shows):
+    '''Drops the bookings of the shows in `shows`, e.g. a partition being detached.'''
+    bookings = table(BOOKINGS, column('show_id'))
+    connection.execute(bookings.delete().where(
+        bookings.c.show_id.in_(select(column('id')).select_from(table(shows)))))
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group('schedule')
+def schedule_command():
+    '''Check the show schedule for double bookings.'''
+
+
+@schedule_command.command('conflicts')
+@click.option('--kind', type=click.Choice(['venue', 'artist']), help='Only check venues or only artists.')
+@click.option('--csv', 'csv_path', type=click.Path(dir_okay=False, writable=True),
+              help='Write every conflicting pair to this CSV file.')
+@click.option('--show', 'shown', default=20, show_default=True, help='Conflicts to print.')
+@with_appcontext
+def conflicts_command(kind, csv_path, shown):
+    '''List the pairs of stored shows that double-book a venue or an artist.'''
+    out = open(csv_path, 'w', newline='') if csv_path else None
+    writer = csv.writer(out) if out else None
+    if writer:
+        writer.writerow(Conflict._fields)
+    try:
+        for checked in [kind] if kind else ['venue', 'artist']:
+            found = 0
+            for conflict in find_conflicts(checked):
+                found += 1
+                if writer:
+                    writer.writerow(conflict)
+                if found <= shown:
+                    click.echo(f'{checked} {conflict.key_id}: show {conflict.first_id} '
+                               f'({conflict.first_start:%Y-%m-%d %H:%M}-{conflict.first_end:%H:%M}) overlaps show '
+                               f'{conflict.second_id} ({conflict.second_start:%Y-%m-%d %H:%M}-{conflict.second_end:%H:%M})')
+            click.echo(f'{found} {checked} conflicts.')
+    finally:
+        if out:
+            out.close()
+        db.session.close()
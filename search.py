@@ -0,0 +1,302 @@
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Ranked, paginated search over venues and artists. Names, city/state and
+# genres are all searchable. Results are ordered by relevance and paged with
+# a (rank, id) keyset cursor, and each page carries the upcoming-show
+# counters kept on Venue and Artist (see counters.py).
+#
+# On Postgres the ranking is done in SQL: the words of the term matched as
+# prefixes against the stored search_document tsvector (GIN-indexed,
+# migration d8f3b2a7c1e4) and scored with ts_rank_cd, so "Music" still
+# finds "The Musical Hop". Name, city and state also match any substring
+# by ILIKE, so "A" finds "Guns N Petals". When pg_trgm is installed
+# (migration 3f1c9b7d2a64) those ILIKEs use trigram GIN indexes and pg_trgm
+# similarity on the name is added to the score; without it they are
+# checked row by row.
+#
+# Any other database falls back to an in-process inverted index (tokens and
+# trigrams) that is rebuilt lazily after invalidate() or INDEX_TTL seconds.
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import Numeric, and_, cast, func, literal, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from models import db, Venue, Artist
+from pagination import clamp_limit
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+INDEX_TTL = 300
+
+RANK_PLACES = 6
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+#----------------------------------------------------------------------------#
+# Cursors.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(rank, id):
+    return f'{rank}:{id}'
+
+
+def decode_cursor(cursor):
+    # Returns (Decimal rank, int id), or None for a missing/garbled cursor,
+    # which simply restarts from the first page.
+    if not cursor:
+        return None
+    try:
+        rank, id = cursor.split(':', 1)
+        return Decimal(rank), int(id)
+    except (ValueError, InvalidOperation):
+        return None
+
+
+#----------------------------------------------------------------------------#
+# Public API.
+#----------------------------------------------------------------------------#
+
+def search_venues(term, limit=DEFAULT_LIMIT, cursor=None):
+    return search(Venue, term, limit, cursor)
+
+
+def search_artists(term, limit=DEFAULT_LIMIT, cursor=None):
+    return search(Artist, term, limit, cursor)
+
+
+def search(model, term, limit=DEFAULT_LIMIT, cursor=None):
+    '''
+    Returns {"count", "data", "next_cursor"} where data holds at most `limit`
+    {"id", "name", "num_upcoming_shows"} dicts, best match first.
+    '''
+    term = (term or '').strip()
+    limit = clamp_limit(limit, DEFAULT_LIMIT, MAX_LIMIT)
+    after = decode_cursor(cursor)
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return _search_postgres(model, term, limit, after)
+    return _search_in_process(model, term, limit, after)
+
+
+#----------------------------------------------------------------------------#
+# Postgres.
+#----------------------------------------------------------------------------#
+
+_trgm_available = {}
+
+
+def _has_trgm(bind):
+    key = str(bind.url)
+    if key not in _trgm_available:
+        _trgm_available[key] = db.session.execute(
+            db.text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).scalar() > 0
+    return _trgm_available[key]
+
+
+def _prefix_query(term):
+    # 'music hop' -> 'music:* & hop:*', every word of the term as a prefix.
+    return ' & '.join(f'{token}:*' for token in _tokens(term))
+
+
+def _search_postgres(model, term, limit, after):
+    # The stored, GIN-indexed search_document column (migration d8f3b2a7c1e4);
+    # it is not mapped on the models, see models.py.
+    document = literal_column(f'"{model.__tablename__}".search_document', TSVECTOR)
+    words = _prefix_query(term)
+    tsquery = func.to_tsquery('simple', words)
+    trgm = _has_trgm(db.session.get_bind())
+
+    # search_document by word prefix, and name, city and state by
+    # substring. With pg_trgm every branch has an index, so the matches come
+    # from a BitmapOr (3f1c9b7d2a64, d8f3b2a7c1e4); without it the ILIKEs
+    # make this a sequential scan, but substrings still match.
+    pattern = f'%{term}%'
+    matches = [model.name.ilike(pattern), model.city.ilike(pattern), model.state.ilike(pattern)]
+    score = literal(0)
+    if words:
+        matches.append(document.op('@@')(tsquery))
+        score = func.ts_rank_cd(document, tsquery)
+    if trgm:
+        score = score + func.similarity(model.name, term)
+    # Rounded numeric so the rank compares exactly when it comes back in a cursor.
+    rank = func.round(cast(score, Numeric), RANK_PLACES)
+
+    ranked = select(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        rank.label('rank'),
+        func.count().over().label('total'),
+    )
+    if term:
+        ranked = ranked.where(or_(*matches))
+    ranked = ranked.subquery('ranked')
+
+    page = select(ranked)
+    if after:
+        after_rank, after_id = after
+        page = page.where(or_(
+            ranked.c.rank < after_rank,
+            and_(ranked.c.rank == after_rank, ranked.c.id > after_id),
+        ))
+    rows = db.session.execute(page.order_by(ranked.c.rank.desc(), ranked.c.id).limit(limit + 1)).all()
+
+    return _response(rows[:limit], len(rows) > limit, rows[0].total if rows else 0)
+
+
+def _response(rows, has_more, total):
+    last = rows[-1] if rows else None
+    return {
+        "count": total,
+        "data": [{
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows,
+        } for row in rows],
+        "next_cursor": encode_cursor(last.rank, last.id) if has_more else None,
+    }
+
+
+#----------------------------------------------------------------------------#
+# In-process fallback.
+#----------------------------------------------------------------------------#
+
+def _tokens(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def _raw_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _word_trigrams(text):
+    # Same shape as pg_trgm: every word padded with two leading and one trailing blank.
+    grams = set()
+    for word in _tokens(text):
+        grams |= _raw_trigrams(f'  {word} ')
+    return grams
+
+
+def similarity(a, b):
+    a, b = _word_trigrams(a), _word_trigrams(b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _genre_list(genres):
+    # Rows edited through the forms may hold a comma-joined string instead of a list.
+    if isinstance(genres, str):
+        return [genre for genre in genres.strip('{}').split(',') if genre]
+    return list(genres or [])
+
+
+class InvertedIndex:
+    '''
+    Token and trigram postings over name, city, state and genres.
+
+    Token postings answer whole-word queries (the tsvector half); trigram
+    postings narrow substring queries down to a few candidates that are then
+    verified, the way a pg_trgm GIN index does.
+    '''
+
+    def __init__(self, rows):
+        self.names = {}
+        self.haystacks = {}
+        self.tokens = defaultdict(set)
+        self.trigrams = defaultdict(set)
+        for id, name, city, state, genres in rows:
+            genres = _genre_list(genres)
+            self.names[id] = name or ''
+            haystack = '\n'.join(field.lower() for field in (name, city, state) if field)
+            self.haystacks[id] = haystack
+            for token in _tokens(' '.join([name or '', city or '', state or ''] + genres)):
+                self.tokens[token].add(id)
+            for gram in _raw_trigrams(haystack):
+                self.trigrams[gram].add(id)
+        self.built_at = time.monotonic()
+
+    def _substring_matches(self, needle):
+        if len(needle) < 3:
+            candidates = self.haystacks.keys()
+        else:
+            postings = sorted((self.trigrams.get(gram, set()) for gram in _raw_trigrams(needle)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+        return {id for id in candidates if needle in self.haystacks[id]}
+
+    def search(self, term):
+        '''Returns [(rank, id, name)] best match first.'''
+        needle = term.lower()
+        query_tokens = _tokens(needle)
+        token_hits = set()
+        if query_tokens:
+            token_hits = set.intersection(*(self.tokens.get(token, set()) for token in query_tokens))
+        matches = token_hits | self._substring_matches(needle)
+
+        ranked = []
+        for id in matches:
+            score = (0.1 if id in token_hits else 0.0) + similarity(self.names[id], term)
+            ranked.append((round(Decimal(score), RANK_PLACES), id, self.names[id]))
+        ranked.sort(key=lambda hit: (-hit[0], hit[1]))
+        return ranked
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def invalidate(model=None):
+    '''Drops the in-process index for `model` (or all of them) after a write.'''
+    with _indexes_lock:
+        if model is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(model.__name__, None)
+
+
+def _index_for(model):
+    with _indexes_lock:
+        index = _indexes.get(model.__name__)
+        if index is None or time.monotonic() - index.built_at > INDEX_TTL:
+            rows = db.session.execute(
+                select(model.id, model.name, model.city, model.state, model.genres)
+            ).all()
+            index = _indexes[model.__name__] = InvertedIndex(rows)
+        return index
+
+
+class _Hit:
+    __slots__ = ('rank', 'id', 'name', 'num_upcoming_shows')
+
+    def __init__(self, rank, id, name, num_upcoming_shows):
+        self.rank = rank
+        self.id = id
+        self.name = name
+        self.num_upcoming_shows = num_upcoming_shows
+
+
+def _search_in_process(model, term, limit, after):
+    hits = _index_for(model).search(term)
+    total = len(hits)
+    if after:
+        after_rank, after_id = after
+        hits = [hit for hit in hits if (hit[0], -hit[1]) < (after_rank, -after_id)]
+    page = hits[:limit + 1]
+
+    counts = {}
+    ids = [id for _, id, _ in page[:limit]]
+    if ids:
+        counts = dict(db.session.execute(
+            select(model.id, model.upcoming_shows_count).where(model.id.in_(ids))
+        ).all())
+
+    rows = [_Hit(rank, id, name, counts.get(id, 0)) for rank, id, name in page[:limit]]
+    return _response(rows, len(page) > limit, total)
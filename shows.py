@@ -0,0 +1,129 @@
+#----------------------------------------------------------------------------#
+# Show pages: the upcoming shows listing and the new show form.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+from flask import Blueprint, flash, render_template, request
+from sqlalchemy.exc import IntegrityError
+
+import conditional
+import scheduling
+from cache import page_cache, cache_tags
+from conditional import conditional_get
+from forms import ShowForm
+from models import db, Venue, Artist, Show, DEFAULT_SHOW_MINUTES
+from pagination import paginate, page_args
+from streaming import stream_page, stream_rows, wants_stream
+
+bp = Blueprint('shows', __name__)
+
+
+def split_shows(rows, other):
+  # Splits rows from a detail-page show query into (past, upcoming) lists of
+  # template dicts. `other` is the prefix of the joined side: 'artist' on a
+  # venue page, 'venue' on an artist page.
+  now = datetime.now()
+  past, upcoming = [], []
+  for row in rows:
+    show = {
+      f"{other}_id": row._mapping[f"{other}_id"],
+      f"{other}_name": row._mapping[f"{other}_name"],
+      f"{other}_image_link": row._mapping[f"{other}_image_link"],
+      "start_time": row.start_time
+    }
+    (past if row.start_time < now else upcoming).append(show)
+  return past, upcoming
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@conditional_get.validated(conditional.show_listing)
+@page_cache.cached
+def shows():
+  # displays upcoming shows at /shows, one (start_time, id) page at a time,
+  # or all of them streamed with ?limit=all (see streaming.py)
+
+  query = (
+      db.select(
+          Show.start_time,
+          Venue.id.label('venue_id'),
+          Venue.name.label('venue_name'),
+          Artist.id.label('artist_id'),
+          Artist.name.label('artist_name'),
+          Artist.image_link.label('artist_image_link'),
+      )
+      .join(Artist, Show.artist_id == Artist.id)
+      .join(Venue, Show.venue_id == Venue.id)
+      .where(Show.start_time > datetime.now())
+    )
+  keys = [Show.start_time, Show.id]
+  if wants_stream(request.args):
+    return stream_page('pages/shows.html', shows=stream_rows(query, keys, request.args.get('after')), page=None)
+
+  page = paginate(query, keys, **page_args(request.args))
+  data = []
+  for show in page:
+      data.append({
+          "venue_id": show.venue_id,
+          "venue_name": show.venue_name,
+          "artist_id": show.artist_id,
+          "artist_name": show.artist_name,
+          "artist_image_link": show.artist_image_link,
+          "start_time": show.start_time,
+        })
+
+  cache_tags('shows')
+  return render_template('pages/shows.html', shows=data, page=page)
+
+@bp.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # A show that would double-book its venue or artist is refused (see scheduling.py).
+  form = ShowForm(request.form, meta={'csrf': False})
+  if form.validate():
+    show = Show(venue_id=form.venue_id.data, artist_id=form.artist_id.data, start_time=form.start_time.data,
+                duration=form.duration.data or DEFAULT_SHOW_MINUTES)
+    error = None
+    try:
+      clashes = scheduling.conflicts(show.venue_id, show.artist_id, show.start_time, show.duration)
+      if clashes:
+        error = scheduling.describe(clashes[0])
+      else:
+        db.session.add(show)
+        db.session.commit()
+        page_cache.invalidate(f'venue:{show.venue_id}', f'artist:{show.artist_id}', 'shows', 'venues')
+    except IntegrityError as e:
+      # Booked by another request between the check and the insert, and
+      # refused by the Booking exclusion constraints.
+      db.session.rollback()
+      error = 'the venue or artist was booked at that time meanwhile' if scheduling.is_clash(e) else 'it could not be saved'
+      print(e)
+    except Exception as e:
+      db.session.rollback()
+      error = 'it could not be saved'
+      print(e)
+    finally:
+      db.session.close()
+    if error is None:
+      # on successful db insert, flash success
+      flash('Show was successfully listed!')
+      return render_template('pages/home.html')
+    flash('An error occurred. Show could not be listed: ' + error)
+    return render_template('forms/new_show.html', form=form)
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  else:
+    message = []
+    for field, err in form.errors.items():
+      message.append(field + ' ' + '|'.join(err))
+    flash('An error occurred. Show could not be listed. ' + ', '.join(message))
+    form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
@@ -0,0 +1,61 @@
+#----------------------------------------------------------------------------#
+# Streamed list pages.
+#
+#   GET /shows?limit=all    GET /artists?limit=all
+#
+# render every row after `after` (if given) on one page instead of one
+# keyset page at a time. The rows are read from a server-side cursor,
+# STREAM_BATCH_SIZE at a time (yield_per), and fed to the template as it
+# renders (stream_template); the HTML goes out in chunks of about
+# STREAM_CHUNK_SIZE characters. A request holds one batch of rows and one
+# chunk of output, however large the catalog, and the first bytes are sent
+# once the first batch is in rather than once the whole result is.
+#
+# A streamed page is never held whole, so it is not stored in the page
+# cache (see cache.py).
+#----------------------------------------------------------------------------#
+
+from flask import current_app, stream_template
+
+from models import db
+from pagination import decode_cursor, seek
+
+# Rows fetched per round trip.
+STREAM_BATCH_SIZE = 1000
+# Matches the gzip middleware's flush size (compression.FLUSH_BYTES).
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+def wants_stream(args):
+    return args.get('limit') == 'all'
+
+
+def stream_rows(query, keys, after=None, batch_size=STREAM_BATCH_SIZE):
+    '''Yields every row of `query` after the cursor `after`, ordered by `keys`.'''
+    cursor = decode_cursor(after, keys)
+    if cursor is not None:
+        query = seek(query, keys, cursor)
+    result = db.session.execute(query.order_by(*keys).execution_options(yield_per=batch_size))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def chunked(pieces, size=STREAM_CHUNK_SIZE):
+    # Jinja yields a piece per template node; one write per piece would mean
+    # thousands of tiny writes (and gzip flushes) per page.
+    buffer, buffered = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(template_name, **context):
+    '''A response rendering `template_name` as it is sent, in chunks of STREAM_CHUNK_SIZE.'''
+    return current_app.response_class(chunked(stream_template(template_name, **context)))
@@ -0,0 +1,70 @@
+#----------------------------------------------------------------------------#
+# Shared fixtures: the app on a scratch SQLite database.
+#
+#   python -m pytest -q
+#   FYYUR_TEST_DATABASE_URI=postgresql+psycopg2://... python -m pytest -q
+#
+# Tests of the Postgres-only paths (partitions, bookings) use `pg_app`, which
+# rebuilds the schema of FYYUR_TEST_DATABASE_URI from the migrations; they
+# are skipped when it is not set. Point it at a scratch database: every
+# table in it is dropped.
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if ROOT not in sys.path:
+  sys.path.insert(0, ROOT)
+
+import config
+from app import create_app
+from models import db
+
+
+def make_config(uri):
+  settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+  settings.update(
+    SQLALCHEMY_DATABASE_URI=uri,
+    SQLALCHEMY_BINDS={},
+    PAGE_CACHE_ENABLED=False,
+    METRICS_DIR=None,
+    TESTING=True,
+    # Debug mode also keeps create_app from logging to error.log.
+    DEBUG=True,
+  )
+  return type('TestConfig', (), settings)
+
+
+@pytest.fixture
+def app(tmp_path):
+  app = create_app(make_config(f'sqlite:///{tmp_path / "fyyur.db"}'))
+  with app.app_context():
+    db.create_all()
+    yield app
+    db.session.remove()
+    db.drop_all()
+
+
+@pytest.fixture
+def pg_app():
+  uri = os.environ.get('FYYUR_TEST_DATABASE_URI')
+  if not uri:
+    pytest.skip('FYYUR_TEST_DATABASE_URI is not set')
+  # The benchmarks build their Postgres schema the same way.
+  benchmarks = os.path.join(ROOT, 'benchmarks')
+  if benchmarks not in sys.path:
+    sys.path.insert(0, benchmarks)
+  from benchdb import reset_schema
+  app = create_app(make_config(uri))
+  with app.app_context():
+    reset_schema()
+    yield app
+    db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
@@ -0,0 +1,128 @@
+import gzip
+import zlib
+
+from werkzeug.test import EnvironBuilder
+
+from compression import FLUSH_BYTES, GzipMiddleware
+
+PAGE = b'<p>' + b'Fyyur ' * 1000 + b'</p>'
+
+
+def wsgi_app(body, headers=(), status='200 OK', stream=False):
+  def app(environ, start_response):
+    response_headers = list(headers)
+    if not any(name == 'Content-Type' for name, _ in headers):
+      response_headers.append(('Content-Type', 'text/html; charset=utf-8'))
+    if not stream:
+      response_headers.append(('Content-Length', str(sum(map(len, body)))))
+    start_response(status, response_headers)
+    return iter(body)
+  return app
+
+
+def call(app, accept='gzip, deflate', method='GET', min_size=500):
+  environ = EnvironBuilder(method=method, headers={'Accept-Encoding': accept} if accept else {}).get_environ()
+  started = {}
+
+  def start_response(status, headers, exc_info=None):
+    started['status'], started['headers'] = status, dict(headers)
+
+  chunks = list(GzipMiddleware(app, min_size=min_size)(environ, start_response))
+  return started['status'], started['headers'], b''.join(chunks)
+
+
+def test_compresses_and_drops_the_content_length():
+  status, headers, body = call(wsgi_app([PAGE]))
+  assert status == '200 OK'
+  assert headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in headers
+  assert headers['Vary'] == 'Accept-Encoding'
+  assert gzip.decompress(body) == PAGE
+
+
+def test_vary_is_set_whether_or_not_the_body_is_compressed():
+  for accept in (None, 'identity', 'gzip;q=0'):
+    _, headers, body = call(wsgi_app([PAGE]), accept=accept)
+    assert 'Content-Encoding' not in headers and body == PAGE
+    assert headers['Content-Length'] == str(len(PAGE)) and headers['Vary'] == 'Accept-Encoding'
+
+  _, headers, _ = call(wsgi_app([PAGE], headers=[('Vary', 'Cookie')]))
+  assert headers['Vary'] == 'Cookie, Accept-Encoding'
+  _, headers, _ = call(wsgi_app([PAGE], headers=[('Vary', 'accept-encoding')]))
+  assert headers['Vary'] == 'accept-encoding'
+
+  # Not a compressible type: left alone, no Vary.
+  _, headers, body = call(wsgi_app([PAGE], headers=[('Content-Type', 'image/png')]))
+  assert 'Vary' not in headers and 'Content-Encoding' not in headers and body == PAGE
+
+
+def test_leaves_short_encoded_and_bodiless_responses_alone():
+  _, headers, body = call(wsgi_app([b'<p>short</p>']))
+  assert 'Content-Encoding' not in headers and body == b'<p>short</p>'
+
+  _, headers, body = call(wsgi_app([PAGE], headers=[('Content-Encoding', 'br')]))
+  assert headers['Content-Encoding'] == 'br' and body == PAGE
+
+  _, headers, _ = call(wsgi_app([PAGE], headers=[('Cache-Control', 'no-transform')]))
+  assert 'Content-Encoding' not in headers
+
+  _, headers, body = call(wsgi_app([PAGE]), method='HEAD')
+  assert 'Content-Encoding' not in headers and headers['Vary'] == 'Accept-Encoding'
+
+  def not_modified(environ, start_response):
+    start_response('304 Not Modified', [('ETag', '"v1"')])
+    return []
+  status, headers, body = call(not_modified)
+  assert status.startswith('304') and body == b''
+  assert headers['Vary'] == 'Accept-Encoding' and headers['ETag'] == '"v1"'
+
+
+def test_strong_etags_become_weak_when_compressed():
+  _, headers, _ = call(wsgi_app([PAGE], headers=[('ETag', '"v1"')]))
+  assert headers['ETag'] == 'W/"v1"'
+  _, headers, _ = call(wsgi_app([PAGE], headers=[('ETag', 'W/"v1"')]))
+  assert headers['ETag'] == 'W/"v1"'
+
+
+def test_streamed_bodies_are_compressed_or_measured():
+  chunks = [b'<p>%d</p>' % i for i in range(500)]
+  _, headers, body = call(wsgi_app(chunks, stream=True))
+  assert headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in headers
+  assert gzip.decompress(body) == b''.join(chunks)
+
+  # A stream that ends below the threshold goes out as it is, measured.
+  _, headers, body = call(wsgi_app([b'<p>', b'tiny', b'</p>'], stream=True))
+  assert 'Content-Encoding' not in headers and body == b'<p>tiny</p>'
+  assert headers['Content-Length'] == str(len(body))
+
+
+def test_streamed_bodies_are_flushed_while_they_are_produced():
+  produced = []
+
+  def generate():
+    for i in range(4):
+      produced.append(i)
+      yield b'x' * FLUSH_BYTES
+
+  def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    return generate()
+
+  environ = EnvironBuilder(headers={'Accept-Encoding': 'gzip'}).get_environ()
+  body = iter(GzipMiddleware(app)(environ, lambda status, headers, exc_info=None: None))
+  decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+  received = b''
+  while len(received) < FLUSH_BYTES:
+    received += decompressor.decompress(next(body))
+  # The first chunk reached the client before the app produced the last one.
+  assert len(produced) < 4
+  received += b''.join(decompressor.decompress(chunk) for chunk in body) + decompressor.flush()
+  assert received == b'x' * FLUSH_BYTES * 4
+
+
+def test_generator_apps_that_start_the_response_lazily():
+  def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    yield PAGE
+
+  _, headers, body = call(app)
+  assert headers['Content-Encoding'] == 'gzip' and gzip.decompress(body) == PAGE
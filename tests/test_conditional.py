@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import event
+
+import conditional
+from models import db, Venue, Artist
+
+
+def listing_etag(client, url):
+  response = client.get(url)
+  assert response.status_code == 200
+  return response.headers['ETag']
+
+
+@pytest.mark.parametrize('model, url', [(Venue, '/venues'), (Artist, '/artists')])
+def test_listing_etag_changes_when_a_row_is_deleted(client, model, url):
+  rows = [model(name=f'Row {i}', city='Austin', state='TX', genres=['Jazz']) for i in range(3)]
+  db.session.add_all(rows)
+  db.session.commit()
+  etag = listing_etag(client, url)
+  assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+  # Not the row with the latest updated_at, so max(updated_at) stays put.
+  db.session.delete(rows[0])
+  db.session.commit()
+  db.session.remove()
+  deleted = listing_etag(client, url)
+  assert deleted != etag
+  assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+  assert client.get(url, headers={'If-None-Match': deleted}).status_code == 304
+
+
+def test_listing_validator_is_one_statement_without_a_count(app):
+  db.session.add(Venue(name='Hall', genres=['Jazz']))
+  db.session.commit()
+  statements = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+  event.listen(db.engine, 'before_cursor_execute', record)
+  try:
+    etag, last_modified = conditional.venue_listing()
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', record)
+  assert len(statements) == 1 and 'count(' not in statements[0].lower()
+  assert last_modified is not None
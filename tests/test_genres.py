@@ -0,0 +1,54 @@
+import genres
+from models import db, Venue, Artist, GenreCount
+
+
+def stored(model):
+  return {genre: count for genre, count in genres.genre_counts(model).items() if count}
+
+
+def test_orm_writes_keep_the_genre_counts(app):
+  db.session.add_all([
+    Venue(name='Hall', genres=['Jazz', 'Blues']),
+    Venue(name='Club', genres=['Jazz']),
+    Artist(name='Band', genres=['Jazz', 'Folk']),
+  ])
+  db.session.commit()
+  assert stored(Venue) == {'Blues': 1, 'Jazz': 2}
+  assert stored(Artist) == {'Folk': 1, 'Jazz': 1}
+
+  hall = db.session.execute(db.select(Venue).filter_by(name='Hall')).scalar_one()
+  hall.genres = ['Blues', 'Folk']
+  db.session.commit()
+  assert stored(Venue) == {'Blues': 1, 'Folk': 1, 'Jazz': 1}
+
+  # Replacing genres that were never loaded reads the old ones from the row.
+  db.session.expire(hall)
+  hall.genres = ['Rock n Roll']
+  db.session.commit()
+  assert stored(Venue) == {'Jazz': 1, 'Rock n Roll': 1}
+
+  db.session.delete(hall)
+  db.session.commit()
+  assert stored(Venue) == {'Jazz': 1}
+  assert stored(Venue) == genres._recounted(db.session.connection(), Venue)
+
+
+def test_recount_repairs_rows_written_behind_the_orm(app):
+  db.session.add(Artist(name='Band', genres=['Jazz']))
+  db.session.commit()
+  db.session.execute(db.insert(Artist), [{"name": f'Artist {i}', "genres": ['Jazz', 'Soul']} for i in range(3)])
+  db.session.execute(db.delete(GenreCount))
+  db.session.commit()
+  assert stored(Artist) == {}
+
+  counts = genres.recount(db.session.connection())
+  db.session.commit()
+  assert counts[Artist] == {'Jazz': 4, 'Soul': 3} and counts[Venue] == {}
+  assert stored(Artist) == {'Jazz': 4, 'Soul': 3}
+
+
+def test_listing_shows_the_stored_counts(client):
+  db.session.add_all([Venue(name=f'Venue {i}', city='Austin', state='TX', genres=['Jazz']) for i in range(2)])
+  db.session.commit()
+  page = client.get('/venues').get_data(as_text=True)
+  assert 'Jazz <span class="badge">2</span>' in page
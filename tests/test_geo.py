@@ -0,0 +1,83 @@
+import math
+import random
+
+import pytest
+
+import geo
+from models import db, Venue
+
+
+@pytest.mark.parametrize('lat, lon, geohash', [
+  (42.6, -5.6, 'ezs42'),
+  (57.64911, 10.40744, 'u4pruydqqvj'),
+  (0.0, 0.0, 's0000'),
+  (-90.0, -180.0, '00000'),
+])
+def test_encode_known_geohashes(lat, lon, geohash):
+  assert geo.encode(lat, lon, len(geohash)) == geohash
+
+
+def test_bounds_contain_the_point_and_refine_with_precision():
+  rng = random.Random(23)
+  for _ in range(200):
+    lat, lon = rng.uniform(-89, 89), rng.uniform(-179, 179)
+    geohash = geo.encode(lat, lon)
+    assert len(geohash) == geo.GEOHASH_PRECISION
+    for precision in range(1, len(geohash) + 1):
+      south, north, west, east = geo.bounds(geohash[:precision])
+      assert south <= lat <= north and west <= lon <= east
+      # Each cell is the prefix of the cells inside it.
+      assert geo.encode((south + north) / 2, (west + east) / 2, precision) == geohash[:precision]
+
+
+def test_covering_is_the_cell_and_its_eight_neighbours():
+  lat, lon = 30.2672, -97.7431
+  cells, reach = geo.covering(lat, lon, 6)
+  centre = geo.encode(lat, lon, 6)
+  assert len(cells) == 9 and len(set(cells)) == 9 and centre in cells
+
+  south, north, west, east = geo.bounds(centre)
+  height, width = north - south, east - west
+  for cell in cells:
+    cell_south, _, cell_west, _ = geo.bounds(cell)
+    rows, columns = (cell_south - south) / height, (cell_west - west) / width
+    assert round(rows) in (-1, 0, 1) and math.isclose(rows, round(rows), abs_tol=1e-9)
+    assert round(columns) in (-1, 0, 1) and math.isclose(columns, round(columns), abs_tol=1e-9)
+  # The block reaches at least as far as the nearest edge of the centre cell plus one cell.
+  assert 0 < reach <= geo.distance_km(lat, lon, north + height, lon)
+
+
+def test_covering_wraps_at_the_antimeridian_and_stops_at_the_poles():
+  cells, _ = geo.covering(10.0, 179.999, 5)
+  assert len(cells) == 9
+  assert any(geo.bounds(cell)[2] == -180.0 for cell in cells)
+
+  cells, reach = geo.covering(89.99, 0.0, 4)
+  assert len(cells) == 6 and reach == 0.0
+  assert geo.covering(1.0, 2.0, 0) == ([''], math.inf)
+
+
+def test_distance_km():
+  assert geo.distance_km(48.8566, 2.3522, 51.5074, -0.1278) == pytest.approx(343.5, abs=0.5)
+  assert geo.distance_km(10, 20, 10, 20) == 0
+  assert geo.distance_km(0, 0, 0, 180) == pytest.approx(math.pi * geo.EARTH_RADIUS_KM)
+
+
+def test_nearby_matches_brute_force_in_process(app):
+  rng = random.Random(7)
+  points = [(rng.gauss(30.27, 0.05), rng.gauss(-97.74, 0.05)) for _ in range(300)]
+  db.session.add_all([
+    Venue(name=f'Venue {i}', genres=['Jazz'], latitude=lat, longitude=lon, geohash=geo.encode(lat, lon))
+    for i, (lat, lon) in enumerate(points)
+  ])
+  db.session.commit()
+  ids = db.session.execute(db.select(Venue.id).order_by(Venue.id)).scalars().all()
+  geo.invalidate()
+
+  for _ in range(30):
+    lat, lon = rng.gauss(30.27, 0.08), rng.gauss(-97.74, 0.08)
+    distances = sorted((round(geo.distance_km(lat, lon, *point), 3), id) for id, point in zip(ids, points))
+    for radius_km in (None, 1, 5):
+      expected = [hit for hit in distances if radius_km is None or hit[0] <= radius_km][:10]
+      found = [(hit['distance_km'], hit['id']) for hit in geo.nearby(lat, lon, radius_km, 10)]
+      assert found == expected
@@ -0,0 +1,32 @@
+import re
+
+from models import db, Venue
+
+GAUGES = {
+  'fyyur_db_pool_checked_out': 'checkedout',
+  'fyyur_db_pool_checked_in': 'checkedin',
+}
+
+
+def pool_gauges(client):
+  text = client.get('/metrics').get_data(as_text=True)
+  return {
+    gauge: float(re.search(rf'^{gauge}{{engine="default"[^}}]*}} (\S+)$', text, re.M).group(1))
+    for gauge in GAUGES
+  }
+
+
+def test_pool_gauges_follow_the_pool_after_a_fork_style_dispose(app, client):
+  db.session.add(Venue(name='Pool Hall', city='Austin', state='TX', genres=['Jazz']))
+  db.session.commit()
+  db.session.remove()
+
+  # What gunicorn.conf.py post_fork does in every worker.
+  db.engine.dispose(close=False)
+  assert client.get('/venues').status_code == 200
+  db.session.remove()
+
+  pool = db.engine.pool
+  expected = {gauge: float(getattr(pool, method)()) for gauge, method in GAUGES.items()}
+  assert expected == {'fyyur_db_pool_checked_out': 0.0, 'fyyur_db_pool_checked_in': 1.0}, pool.status()
+  assert pool_gauges(client) == expected, pool.status()
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from models import db, Artist, Show
+from pagination import decode_cursor, encode_cursor, paginate
+
+
+KEYS = Artist.name_sort_key()
+
+
+def test_cursor_round_trip():
+  keys = [Artist.name, Show.id, Show.start_time, Artist.city]
+  values = ['The Musical Hop', 42, datetime(2026, 11, 6, 20, 30, 15, 250), None]
+  cursor = encode_cursor(values)
+  assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+  assert decode_cursor(cursor, keys) == values
+
+
+def _raw(payload):
+  return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+  None,
+  '',
+  'not base64 at all!',
+  'e30',                                 # {}: not a list
+  _raw('[1, 2'),                         # cut short
+  _raw('["a", 1, 2]'),                   # one value too many
+  _raw('[{"$dt": "yesterday"}, 1]'),     # not a timestamp
+  encode_cursor(['Name', 1])[:-3],       # truncated
+  _raw('[{"a": 1}, "x"]'),               # values of the wrong types
+  _raw('["Name", "1"]'),                 # id as a string
+  _raw('["Name", 1.5]'),
+  _raw('["Name", true]'),
+  _raw('[{"$dt": "2026-11-06T20:30:00"}, 1]'),
+])
+def test_missing_or_tampered_cursors_restart_from_the_first_page(cursor):
+  assert decode_cursor(cursor, KEYS) is None
+
+
+def test_cursors_cannot_smuggle_sql():
+  cursor = _raw(json.dumps(["x') OR 1=1 --", 1]))
+  assert decode_cursor(cursor, KEYS) == ["x') OR 1=1 --", 1]
+
+
+def walk(query, keys, limit, cursor_name, start=None):
+  pages, cursor = [], start
+  while True:
+    page = paginate(query, keys, limit=limit, **{cursor_name: cursor})
+    pages.append([row.id for row in page])
+    cursor = page.next_cursor if cursor_name == 'after' else page.prev_cursor
+    if cursor is None:
+      return pages
+
+
+def test_paginate_walks_forward_and_back(app):
+  # Repeated and missing names, so the id has to break ties.
+  db.session.add_all([Artist(name=[None, 'Band', 'Cellar', 'Band'][i % 4], genres=['Jazz']) for i in range(23)])
+  db.session.commit()
+  keys = Artist.name_sort_key()
+  query = db.select(Artist.id)
+  expected = [row.id for row in db.session.execute(query.order_by(*keys))]
+
+  forward = walk(query, keys, 5, 'after')
+  assert [len(page) for page in forward] == [5, 5, 5, 5, 3]
+  assert sum(forward, []) == expected
+
+  last = paginate(query, keys, limit=5, after=paginate(query, keys, limit=20).next_cursor)
+  assert [row.id for row in last] == expected[20:]
+  backward = walk(query, keys, 5, 'before', start=last.prev_cursor)
+  assert sum(reversed(backward), []) == expected[:20]
+
+  # A tampered cursor is the first page again.
+  assert [row.id for row in paginate(query, keys, limit=5, after='garbage')] == expected[:5]
+  assert [row.id for row in paginate(query, keys, limit=5, after=_raw('[{"a": 1}, "x"]'))] == expected[:5]
@@ -0,0 +1,66 @@
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import partitions
+from models import db, Venue, Artist, Show
+
+
+def partition_of(show):
+  return db.session.execute(
+    text('SELECT tableoid::regclass::text FROM "Show" WHERE id = :id'), {"id": show.id}
+  ).scalar().strip('"')
+
+
+def booked(shows):
+  return db.session.execute(
+    text('SELECT count(*) FROM "Booking" WHERE show_id = ANY(:ids)'), {"ids": [show.id for show in shows]}
+  ).scalar()
+
+
+def test_create_partition_moves_stray_rows_out_of_the_default_partition(pg_app):
+  # Years past what the migration and `partitions create` cover.
+  month = partitions.month_start(date.today(), 60)
+  start = datetime(month.year, month.month, 1, 20)
+  venue = Venue(name='Hall', genres=['Jazz'])
+  artist = Artist(name='Band', genres=['Jazz'])
+  db.session.add_all([venue, artist])
+  db.session.flush()
+  strays = [Show(venue_id=venue.id, artist_id=artist.id, start_time=start + timedelta(days=day)) for day in (0, 27)]
+  later = Show(venue_id=venue.id, artist_id=artist.id, start_time=start + timedelta(days=45))
+  db.session.add_all(strays + [later])
+  db.session.commit()
+  assert {partition_of(show) for show in strays + [later]} == {partitions.DEFAULT_PARTITION}
+
+  moved = partitions.create_partition(db.session.connection(), month)
+  db.session.commit()
+  assert moved == 2
+  assert [partition_of(show) for show in strays] == [partitions.partition_name(month)] * 2
+  assert partition_of(later) == partitions.DEFAULT_PARTITION
+  assert booked(strays + [later]) == 3
+  db.session.refresh(venue)
+  assert venue.upcoming_shows_count == 3
+
+  # The moved shows still hold their bookings.
+  db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start + timedelta(minutes=30)))
+  with pytest.raises(IntegrityError):
+    db.session.commit()
+  db.session.rollback()
+
+
+def test_upcoming_shows_skip_the_past_partitions(pg_app):
+  this_month = partitions.month_start(date.today())
+  connection = db.session.connection()
+  for offset in range(-3, 0):
+    partitions.create_partition(connection, partitions.month_start(this_month, offset))
+  db.session.commit()
+
+  plan = '\n'.join(db.session.execute(text(
+    'EXPLAIN SELECT id FROM "Show" WHERE venue_id = 1 AND start_time >= :now'
+  ), {"now": datetime.now()}).scalars())
+  scanned = set(re.findall(r'\bShow_(?:p\d{4}_\d{2}|default)\b', plan))
+  assert partitions.partition_name(this_month) in scanned
+  assert all(name >= partitions.partition_name(this_month) for name in scanned - {partitions.DEFAULT_PARTITION})
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Venue, Artist, Show
+
+# The page's own two queries plus the ETag validator query (conditional.py);
+# benchmarks/detail_query_count.py measures the same on Postgres.
+EXPECTED = 3
+
+
+def seed(num_shows):
+  venue = Venue(name='Test Venue', city='San Francisco', state='CA', genres=['Jazz'])
+  artist = Artist(name='Test Artist', city='San Francisco', state='CA', genres=['Jazz'])
+  other_artists = [Artist(name=f'Artist {i}', genres=['Jazz']) for i in range(num_shows)]
+  other_venues = [Venue(name=f'Venue {i}', genres=['Jazz']) for i in range(num_shows)]
+  db.session.add_all([venue, artist] + other_artists + other_venues)
+  db.session.flush()
+
+  now = datetime.now()
+  for i in range(num_shows):
+    start_time = now + timedelta(days=i - num_shows // 2)
+    db.session.add(Show(venue_id=venue.id, artist_id=other_artists[i].id, start_time=start_time))
+    db.session.add(Show(venue_id=other_venues[i].id, artist_id=artist.id, start_time=start_time))
+  db.session.commit()
+  ids = venue.id, artist.id
+  db.session.remove()
+  return ids
+
+
+def count_queries(client, url):
+  statements = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+  event.listen(db.engine, 'before_cursor_execute', record)
+  try:
+    response = client.get(url)
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', record)
+  db.session.remove()
+  assert response.status_code == 200
+  return len(statements)
+
+
+@pytest.mark.parametrize('num_shows', [0, 1, 25, 100])
+def test_detail_pages_run_a_fixed_number_of_queries(client, num_shows):
+  venue_id, artist_id = seed(num_shows)
+  assert count_queries(client, f'/venues/{venue_id}') == EXPECTED
+  assert count_queries(client, f'/artists/{artist_id}') == EXPECTED
+
+
+def test_detail_pages_list_every_show(client):
+  venue_id, artist_id = seed(10)
+  page = client.get(f'/venues/{venue_id}').get_data(as_text=True)
+  assert sum(f'>Artist {i}<' in page for i in range(10)) == 10
+  page = client.get(f'/artists/{artist_id}').get_data(as_text=True)
+  assert sum(f'>Venue {i}<' in page for i in range(10)) == 10
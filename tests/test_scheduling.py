@@ -0,0 +1,92 @@
+import random
+from datetime import datetime, timedelta
+
+import scheduling
+from models import db, Venue, Artist, Show
+from scheduling import IntervalTree
+
+EVENING = datetime(2026, 11, 6, 20, 0)
+
+
+def brute_force(intervals, start, end):
+  return sorted((interval for interval in intervals if interval[0] < end and interval[1] > start),
+                key=lambda interval: (interval[0], interval[1]))
+
+
+def test_interval_tree_matches_brute_force():
+  rng = random.Random(24)
+  for size in (0, 1, 2, 7, 100, 1000):
+    intervals = []
+    for value in range(size):
+      start = rng.randrange(0, 10000)
+      intervals.append((start, start + rng.randrange(1, 300), value))
+    tree = IntervalTree(intervals)
+    assert len(tree) == size
+    for _ in range(200):
+      start = rng.randrange(-300, 10300)
+      end = start + rng.randrange(1, 600)
+      assert tree.overlapping(start, end) == brute_force(intervals, start, end)
+
+
+def test_interval_tree_intervals_are_half_open():
+  tree = IntervalTree([(10, 20, 'a'), (20, 30, 'b'), (30, 40, 'c')])
+  # Back to back is not a clash.
+  assert tree.overlapping(20, 30) == [(20, 30, 'b')]
+  assert tree.overlapping(0, 10) == []
+  assert tree.overlapping(40, 50) == []
+  assert tree.overlapping(19, 21) == [(10, 20, 'a'), (20, 30, 'b')]
+
+
+def test_interval_tree_finds_enclosing_and_enclosed_intervals():
+  tree = IntervalTree([(0, 100, 'long'), (40, 45, 'short'), (200, 210, 'later')])
+  assert tree.overlapping(50, 60) == [(0, 100, 'long')]
+  assert tree.overlapping(30, 150) == [(0, 100, 'long'), (40, 45, 'short')]
+
+
+def booked():
+  venue = Venue(name='Hall', genres=['Jazz'])
+  other_venue = Venue(name='Club', genres=['Jazz'])
+  artist = Artist(name='Band', genres=['Jazz'])
+  other_artist = Artist(name='Duo', genres=['Jazz'])
+  db.session.add_all([venue, other_venue, artist, other_artist])
+  db.session.flush()
+  show = Show(venue_id=venue.id, artist_id=artist.id, start_time=EVENING, duration=120)
+  db.session.add(show)
+  db.session.commit()
+  return venue.id, other_venue.id, artist.id, other_artist.id, show.id
+
+
+def test_conflicts_reports_the_clashing_venue_or_artist(app):
+  venue, other_venue, artist, other_artist, show = booked()
+
+  [clash] = scheduling.conflicts(venue, other_artist, EVENING + timedelta(minutes=119), 60)
+  assert (clash.kind, clash.id, clash.end_time) == ('venue', show, EVENING + timedelta(hours=2))
+  [clash] = scheduling.conflicts(other_venue, artist, EVENING - timedelta(minutes=30), 31)
+  assert (clash.kind, clash.id) == ('artist', show)
+
+  # Ending as the show starts, starting as it ends, elsewhere, or the show itself.
+  assert scheduling.conflicts(venue, artist, EVENING - timedelta(hours=1), 60) == []
+  assert scheduling.conflicts(venue, artist, EVENING + timedelta(hours=2), 60) == []
+  assert scheduling.conflicts(other_venue, other_artist, EVENING, 120) == []
+  assert scheduling.conflicts(venue, artist, EVENING, 120, exclude_id=show) == []
+
+
+def test_validate_batch_checks_stored_shows_and_earlier_rows(app):
+  venue, other_venue, artist, other_artist, _ = booked()
+  rows = list(enumerate([
+    # Clashes with the stored show at the venue.
+    {"venue_id": venue, "artist_id": other_artist, "start_time": EVENING + timedelta(hours=1), "duration": 60},
+    # Fine: right after the stored show.
+    {"venue_id": venue, "artist_id": other_artist, "start_time": EVENING + timedelta(hours=2), "duration": 60},
+    # Clashes with the row before, through the artist.
+    {"venue_id": other_venue, "artist_id": other_artist, "start_time": EVENING + timedelta(hours=2, minutes=30), "duration": 60},
+    # Fine: another venue and artist.
+    {"venue_id": other_venue, "artist_id": artist, "start_time": EVENING + timedelta(hours=4), "duration": 90},
+  ], 1))
+
+  accepted, errors = scheduling.validate_batch(rows)
+  assert [number for number, _ in accepted] == [2, 4]
+  assert [number for number, _ in errors] == [1, 3]
+  assert 'venue' in errors[0][1] and 'show' in errors[0][1]
+  assert 'artist' in errors[1][1] and 'row 2' in errors[1][1]
+  assert scheduling.validate_batch([]) == ([], [])
@@ -0,0 +1,33 @@
+import pytest
+
+import search
+from models import db, Venue
+
+
+@pytest.fixture(params=['app', 'pg_app'])
+def venues(request):
+  request.getfixturevalue(request.param)
+  db.session.add_all([
+    Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']),
+    Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA', genres=['Folk']),
+    Venue(name='Guns N Petals', city='New York', state='NY', genres=['Rock n Roll']),
+  ])
+  db.session.commit()
+  search.invalidate()
+
+
+def names(term):
+  return sorted(hit['name'] for hit in search.search_venues(term)['data'])
+
+
+@pytest.mark.usefixtures('venues')
+@pytest.mark.parametrize('term, expected', [
+  ('Music', ['Park Square Live Music & Coffee', 'The Musical Hop']),
+  # Substrings, with or without pg_trgm.
+  ('A', ['Guns N Petals', 'Park Square Live Music & Coffee', 'The Musical Hop']),
+  ('usical', ['The Musical Hop']),
+  ('ork', ['Guns N Petals']),
+  ('Blues', []),
+])
+def test_search_matches_word_prefixes_and_substrings(term, expected):
+  assert names(term) == expected
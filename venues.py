@@ -0,0 +1,264 @@
+#----------------------------------------------------------------------------#
+# Venue pages: listing, search, detail, create, edit and delete.
+#----------------------------------------------------------------------------#
+
+import sys
+from itertools import groupby
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+import conditional
+import geo
+import search
+from cache import page_cache, cache_tags
+from conditional import conditional_get
+from forms import VenueForm
+from genres import clean_genres, find_genre, genre_counts, has_genre
+from models import db, Venue, Artist, Show
+from pagination import paginate, page_args
+from shows import split_shows
+
+bp = Blueprint('venues', __name__)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+@conditional_get.validated(conditional.venue_listing)
+@page_cache.cached
+def venues():
+  # One page of venues in (city, state, name, id) order, so an area is never
+  # split out of order across pages. num_upcoming_shows is the venue's own
+  # counter (see counters.py), so the listing never reads the Show table.
+  # ?genre= keeps the venues listing that genre (see genres.py).
+  query = db.select(Venue.city, Venue.state, Venue.id, Venue.name, Venue.upcoming_shows_count.label('num_upcoming_shows'))
+  genre = request.args.get('genre')
+  if genre:
+    genre = find_genre(genre) or genre
+    query = query.where(has_genre(Venue, genre))
+  page = paginate(query, Venue.area_sort_key(), **page_args(request.args))
+
+  data = []
+  for (city, state), area_rows in groupby(page, key=lambda row: (row.city, row.state)):
+      data.append({
+          "city": city,
+          "state": state,
+          "venues": [{
+              "id": row.id,
+              "name": row.name,
+              "num_upcoming_shows": row.num_upcoming_shows,
+          } for row in area_rows]
+      })
+
+  cache_tags('venues')
+  return render_template('pages/venues.html', areas=data, page=page, genre=genre, genre_counts=genre_counts(Venue));
+
+@bp.route('/venues/search', methods=['POST'])
+def search_venues():
+  # Ranked search over name, city/state and genres, one page per request.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  search_term = request.form.get('search_term', '')
+
+  response = search.search_venues(
+    search_term,
+    limit=request.form.get('limit', search.DEFAULT_LIMIT),
+    cursor=request.form.get('cursor'),
+  )
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@bp.route('/venues/<int:venue_id>')
+@conditional_get.validated(conditional.venue_page)
+@page_cache.cached
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  # TODO: replace with real venue data from the venues table, using venue_id
+  venue = db.session.get(Venue, venue_id)
+
+  if not venue:
+      flash('Venue not found')
+      return redirect(url_for('index'))
+
+  # Past and upcoming shows come back from one column-projected query; the
+  # artist fields are selected directly so nothing is lazy-loaded per show.
+  shows = db.session.execute(
+      db.select(
+          Show.start_time,
+          Artist.id.label('artist_id'),
+          Artist.name.label('artist_name'),
+          Artist.image_link.label('artist_image_link'),
+      )
+      .join(Artist, Show.artist_id == Artist.id)
+      .where(Show.venue_id == venue_id)
+      .order_by(Show.start_time)
+    ).all()
+  past_shows, upcoming_shows = split_shows(shows, 'artist')
+  cache_tags(f'venue:{venue_id}', *(f'ref:artist:{show.artist_id}' for show in shows))
+
+  data ={
+    "id": venue.id,
+    "name": venue.name,
+    "genres": venue.genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
+  
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  form = VenueForm(request.form)
+
+  if form.validate():
+        venue = Venue(
+            name=form.name.data,
+            city=form.city.data,
+            state=form.state.data,
+            address=form.address.data,
+            phone=form.phone.data,
+            genres=form.genres.data,
+            facebook_link=form.facebook_link.data,
+            image_link=form.image_link.data,
+            website=form.website_link.data,
+            seeking_talent=form.seeking_talent.data,
+            seeking_description=form.seeking_description.data
+        )
+        try:
+            db.session.add(venue)
+            db.session.commit()
+            search.invalidate(Venue)
+            page_cache.invalidate('venues')
+            # on successful db insert, flash success
+            flash('Venue ' + request.form['name'] + ' was successfully listed!')
+        except Exception as e:
+            # TODO: on unsuccessful db insert, flash an error instead.
+            db.session.rollback()
+            flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+            print(e)
+        finally:
+            db.session.close()
+            return render_template('pages/home.html')
+
+  else:
+        message = []
+        for field, err in form.errors.items():
+            message.append(field + ' ' + '|'.join(err))
+        flash('An error occurred. Venue ' + form.name.data + ' , '.join(message))
+        form = VenueForm()
+        
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  
+  error = False
+  try:
+      venue = Venue.query.get(venue_id)
+      venueName = venue.name
+      db.session.delete(venue)
+      db.session.commit()
+      search.invalidate(Venue)
+      geo.invalidate()
+      page_cache.invalidate(f'venue:{venue_id}', f'ref:venue:{venue_id}', 'venues', 'shows')
+  except:
+      error = True
+      db.session.rollback()
+      print(sys.exc_info())
+  finally:
+      db.session.close()      
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage    
+  if error:
+      flash(f"{venueName} venue could not be deleted.")
+  else:
+      flash(f"{venueName} venue has been successfully deleted.")
+  return render_template("pages/home.html")
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  form = VenueForm()
+  venue_found = Venue.query.get(venue_id)
+
+  # check if venue exists
+  if not venue_found:
+    return render_template('errors/404.html')
+
+  form.name.data = venue_found.name
+  form.city.data = venue_found.city
+  form.state.data = venue_found.state
+  form.address.data = venue_found.address
+  form.phone.data = venue_found.phone
+  form.genres.data = venue_found.genres
+  form.facebook_link.data = venue_found.facebook_link
+  form.image_link.data = venue_found.image_link
+  form.website_link.data = venue_found.website
+  form.seeking_talent.data = venue_found.seeking_talent
+  form.seeking_description.data = venue_found.seeking_description
+
+  # TODO: populate form with values from venue with ID <venue_id>
+  return render_template('forms/edit_venue.html', form=form, venue=venue_found)
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  venue = Venue.query.get(venue_id)
+  venue_form = VenueForm(request.form)
+  genres, _ = clean_genres(request.form.getlist("genres"))
+  try:
+      moved = (venue.address, venue.city, venue.state) != (
+        venue_form.address.data, venue_form.city.data, venue_form.state.data)
+      if moved:
+        # The old coordinates no longer apply; the next `flask geocode` run locates it again.
+        venue.latitude = venue.longitude = venue.geohash = None
+      venue.name = venue_form.name.data
+      venue.city = venue_form.city.data
+      venue.state = venue_form.state.data
+      venue.address = venue_form.address.data
+      venue.phone = venue_form.phone.data
+      venue.genres = genres
+      venue.facebook_link = venue_form.facebook_link.data
+      venue.image_link = venue_form.image_link.data
+      venue.website_link = venue_form.website_link.data
+      venue.seeking_talent = venue_form.seeking_talent.data
+      venue.seeking_description = venue_form.seeking_description.data
+
+      db.session.commit()
+      search.invalidate(Venue)
+      if moved:
+        geo.invalidate()
+      page_cache.invalidate(f'venue:{venue_id}', f'ref:venue:{venue_id}', 'venues', 'shows')
+      # on successful db update, flash success
+      flash("Venue: " + venue_form.name.data + " has been successfully updated!")
+  except:
+      db.session.rollback()
+      print(sys.exc_info())
+      # Done: on unsuccessful db update, flash an error instead.
+      flash(
+        "An error occurred. Venue " + venue_form.name.data + " could not be updated."
+      )
+  finally:
+      db.session.close()
+  return redirect(url_for('venues.show_venue', venue_id=venue_id))
@@ -0,0 +1,11 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point for production servers.
+#
+#   gunicorn                  (reads gunicorn.conf.py, which serves wsgi:app)
+#
+# `python app.py` and `flask run` remain the development servers.
+#----------------------------------------------------------------------------#
+
+from app import create_app
+
+app = create_app()